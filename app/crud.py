@@ -3,47 +3,141 @@ CRUD операции для работы с базой данных.
 Содержит функции для работы с командами, пользователями и PR.
 """
 from sqlalchemy.orm import Session
-from sqlalchemy import and_, func
-from typing import List
+from sqlalchemy import Boolean, String, and_, any_, case, column, delete, func, insert, literal, literal_column, select, tuple_, union_all, update
+from sqlalchemy.dialects.postgresql import ARRAY, JSONB, insert as pg_insert
+from typing import Dict, List, Optional, Set, Tuple
+from datetime import datetime
 from . import models
 from . import schemas
+from .services import roster_cache, stats_rollup
+from .services.concurrency import ConcurrentUpdateError
 
 
 def get_team(db: Session, team_name: str):
     return db.query(models.Team).filter(models.Team.team_name == team_name).first()
 
 
+def get_team_response(db: Session, team_name: str) -> Optional[Dict]:
+    """
+    Команда с участниками одним запросом и только нужными колонками,
+    без ORM-объектов и ленивой загрузки members. None, если команды нет.
+    """
+    rows = db.query(
+        models.Team.team_name,
+        models.User.user_id,
+        models.User.username,
+        models.User.is_active
+    ).outerjoin(
+        models.User, models.User.team_name == models.Team.team_name
+    ).filter(
+        models.Team.team_name == team_name
+    ).order_by(models.User.user_id).all()
+
+    if not rows:
+        return None
+    return {
+        "team_name": team_name,
+        "members": [
+            {"user_id": row.user_id, "username": row.username, "is_active": row.is_active}
+            for row in rows if row.user_id is not None
+        ]
+    }
+
+
 def create_team(db: Session, team: schemas.TeamCreate):
-    # Проверяем, существует ли команда
-    db_team = get_team(db, team.team_name)
-    if db_team:
+    # Существующая команда (в т.ч. созданная параллельно) - TEAM_EXISTS
+    if not insert_team(db, team.team_name):
+        db.rollback()
         return None
     
-    # Создаём команду
-    db_team = models.Team(team_name=team.team_name)
-    db.add(db_team)
-    
-    # Создаём/обновляем пользователей
-    for member in team.members:
-        db_user = get_user(db, member.user_id)
-        if db_user:
-            # Обновляем существующего пользователя
-            db_user.username = member.username
-            db_user.is_active = member.is_active
-            db_user.team_name = team.team_name
-        else:
-            # Создаём нового пользователя
-            db_user = models.User(
-                user_id=member.user_id,
-                username=member.username,
-                team_name=team.team_name,
-                is_active=member.is_active
-            )
-            db.add(db_user)
+    members = unique_members(team.members)
+    added, _, active_delta, affected_teams = upsert_team_members(db, team.team_name, members)
     
+    roster_cache.mark_dirty(db, affected_teams)
+    stats_rollup.apply_deltas(db, total_teams=1, total_users=len(added), active_users=active_delta)
     db.commit()
-    db.refresh(db_team)
-    return db_team
+    # Состав известен из запроса - не перечитываем команду
+    return {"team_name": team.team_name, "members": [member.model_dump() for member in members]}
+
+
+def insert_team(db: Session, team_name: str) -> bool:
+    """Создаёт команду, если её нет; True, если создана этим запросом"""
+    return bool(db.execute(
+        pg_insert(models.Team).values(team_name=team_name).on_conflict_do_nothing()
+    ).rowcount)
+
+
+def unique_members(members: List[schemas.TeamMemberBase]) -> List[schemas.TeamMemberBase]:
+    """Участники без повторов user_id (действует последнее упоминание)"""
+    return list({member.user_id: member for member in members}.values())
+
+
+def upsert_team_members(db: Session, team_name: str,
+                        members: List[schemas.TeamMemberBase]) -> Tuple[List[str], List[str], int, Set[str]]:
+    """
+    Добавляет и обновляет участников команды одним INSERT ... ON CONFLICT DO UPDATE;
+    строки без изменений не перезаписываются. Прежнее состояние существующих
+    пользователей читается одним IN-запросом с блокировкой строк.
+
+    Возвращает (добавленные, изменённые, изменение числа активных, затронутые команды).
+    user_id в members не должны повторяться; коммит остаётся за вызывающим.
+    """
+    affected_teams = {team_name}
+    if not members:
+        return [], [], 0, affected_teams
+    
+    existing = {
+        user_id: (user_team, bool(is_active))
+        for user_id, user_team, is_active in db.query(
+            models.User.user_id, models.User.team_name, models.User.is_active
+        ).filter(
+            models.User.user_id.in_([member.user_id for member in members])
+        ).order_by(models.User.user_id).with_for_update()
+    }
+    
+    rows = _recordset(
+        "members",
+        [member.model_dump() for member in members],
+        column("user_id", String),
+        column("username", String),
+        column("is_active", Boolean)
+    )
+    stmt = pg_insert(models.User).from_select(
+        ["user_id", "username", "is_active", "team_name"],
+        select(rows.c.user_id, rows.c.username, rows.c.is_active, literal(team_name, String)).order_by(rows.c.user_id)
+    )
+    stmt = stmt.on_conflict_do_update(
+        index_elements=[models.User.user_id],
+        set_={
+            "username": stmt.excluded.username,
+            "team_name": stmt.excluded.team_name,
+            "is_active": stmt.excluded.is_active,
+        },
+        where=tuple_(models.User.username, models.User.team_name, models.User.is_active).is_distinct_from(
+            tuple_(stmt.excluded.username, stmt.excluded.team_name, stmt.excluded.is_active)
+        )
+    ).returning(models.User.user_id, literal_column("xmax = 0").label("inserted"))
+    
+    is_active = {member.user_id: member.is_active for member in members}
+    added = []
+    updated = []
+    active_delta = 0
+    for user_id, inserted in db.execute(stmt):
+        if inserted:
+            added.append(user_id)
+            active_delta += int(is_active[user_id])
+        elif user_id in existing:
+            user_team, was_active = existing[user_id]
+            updated.append(user_id)
+            affected_teams.add(user_team)
+            active_delta += int(is_active[user_id]) - int(was_active)
+    
+    # Пользователь, созданный параллельно после нашего чтения, не попал ни в одну из групп:
+    # его прежнее состояние неизвестно, счётчики сводки посчитать нельзя
+    if len(existing) + len(added) != len(members):
+        raise ConcurrentUpdateError(f"Участники команды {team_name} созданы параллельно")
+    
+    return added, updated, active_delta, affected_teams
 
 
 def get_user(db: Session, user_id: str):
@@ -51,46 +145,290 @@ def get_user(db: Session, user_id: str):
 
 
 def update_user_active(db: Session, user_update: schemas.UserUpdateActive):
-    db_user = get_user(db, user_update.user_id)
+    # Блокируем пользователя, чтобы дельта active_users считалась от актуального состояния
+    db_user = db.query(models.User).filter(
+        models.User.user_id == user_update.user_id
+    ).with_for_update().populate_existing().first()
     if not db_user:
         return None
     
+    active_delta = int(user_update.is_active) - int(bool(db_user.is_active))
     db_user.is_active = user_update.is_active
+    roster_cache.mark_dirty(db, [db_user.team_name])
+    db.flush()
+    stats_rollup.apply_deltas(db, active_users=active_delta)
+    # Ответ собираем до коммита: после него объект истёк бы и перечитывался
+    response = {
+        "user_id": db_user.user_id,
+        "username": db_user.username,
+        "team_name": db_user.team_name,
+        "is_active": db_user.is_active,
+    }
     db.commit()
-    db.refresh(db_user)
-    return db_user
+    return response
 
 
 def get_pr(db: Session, pr_id: str):
     return db.query(models.PullRequest).filter(models.PullRequest.pull_request_id == pr_id).first()
 
 
-def create_pr(db: Session, pr: schemas.PullRequestCreate, reviewers: List[str]):
-    db_pr = models.PullRequest(
-        pull_request_id=pr.pull_request_id,
-        pull_request_name=pr.pull_request_name,
-        author_id=pr.author_id,
-        assigned_reviewers=reviewers
-    )
-    db.add(db_pr)
-    db.commit()
-    db.refresh(db_pr)
-    return db_pr
+# Колонки PullRequestResponse: ответы по PR собираются из них без ORM-объектов
+PR_RESPONSE_COLUMNS = (
+    models.PullRequest.pull_request_id,
+    models.PullRequest.pull_request_name,
+    models.PullRequest.author_id,
+    models.PullRequest.status,
+    models.PullRequest.assigned_reviewers,
+    models.PullRequest.created_at,
+    models.PullRequest.merged_at,
+)
+
+
+def pr_exists(db: Session, pr_id: str) -> bool:
+    """Занят ли id (по реестру: id архивированных PR тоже заняты)"""
+    return db.query(
+        db.query(models.PullRequestId.pull_request_id).filter(
+            models.PullRequestId.pull_request_id == pr_id
+        ).exists()
+    ).scalar()
 
 
-def merge_pr(db: Session, pr_id: str):
-    db_pr = get_pr(db, pr_id)
-    if not db_pr:
+def get_pr_for_reassign(db: Session, pr_id: str, candidates: Optional[List[str]] = None):
+    """
+    Поля PullRequestResponse открытого PR с блокировкой строки до конца транзакции
+    (SELECT ... FOR UPDATE OF pull_requests). Читается только секция открытых PR:
+    None - PR смержен или его нет (различает pr_exists). Если переданы кандидаты
+    на замену, тем же запросом читаются их счётчики нагрузки (loads: user_id -> open_review_count).
+    """
+    PR = models.PullRequest
+    columns = list(PR_RESPONSE_COLUMNS)
+    if candidates is not None:
+        columns.append(select(
+            func.jsonb_object_agg(models.User.user_id, models.User.open_review_count, type_=JSONB)
+        ).where(
+            models.User.user_id == any_(literal(candidates, ARRAY(String)))
+        ).scalar_subquery().label("loads"))
+
+    return db.execute(
+        select(*columns).where(PR.pull_request_id == pr_id, PR.status == "OPEN").with_for_update(of=PR)
+    ).first()
+
+
+def create_pr(db: Session, pr: schemas.PullRequestCreate, reviewers: List[str], commit: bool = True) -> Optional[Dict]:
+    """
+    Создаёт PR одним запросом: id занимается в реестре INSERT ... ON CONFLICT DO NOTHING
+    RETURNING, а PR, pr_reviewers, счётчики нагрузки и сводка пишутся в том же запросе
+    через CTE и только если id оказался свободен. None, если PR с таким id уже есть
+    (в том числе созданный параллельно) - тогда в базе ничего не меняется.
+    С commit=False транзакцию завершает вызывающий (например, записав в неё ключ идемпотентности).
+    """
+    PR = models.PullRequest
+    registered = pg_insert(models.PullRequestId).values(
+        pull_request_id=pr.pull_request_id
+    ).on_conflict_do_nothing().returning(models.PullRequestId.pull_request_id).cte("registered")
+    # Python-значения по умолчанию в DML внутри CTE не подставляются - задаём явно
+    created = insert(PR).from_select(
+        ["pull_request_id", "pull_request_name", "author_id", "status", "assigned_reviewers", "version"],
+        select(
+            registered.c.pull_request_id,
+            literal(pr.pull_request_name),
+            literal(pr.author_id),
+            literal("OPEN"),
+            literal(reviewers, ARRAY(String)),
+            literal(1)
+        ),
+        include_defaults=False
+    ).returning(*PR_RESPONSE_COLUMNS).cte("created")
+    is_created = select(created.c.pull_request_id).exists()
+
+    links = insert(models.PRReviewer).from_select(
+        ["pull_request_id", "user_id"],
+        select(created.c.pull_request_id, func.unnest(created.c.assigned_reviewers)),
+        include_defaults=False  # status и assigned_at - серверные значения по умолчанию
+    ).cte("links")
+    counts = update(models.User).where(
+        models.User.user_id == any_(literal(reviewers, ARRAY(String))),
+        is_created
+    ).values(
+        open_review_count=models.User.open_review_count + 1
+    ).returning(models.User.user_id, models.User.is_active).cte("counts")
+    rollup = stats_rollup.prs_created_update(
+        [(pr.pull_request_id, pr.pull_request_name, len(reviewers))]
+    ).where(is_created).cte("rollup")
+
+    inactive = select(func.count()).select_from(counts).where(counts.c.is_active == False).scalar_subquery()
+    row = db.execute(
+        select(created, inactive.label("inactive_reviewers")).add_cte(links, rollup)
+    ).first()
+    if row is None:
         return None
-    
-    # Если уже MERGED, не меняем
-    if db_pr.status != "MERGED":
-        db_pr.status = "MERGED"
-        db_pr.merged_at = func.now()
+    if row.inactive_reviewers:
+        raise ConcurrentUpdateError(f"Ревьюверы деактивированы параллельно: {reviewers}")
+
+    if commit:
         db.commit()
-        db.refresh(db_pr)
-    
-    return db_pr
+    return {column.key: row._mapping[column.key] for column in PR_RESPONSE_COLUMNS}
+
+
+def get_existing_pr_ids(db: Session, pr_ids: List[str]) -> Set[str]:
+    """Занятые id из pr_ids (по реестру, вместе с архивированными)"""
+    if not pr_ids:
+        return set()
+
+    rows = db.query(models.PullRequestId.pull_request_id).filter(
+        models.PullRequestId.pull_request_id.in_(pr_ids)
+    ).all()
+    return {pr_id for pr_id, in rows}
+
+
+def get_user_teams(db: Session, user_ids: List[str]) -> Dict[str, str]:
+    """Команды пользователей одним запросом: user_id -> team_name"""
+    if not user_ids:
+        return {}
+
+    rows = db.query(models.User.user_id, models.User.team_name).filter(
+        models.User.user_id.in_(user_ids)
+    ).all()
+    return {user_id: team_name for user_id, team_name in rows}
+
+
+def create_prs_bulk(db: Session, prs: List[schemas.PullRequestCreate], reviewers: Dict[str, List[str]]):
+    """
+    Вставляет PR многострочными INSERT (реестр id, pull_requests и pr_reviewers) и
+    обновляет счётчики нагрузки одним UPDATE. Коммит остаётся за вызывающим.
+    """
+    if not prs:
+        return
+
+    db.execute(insert(models.PullRequestId), [{"pull_request_id": pr.pull_request_id} for pr in prs])
+    db.execute(insert(models.PullRequest), [
+        {
+            "pull_request_id": pr.pull_request_id,
+            "pull_request_name": pr.pull_request_name,
+            "author_id": pr.author_id,
+            "assigned_reviewers": reviewers[pr.pull_request_id],
+        }
+        for pr in prs
+    ])
+
+    links = [
+        {"pull_request_id": pr.pull_request_id, "user_id": user_id}
+        for pr in prs
+        for user_id in reviewers[pr.pull_request_id]
+    ]
+    if links:
+        db.execute(insert(models.PRReviewer), links)
+
+    deltas: Dict[str, int] = {}
+    for link in links:
+        deltas[link["user_id"]] = deltas.get(link["user_id"], 0) + 1
+    adjust_open_review_counts(db, deltas)
+
+    stats_rollup.record_prs_created(db, [
+        (pr.pull_request_id, pr.pull_request_name, len(reviewers[pr.pull_request_id]))
+        for pr in prs
+    ])
+
+
+def merge_pr(db: Session, pr_id: str, commit: bool = True):
+    # Статус меняется одним условным UPDATE: из двух параллельных merge
+    # счётчики и сводку обновит только тот, кто застал PR открытым.
+    # С commit=False транзакцию завершает вызывающий
+    merged = db.execute(
+        update(models.PullRequest).where(
+            and_(
+                models.PullRequest.pull_request_id == pr_id,
+                models.PullRequest.status == "OPEN"
+            )
+        ).values(
+            status="MERGED",
+            merged_at=func.now(),
+            version=models.PullRequest.version + 1
+        ).returning(*PR_RESPONSE_COLUMNS).execution_options(synchronize_session=False)
+    ).first()
+
+    if merged:
+        db.query(models.PRReviewer).filter(
+            models.PRReviewer.pull_request_id == pr_id
+        ).update({"status": "MERGED"}, synchronize_session=False)
+        adjust_open_review_counts(db, {user_id: -1 for user_id in merged.assigned_reviewers or []})
+        stats_rollup.apply_deltas(db, open_pr=-1, merged_pr=1)
+        if commit:
+            db.commit()
+        return merged._asdict()
+
+    # Если PR уже MERGED (или его нет), ничего не меняем
+    row = db.query(*PR_RESPONSE_COLUMNS).filter(
+        models.PullRequest.pull_request_id == pr_id,
+        models.PullRequest.status == "MERGED"
+    ).first()
+    return row._asdict() if row else None
+
+
+def get_prs_for_update(db: Session, pr_ids: List[str], status: Optional[str] = None) -> Dict[str, Dict]:
+    """
+    Поля ответа PR по списку id с блокировкой строк в порядке id
+    (тот же порядок, что у массовой деактивации). Со status читается только
+    его секция. Отсутствующих id (и PR в другом статусе) в результате нет.
+    """
+    if not pr_ids:
+        return {}
+
+    query = db.query(*PR_RESPONSE_COLUMNS).filter(
+        models.PullRequest.pull_request_id == any_(literal(pr_ids, ARRAY(String)))
+    )
+    if status:
+        query = query.filter(models.PullRequest.status == status)
+    rows = query.order_by(models.PullRequest.pull_request_id).with_for_update(of=models.PullRequest).all()
+    return {row.pull_request_id: row._asdict() for row in rows}
+
+
+def merge_prs_bulk(db: Session, pr_ids: List[str]) -> Dict[str, Dict]:
+    """
+    Переводит открытые PR из списка в MERGED одним UPDATE ... WHERE pull_request_id = ANY(...)
+    RETURNING и обновляет pr_reviewers, счётчики и сводку. Строки блокируются в порядке id.
+    Возвращает поля ответа смерженных PR; коммит остаётся за вызывающим.
+    """
+    if not pr_ids:
+        return {}
+
+    PR = models.PullRequest
+    locked = select(PR.pull_request_id).where(
+        and_(
+            PR.pull_request_id == any_(literal(pr_ids, ARRAY(String))),
+            PR.status == "OPEN"
+        )
+    ).order_by(PR.pull_request_id).with_for_update().subquery()
+
+    merged = {
+        row.pull_request_id: row._asdict()
+        for row in db.execute(
+            update(PR).where(
+                and_(
+                    PR.pull_request_id == locked.c.pull_request_id,
+                    PR.status == "OPEN"
+                )
+            ).values(
+                status="MERGED",
+                merged_at=func.now(),
+                version=PR.version + 1
+            ).returning(*PR_RESPONSE_COLUMNS).execution_options(synchronize_session=False)
+        )
+    }
+    if not merged:
+        return merged
+
+    db.query(models.PRReviewer).filter(
+        models.PRReviewer.pull_request_id == any_(literal(list(merged), ARRAY(String)))
+    ).update({"status": "MERGED"}, synchronize_session=False)
+
+    deltas: Dict[str, int] = {}
+    for pr in merged.values():
+        for user_id in pr["assigned_reviewers"] or []:
+            deltas[user_id] = deltas.get(user_id, 0) - 1
+    adjust_open_review_counts(db, deltas)
+    stats_rollup.apply_deltas(db, open_pr=-len(merged), merged_pr=len(merged))
+    return merged
 
 
 def get_active_team_members(db: Session, team_name: str, exclude_user_id: str = None):
@@ -107,7 +445,220 @@ def get_active_team_members(db: Session, team_name: str, exclude_user_id: str =
     return query.all()
 
 
-def get_prs_by_reviewer(db: Session, user_id: str):
-    return db.query(models.PullRequest).filter(
-        models.PullRequest.assigned_reviewers.contains([user_id])
-    ).all()
\ No newline at end of file
+def reassign_pr_reviewer(db: Session, pr_id: str, old_user_id: str, new_user_id: str) -> Dict:
+    """
+    Заменяет ревьювера одним запросом: assigned_reviewers, pr_reviewers и счётчики
+    нагрузки меняются в CTE; счётчики сводки от замены не меняются, её строку не блокируем. PR должен быть заблокирован
+    вызывающим (get_pr_for_reassign). Возвращает поля PullRequestResponse после замены;
+    ConcurrentUpdateError, если новый ревьювер успел стать неактивным.
+    """
+    PR = models.PullRequest
+    PRR = models.PRReviewer
+    updated = update(PR).where(PR.pull_request_id == pr_id, PR.status == "OPEN").values(
+        assigned_reviewers=func.array_replace(PR.assigned_reviewers, old_user_id, new_user_id),
+        version=PR.version + 1
+    ).returning(*PR_RESPONSE_COLUMNS).cte("updated")
+    unlinked = delete(PRR).where(PRR.pull_request_id == pr_id, PRR.user_id == old_user_id).cte("unlinked")
+    linked = insert(PRR).values(pull_request_id=pr_id, user_id=new_user_id, status="OPEN").cte("linked")
+    counts = update(models.User).where(
+        models.User.user_id.in_([old_user_id, new_user_id])
+    ).values(
+        open_review_count=models.User.open_review_count + case((models.User.user_id == new_user_id, 1), else_=-1)
+    ).returning(models.User.user_id, models.User.is_active).cte("counts")
+
+    new_is_active = select(counts.c.is_active).where(counts.c.user_id == new_user_id).scalar_subquery()
+    row = db.execute(
+        select(updated, new_is_active.label("new_is_active")).add_cte(unlinked, linked)
+    ).one()
+    if not row.new_is_active:
+        raise ConcurrentUpdateError(f"Ревьювер {new_user_id} деактивирован параллельно")
+
+    db.commit()
+    return {column.key: row._mapping[column.key] for column in PR_RESPONSE_COLUMNS}
+
+
+def pr_short(row) -> Dict:
+    """Поля PullRequestShort из строки get_prs_by_reviewer"""
+    return {
+        "pull_request_id": row.pull_request_id,
+        "pull_request_name": row.pull_request_name,
+        "author_id": row.author_id,
+        "status": row.status,
+    }
+
+
+def get_prs_by_reviewer(db: Session, user_id: str, status: Optional[str] = None,
+                        after: Optional[Tuple[datetime, str]] = None, limit: Optional[int] = None):
+    """
+    Запрос PR ревьювера (только колонки PullRequestShort и assigned_at назначения)
+    в порядке (assigned_at, pull_request_id). after - ключ последней полученной строки
+    для keyset-пагинации. Каждый статус читается диапазоном индекса
+    (user_id, status, assigned_at, pull_request_id); без фильтра по статусу два
+    диапазона сливаются (Merge Append) без сортировки всей истории.
+    Возвращает Query: вызывающий сам решает, .all() или yield_per().
+    """
+    def by_status(value: str):
+        PR, PRR = models.PullRequest, models.PRReviewer
+        # Равенство статусов в соединении даёт и отсечение секций pull_requests
+        part = select(
+            PR.pull_request_id, PR.pull_request_name, PR.author_id, PR.status, PRR.assigned_at
+        ).join(
+            PR, and_(PR.pull_request_id == PRR.pull_request_id, PR.status == PRR.status)
+        ).where(
+            PRR.user_id == user_id, PRR.status == value
+        )
+        if after:
+            part = part.where(tuple_(PRR.assigned_at, PRR.pull_request_id) > tuple_(*after))
+        if limit:
+            part = part.order_by(PRR.assigned_at, PRR.pull_request_id).limit(limit)
+        return part
+
+    if status:
+        rows = by_status(status).subquery()
+    else:
+        rows = union_all(by_status("OPEN"), by_status("MERGED")).subquery()
+
+    query = db.query(*rows.c).order_by(rows.c.assigned_at, rows.c.pull_request_id)
+    if limit:
+        query = query.limit(limit)
+
+    return query
+
+
+def get_open_review_counts(db: Session, user_ids: List[str]) -> Dict[str, int]:
+    """Текущее число открытых ревью (счётчик users.open_review_count)"""
+    if not user_ids:
+        return {}
+
+    rows = db.query(models.User.user_id, models.User.open_review_count).filter(
+        models.User.user_id.in_(user_ids)
+    ).all()
+    return {user_id: count for user_id, count in rows}
+
+
+def adjust_open_review_counts(db: Session, deltas: Dict[str, int]):
+    """
+    Атомарно изменяет счётчики открытых ревью одним UPDATE.
+    UPDATE блокирует строки пользователей, поэтому параллельная деактивация
+    либо дождётся коммита и увидит новые назначения, либо закоммитится раньше -
+    тогда назначение на неактивного пользователя даёт ConcurrentUpdateError.
+    Коммит остаётся за вызывающим.
+    """
+    deltas = {user_id: delta for user_id, delta in deltas.items() if delta}
+    if not deltas:
+        return
+
+    rows = db.execute(
+        update(models.User).where(
+            models.User.user_id.in_(list(deltas))
+        ).values(
+            open_review_count=models.User.open_review_count + case(deltas, value=models.User.user_id, else_=0)
+        ).returning(models.User.user_id, models.User.is_active).execution_options(synchronize_session=False)
+    ).all()
+
+    inactive = sorted(user_id for user_id, is_active in rows if not is_active and deltas[user_id] > 0)
+    if inactive:
+        raise ConcurrentUpdateError(f"Ревьюверы деактивированы параллельно: {inactive}")
+
+
+def _recordset(name: str, rows: List[Dict], *columns):
+    """
+    Табличный источник из одного JSONB-параметра (jsonb_to_recordset):
+    тысячи строк без тысяч bind-параметров и без компиляции огромного VALUES.
+    """
+    return func.jsonb_to_recordset(
+        literal(rows, JSONB)
+    ).table_valued(*columns).render_derived(name=name, with_types=True)
+
+
+def apply_reviewer_changes(db: Session, new_reviewers: Dict[str, List[str]],
+                           replacements: List[Tuple[str, str, Optional[str]]]) -> Set[str]:
+    """
+    Применяет пакет замен ревьюверов набором запросов, не зависящим от числа PR.
+
+    new_reviewers - итоговый assigned_reviewers по pull_request_id,
+    replacements - тройки (pull_request_id, старый ревьювер, новый или None).
+    pull_requests обновляются одним UPDATE ... FROM только для PR,
+    которые всё ещё OPEN; возвращает их id. Коммит остаётся за вызывающим.
+    """
+    if not new_reviewers:
+        return set()
+
+    rows = _recordset(
+        "new_reviewers",
+        [{"pull_request_id": pr_id, "assigned_reviewers": reviewers} for pr_id, reviewers in new_reviewers.items()],
+        column("pull_request_id", String),
+        column("assigned_reviewers", ARRAY(String))
+    )
+
+    updated_ids = set(db.execute(
+        update(models.PullRequest).where(
+            and_(
+                models.PullRequest.pull_request_id == rows.c.pull_request_id,
+                models.PullRequest.status == "OPEN"
+            )
+        ).values(
+            assigned_reviewers=rows.c.assigned_reviewers,
+            version=models.PullRequest.version + 1
+        ).returning(models.PullRequest.pull_request_id).execution_options(synchronize_session=False)
+    ).scalars())
+
+    replacements = [item for item in replacements if item[0] in updated_ids]
+    if not replacements:
+        return updated_ids
+
+    # Замены - переписываем user_id в существующих строках, снятия без замены - удаляем
+    swaps = [
+        {"pull_request_id": pr_id, "old_user_id": old_user_id, "new_user_id": new_user_id}
+        for pr_id, old_user_id, new_user_id in replacements
+        if new_user_id
+    ]
+    if swaps:
+        swap_rows = _recordset(
+            "swaps", swaps,
+            column("pull_request_id", String),
+            column("old_user_id", String),
+            column("new_user_id", String)
+        )
+        db.execute(
+            update(models.PRReviewer).where(
+                and_(
+                    models.PRReviewer.pull_request_id == swap_rows.c.pull_request_id,
+                    models.PRReviewer.user_id == swap_rows.c.old_user_id
+                )
+            ).values(
+                user_id=swap_rows.c.new_user_id,
+                assigned_at=func.now()
+            ).execution_options(synchronize_session=False)
+        )
+
+    removals = [
+        {"pull_request_id": pr_id, "user_id": old_user_id}
+        for pr_id, old_user_id, new_user_id in replacements
+        if not new_user_id
+    ]
+    if removals:
+        removal_rows = _recordset(
+            "removals", removals,
+            column("pull_request_id", String),
+            column("user_id", String)
+        )
+        db.execute(
+            delete(models.PRReviewer).where(
+                and_(
+                    models.PRReviewer.pull_request_id == removal_rows.c.pull_request_id,
+                    models.PRReviewer.user_id == removal_rows.c.user_id
+                )
+            ).execution_options(synchronize_session=False)
+        )
+
+    deltas: Dict[str, int] = {}
+    for _, old_user_id, new_user_id in replacements:
+        deltas[old_user_id] = deltas.get(old_user_id, 0) - 1
+        if new_user_id:
+            deltas[new_user_id] = deltas.get(new_user_id, 0) + 1
+    adjust_open_review_counts(db, deltas)
+
+    removed = [pr_id for pr_id, _, new_user_id in replacements if not new_user_id]
+    stats_rollup.record_reviewers_removed(db, removed)
+    return updated_ids
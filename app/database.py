@@ -1,18 +1,102 @@
-from sqlalchemy import create_engine
+from sqlalchemy import create_engine, event
+from sqlalchemy.exc import TimeoutError as PoolTimeoutError
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker, create_async_engine
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import NullPool
 from dotenv import load_dotenv
+import os
+import time
 
-DATABASE_URL = "postgresql://user:password@db:5432/pr_reviewer"
+from .metrics import pool_metrics, query_metrics
 
-engine = create_engine(DATABASE_URL)
+load_dotenv()
+
+DATABASE_URL = os.getenv("DATABASE_URL", "postgresql://user:password@db:5432/pr_reviewer")
+
+# Настройки пула соединений
+DB_POOL_SIZE = int(os.getenv("DB_POOL_SIZE", "10"))
+DB_MAX_OVERFLOW = int(os.getenv("DB_MAX_OVERFLOW", "20"))
+DB_POOL_TIMEOUT = float(os.getenv("DB_POOL_TIMEOUT", "30"))
+DB_POOL_RECYCLE = int(os.getenv("DB_POOL_RECYCLE", "1800"))
+DB_POOL_PRE_PING = os.getenv("DB_POOL_PRE_PING", "true").lower() == "true"
+DB_STATEMENT_TIMEOUT_MS = int(os.getenv("DB_STATEMENT_TIMEOUT_MS", "0"))
+# За PgBouncer (transaction pooling): свой пул не держим, без prepared statements и startup-параметров
+DB_PGBOUNCER_MODE = os.getenv("DB_PGBOUNCER_MODE", "false").lower() == "true"
+
+
+def _engine_options(async_driver: bool = False) -> dict:
+    if DB_PGBOUNCER_MODE:
+        options = {"poolclass": NullPool}
+        if async_driver:
+            options["connect_args"] = {"statement_cache_size": 0, "prepared_statement_cache_size": 0}
+        return options
+
+    options = {
+        "pool_size": DB_POOL_SIZE,
+        "max_overflow": DB_MAX_OVERFLOW,
+        "pool_timeout": DB_POOL_TIMEOUT,
+        "pool_recycle": DB_POOL_RECYCLE,
+        "pool_pre_ping": DB_POOL_PRE_PING,
+    }
+    if DB_STATEMENT_TIMEOUT_MS:
+        if async_driver:
+            options["connect_args"] = {"server_settings": {"statement_timeout": str(DB_STATEMENT_TIMEOUT_MS)}}
+        else:
+            options["connect_args"] = {"options": f"-c statement_timeout={DB_STATEMENT_TIMEOUT_MS}"}
+    return options
+
+
+def _set_local_statement_timeout(conn):
+    # PgBouncer не пропускает startup-параметры, поэтому таймаут ставим на транзакцию
+    conn.exec_driver_sql(f"SET LOCAL statement_timeout = {DB_STATEMENT_TIMEOUT_MS}")
+
+
+engine = create_engine(DATABASE_URL, **_engine_options())
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 Base = declarative_base()
 
+# Асинхронный режим (asyncpg) включается явно
+DB_ASYNC_MODE = os.getenv("DB_ASYNC_MODE", "false").lower() == "true"
+ASYNC_DATABASE_URL = os.getenv(
+    "ASYNC_DATABASE_URL",
+    DATABASE_URL.replace("postgresql://", "postgresql+asyncpg://", 1)
+)
+
+async_engine = create_async_engine(
+    ASYNC_DATABASE_URL, **_engine_options(async_driver=True)
+) if DB_ASYNC_MODE else None
+AsyncSessionLocal = async_sessionmaker(
+    async_engine, class_=AsyncSession, autoflush=False
+) if DB_ASYNC_MODE else None
+
+if DB_PGBOUNCER_MODE and DB_STATEMENT_TIMEOUT_MS:
+    event.listen(engine, "begin", _set_local_statement_timeout)
+    if async_engine is not None:
+        event.listen(async_engine.sync_engine, "begin", _set_local_statement_timeout)
+
+pool_metrics.attach(engine)
+query_metrics.attach(engine)
+if async_engine is not None:
+    query_metrics.attach(async_engine.sync_engine)
+
 
 def get_db():
     db = SessionLocal()
     try:
+        # Берём соединение сразу, чтобы измерить ожидание в пуле
+        started = time.perf_counter()
+        try:
+            db.connection()
+        except PoolTimeoutError:
+            pool_metrics.record_timeout()
+            raise
+        pool_metrics.record_wait(time.perf_counter() - started)
         yield db
     finally:
-        db.close()
\ No newline at end of file
+        db.close()
+
+
+async def get_async_db():
+    async with AsyncSessionLocal() as db:
+        yield db
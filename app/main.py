@@ -1,31 +1,125 @@
-from fastapi import FastAPI
+import time
+
+# Отсчёт времени старта воркера: импорт приложения и lifespan (без запуска интерпретатора)
+_STARTED_AT = time.perf_counter()
+
+from fastapi import FastAPI, Request, status
+from fastapi.responses import JSONResponse
 from contextlib import asynccontextmanager
+import logging
 import os
-from . import models
-from .database import engine
+from .database import SessionLocal, engine, async_engine, DB_ASYNC_MODE
 from .routers import teams, users, pull_requests, health, stats
-from .scripts.init_test_data import init_test_data
+from .services.roster_cache import ROSTER_CACHE_NOTIFY, RosterInvalidationListener
+from .services.concurrency import ConcurrentUpdateError
+from .services.deactivation_jobs import DEACTIVATION_JOBS_WORKER, DeactivationJobWorker
+from .services.partitions import PartitionMaintainer
+from .metrics import QueryBudgetExceeded, constant_collector, registry
+from .middleware import QueryStatsMiddleware
+from .responses import FastJSONResponse
+
+
+logger = logging.getLogger("app.startup")
+
+# Цель по времени старта воркера: раскатка и автоскейлинг добавляют мощность быстрее секунды
+STARTUP_TARGET_MS = float(os.getenv("STARTUP_TARGET_MS", "1000"))
 
 
 @asynccontextmanager
 async def lifespan(app: FastAPI):
-    models.Base.metadata.create_all(bind=engine)
+    lifespan_started = time.perf_counter()
+    # Старт не ходит в базу: схема создаётся миграциями (alembic upgrade head),
+    # демо-данные - явно (python -m app.scripts.init_test_data)
+
+    # Синхронизация кэша составов команд между воркерами
+    listener = None
+    if ROSTER_CACHE_NOTIFY:
+        listener = RosterInvalidationListener(engine)
+        listener.start()
+
+    # Фоновые массовые деактивации (POST /team/deactivateUsers?async=true)
+    job_worker = None
+    if DEACTIVATION_JOBS_WORKER:
+        job_worker = DeactivationJobWorker(SessionLocal)
+        job_worker.start()
 
-    init_test_data() # Тестовые данные для демонстрации
+    # Месячные секции pull_requests на PR_PARTITION_MONTHS_AHEAD вперёд (первый проход - в фоне)
+    partition_maintainer = PartitionMaintainer(SessionLocal)
+    partition_maintainer.start()
+
+    ready = time.perf_counter()
+    startup_ms = (ready - _STARTED_AT) * 1000
+    registry.register_collector(constant_collector(
+        "app_startup_seconds", "Время старта воркера: импорт приложения и lifespan", startup_ms / 1000
+    ))
+    logger.log(
+        logging.WARNING if startup_ms > STARTUP_TARGET_MS else logging.INFO,
+        f"Воркер готов за {startup_ms:.0f} мс (импорт {(lifespan_started - _STARTED_AT) * 1000:.0f} мс, "
+        f"lifespan {(ready - lifespan_started) * 1000:.0f} мс; цель {STARTUP_TARGET_MS:.0f} мс)"
+    )
 
     yield
 
+    partition_maintainer.stop()
+    if job_worker:
+        job_worker.stop()
+    if listener:
+        listener.stop()
+    if async_engine is not None:
+        await async_engine.dispose()
+
 app = FastAPI(
     title="PR Reviewer Assignment Service",
     description="Сервис для автоматического назначения ревьюеров на Pull Request'ы",
     version="1.0.0",
-    lifespan=lifespan
+    lifespan=lifespan,
+    default_response_class=FastJSONResponse
 )
 
+@app.exception_handler(ConcurrentUpdateError)
+async def concurrent_update_handler(request: Request, exc: ConcurrentUpdateError):
+    # Повторы не помогли - клиенту стоит повторить запрос
+    return JSONResponse(
+        status_code=status.HTTP_409_CONFLICT,
+        content={
+            "detail": {
+                "error": {
+                    "code": "CONCURRENT_UPDATE",
+                    "message": "resource was modified concurrently, retry the request"
+                }
+            }
+        }
+    )
+
+
+@app.exception_handler(QueryBudgetExceeded)
+async def query_budget_handler(request: Request, exc: QueryBudgetExceeded):
+    # Только при QUERY_BUDGET_STRICT=true: сигнал регрессии числа запросов
+    return JSONResponse(
+        status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+        content={
+            "detail": {
+                "error": {
+                    "code": "QUERY_BUDGET_EXCEEDED",
+                    "message": str(exc)
+                }
+            }
+        }
+    )
+
+
+app.add_middleware(QueryStatsMiddleware)
+
 # Подключаем роутеры
 app.include_router(teams.router)
-app.include_router(users.router)
-app.include_router(pull_requests.router)
+if DB_ASYNC_MODE:
+    # Горячие эндпоинты PR и пользователей работают через asyncpg
+    from .routers import users_async, pull_requests_async
+    app.include_router(users_async.router)
+    app.include_router(pull_requests_async.router)
+else:
+    app.include_router(users.router)
+    app.include_router(pull_requests.router)
 app.include_router(health.router)
 app.include_router(stats.router)
 
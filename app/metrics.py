@@ -0,0 +1,357 @@
+"""
+Метрики процесса, собираемые в памяти без внешних зависимостей.
+"""
+import bisect
+import threading
+import time
+from contextvars import ContextVar, Token
+from typing import Callable, Dict, Iterable, List, Optional, Sequence, Tuple
+
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+
+# Границы бакетов по умолчанию (секунды), как в клиентах Prometheus
+DEFAULT_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+# Сэмпл для экспорта: (суффикс имени, метки, значение)
+Sample = Tuple[str, Dict[str, str], float]
+
+
+class Histogram:
+    """Гистограмма с фиксированными бакетами: observe - поиск бакета и сложение под блокировкой"""
+    type = "histogram"
+
+    def __init__(self, name: str, help_text: str, labelnames: Sequence[str] = (),
+                 buckets: Sequence[float] = DEFAULT_BUCKETS):
+        self.name = name
+        self.help = help_text
+        self.labelnames = tuple(labelnames)
+        self.buckets = tuple(sorted(buckets))
+        self._lock = threading.Lock()
+        # метки -> [счётчики по бакетам (+Inf последним), сумма]
+        self._series: Dict[Tuple[str, ...], list] = {}
+
+    def observe(self, value: float, **labels: str):
+        key = tuple(str(labels[name]) for name in self.labelnames)
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            series = self._series.get(key)
+            if series is None:
+                series = self._series[key] = [[0] * (len(self.buckets) + 1), 0.0]
+            series[0][index] += 1
+            series[1] += value
+
+    def time(self, **labels: str) -> "_Timer":
+        return _Timer(self, labels)
+
+    def samples(self) -> List[Sample]:
+        with self._lock:
+            items = [(key, list(counts), total) for key, (counts, total) in self._series.items()]
+
+        result = []
+        for key, counts, total in items:
+            labels = dict(zip(self.labelnames, key))
+            cumulative = 0
+            for bound, count in zip(self.buckets + (float("inf"),), counts):
+                cumulative += count
+                result.append(("_bucket", {**labels, "le": _format_value(bound)}, cumulative))
+            result.append(("_sum", labels, total))
+            result.append(("_count", labels, cumulative))
+        return result
+
+
+class _Timer:
+    """with HISTOGRAM.time(**labels): ... - длительность блока в секундах"""
+
+    def __init__(self, histogram: Histogram, labels: Dict[str, str]):
+        self.histogram = histogram
+        self.labels = labels
+
+    def __enter__(self):
+        self.started = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        self.histogram.observe(time.perf_counter() - self.started, **self.labels)
+
+
+# Коллектор считывает состояние в момент экспорта: (имя, тип, описание, сэмплы)
+Collector = Callable[[], Iterable[Tuple[str, str, str, List[Sample]]]]
+
+
+class MetricsRegistry:
+    def __init__(self):
+        self._metrics: List = []
+        self._collectors: List[Collector] = []
+
+    def histogram(self, name: str, help_text: str, labelnames: Sequence[str] = (),
+                  buckets: Sequence[float] = DEFAULT_BUCKETS) -> Histogram:
+        metric = Histogram(name, help_text, labelnames, buckets)
+        self._metrics.append(metric)
+        return metric
+
+    def register_collector(self, collector: Collector):
+        self._collectors.append(collector)
+
+    def render(self) -> str:
+        """Текстовый формат экспозиции Prometheus 0.0.4"""
+        families = [(metric.name, metric.type, metric.help, metric.samples()) for metric in self._metrics]
+        for collector in self._collectors:
+            families.extend(collector())
+
+        # Одно семейство могут отдавать несколько коллекторов (например, кэши) - склеиваем
+        merged: Dict[str, Tuple[str, str, List[Sample]]] = {}
+        for name, metric_type, help_text, samples in families:
+            if name in merged:
+                merged[name][2].extend(samples)
+            else:
+                merged[name] = (metric_type, help_text, list(samples))
+
+        lines = []
+        for name, (metric_type, help_text, samples) in merged.items():
+            lines.append(f"# HELP {name} {help_text}")
+            lines.append(f"# TYPE {name} {metric_type}")
+            for suffix, labels, value in samples:
+                lines.append(f"{name}{suffix}{_format_labels(labels)} {_format_value(value)}")
+        return "\n".join(lines) + "\n"
+
+
+def _format_labels(labels: Dict[str, str]) -> str:
+    if not labels:
+        return ""
+    return "{" + ",".join(f'{name}="{_escape(value)}"' for name, value in labels.items()) + "}"
+
+
+def _escape(value) -> str:
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _format_value(value: float) -> str:
+    if value == float("inf"):
+        return "+Inf"
+    if float(value).is_integer():
+        return str(int(value))
+    return repr(float(value))
+
+
+registry = MetricsRegistry()
+
+HTTP_REQUEST_DURATION = registry.histogram(
+    "http_request_duration_seconds", "Длительность HTTP-запросов", ("method", "route", "status")
+)
+DB_QUERIES_PER_REQUEST = registry.histogram(
+    "db_queries_per_request", "Число SQL-запросов на HTTP-запрос", ("route",),
+    buckets=(0, 1, 2, 3, 5, 8, 13, 21, 34, 55, 100)
+)
+POOL_WAIT_SECONDS = registry.histogram(
+    "db_pool_wait_seconds", "Ожидание соединения из пула"
+)
+ASSIGNMENT_DURATION = registry.histogram(
+    "reviewer_assignment_duration_seconds", "Выбор ревьюверов", ("operation",)
+)
+BULK_DEACTIVATION_USERS = registry.histogram(
+    "bulk_deactivation_batch_size", "Число пользователей в запросе массовой деактивации",
+    buckets=(1, 2, 5, 10, 25, 50, 100, 250, 500, 1000)
+)
+BULK_DEACTIVATION_PRS = registry.histogram(
+    "bulk_deactivation_reassigned_prs", "Число переназначений за одну массовую деактивацию",
+    buckets=(0, 1, 5, 10, 50, 100, 500, 1000, 5000, 10000)
+)
+BULK_DEACTIVATION_DURATION = registry.histogram(
+    "bulk_deactivation_duration_seconds", "Длительность массовой деактивации"
+)
+
+
+def constant_collector(name: str, help_text: str, value: float) -> Collector:
+    """Коллектор gauge с постоянным значением (например, время старта воркера)"""
+
+    def collect():
+        return [(name, "gauge", help_text, [("", {}, value)])]
+
+    return collect
+
+
+def cache_collector(cache_name: str, cache) -> Collector:
+    """Коллектор попаданий/промахов кэша с атрибутами hits и misses"""
+
+    def collect():
+        # Устаревший ответ, отданный до фонового обновления, тоже попадание
+        hits, misses = cache.hits + getattr(cache, "stale_hits", 0), cache.misses
+        total = hits + misses
+        labels = {"cache": cache_name}
+        return [
+            ("cache_hits", "counter", "Попадания в кэш", [("_total", labels, hits)]),
+            ("cache_misses", "counter", "Промахи кэша", [("_total", labels, misses)]),
+            ("cache_hit_ratio", "gauge", "Доля попаданий в кэш", [("", labels, hits / total if total else 0.0)]),
+        ]
+
+    return collect
+
+
+class PoolMetrics:
+    """Статистика пула соединений: выдачи, ожидание соединения, таймауты"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._engine = None
+        self.checkouts = 0
+        self.connects = 0
+        self.invalidations = 0
+        self.timeouts = 0
+        self.wait_count = 0
+        self.wait_total = 0.0
+        self.wait_max = 0.0
+
+    def attach(self, engine: Engine):
+        self._engine = engine
+        event.listen(engine, "checkout", self._on_checkout)
+        event.listen(engine, "connect", self._on_connect)
+        event.listen(engine, "invalidate", self._on_invalidate)
+
+    def record_wait(self, seconds: float):
+        with self._lock:
+            self.wait_count += 1
+            self.wait_total += seconds
+            self.wait_max = max(self.wait_max, seconds)
+        POOL_WAIT_SECONDS.observe(seconds)
+
+    def record_timeout(self):
+        with self._lock:
+            self.timeouts += 1
+
+    def snapshot(self) -> dict:
+        pool = self._engine.pool if self._engine is not None else None
+        with self._lock:
+            data = {
+                "checkouts": self.checkouts,
+                "connects": self.connects,
+                "invalidations": self.invalidations,
+                "timeouts": self.timeouts,
+                "wait_avg_ms": (self.wait_total / self.wait_count * 1000) if self.wait_count else 0.0,
+                "wait_max_ms": self.wait_max * 1000,
+            }
+        # У NullPool (режим PgBouncer) нет размера и счётчиков занятых соединений
+        for name in ("size", "checkedout", "checkedin", "overflow"):
+            method = getattr(pool, name, None)
+            data[name] = method() if method else None
+        return data
+
+    def _on_checkout(self, dbapi_connection, connection_record, connection_proxy):
+        with self._lock:
+            self.checkouts += 1
+
+    def _on_connect(self, dbapi_connection, connection_record):
+        with self._lock:
+            self.connects += 1
+
+    def _on_invalidate(self, dbapi_connection, connection_record, exception):
+        with self._lock:
+            self.invalidations += 1
+
+
+pool_metrics = PoolMetrics()
+
+
+def _collect_pool():
+    data = pool_metrics.snapshot()
+    families = [
+        ("db_pool_checkouts", "counter", "Выдачи соединений из пула", [("_total", {}, data["checkouts"])]),
+        ("db_pool_connects", "counter", "Новые соединения с базой", [("_total", {}, data["connects"])]),
+        ("db_pool_invalidations", "counter", "Инвалидированные соединения", [("_total", {}, data["invalidations"])]),
+        ("db_pool_timeouts", "counter", "Таймауты ожидания соединения", [("_total", {}, data["timeouts"])]),
+    ]
+    for name in ("size", "checkedout", "checkedin", "overflow"):
+        if data[name] is not None:
+            families.append((f"db_pool_{name}", "gauge", f"Пул соединений: {name}", [("", {}, data[name])]))
+    return families
+
+
+registry.register_collector(_collect_pool)
+
+
+class QueryBudgetExceeded(Exception):
+    """Запрос к API выполнил больше SQL-запросов, чем разрешено бюджетом"""
+
+
+class RequestQueryStats:
+    """SQL-запросы одного HTTP-запроса: количество, суммарное время, самый долгий"""
+    __slots__ = ("count", "total", "slowest", "slowest_statement", "budget", "strict")
+
+    def __init__(self, budget: Optional[int] = None, strict: bool = False):
+        self.count = 0
+        self.total = 0.0
+        self.slowest = 0.0
+        self.slowest_statement = None
+        self.budget = budget
+        self.strict = strict
+
+    @property
+    def over_budget(self) -> bool:
+        return self.budget is not None and self.count > self.budget
+
+    def allow(self, queries: int):
+        if self.budget is not None:
+            self.budget += queries
+
+    def record(self, seconds: float, statement: str):
+        self.count += 1
+        self.total += seconds
+        if seconds >= self.slowest:
+            self.slowest = seconds
+            self.slowest_statement = statement
+
+
+class QueryMetrics:
+    """
+    Счётчик SQL-запросов по HTTP-запросам. Текущий запрос хранится в ContextVar:
+    контекст копируется в threadpool синхронных обработчиков и в greenlet
+    AsyncSession.run_sync, поэтому запросы из них попадают в нужную статистику.
+    """
+
+    def __init__(self):
+        self._current: ContextVar[Optional[RequestQueryStats]] = ContextVar("request_query_stats", default=None)
+
+    def attach(self, engine: Engine):
+        event.listen(engine, "before_cursor_execute", self._before_cursor_execute)
+        event.listen(engine, "after_cursor_execute", self._after_cursor_execute)
+        event.listen(engine, "handle_error", self._handle_error)
+
+    def start_request(self, budget: Optional[int] = None, strict: bool = False) -> Token:
+        return self._current.set(RequestQueryStats(budget, strict))
+
+    def current(self) -> Optional[RequestQueryStats]:
+        return self._current.get()
+
+    def finish_request(self, token: Token):
+        self._current.reset(token)
+
+    def allow(self, queries: int = 1):
+        """
+        Расширяет бюджет текущего запроса на служебные SQL-запросы, не зависящие
+        от логики эндпоинта: заполнение кэша при промахе, ключи идемпотентности.
+        """
+        stats = self._current.get()
+        if stats is not None:
+            stats.allow(queries)
+
+    def _before_cursor_execute(self, conn, cursor, statement, parameters, context, executemany):
+        stats = self._current.get()
+        if stats is not None and stats.strict and stats.budget is not None and stats.count >= stats.budget:
+            raise QueryBudgetExceeded(f"Превышен бюджет в {stats.budget} SQL-запросов: {statement[:200]}")
+        conn.info.setdefault("query_started_at", []).append(time.perf_counter())
+
+    def _after_cursor_execute(self, conn, cursor, statement, parameters, context, executemany):
+        started = conn.info["query_started_at"].pop()
+        stats = self._current.get()
+        if stats is not None:
+            stats.record(time.perf_counter() - started, statement)
+
+    def _handle_error(self, exception_context):
+        # Упавший запрос не дойдёт до after_cursor_execute - снимаем его отметку времени
+        conn = exception_context.connection
+        if conn is not None and conn.info.get("query_started_at"):
+            conn.info["query_started_at"].pop()
+
+
+query_metrics = QueryMetrics()
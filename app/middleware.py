@@ -0,0 +1,130 @@
+"""
+Инструментирование HTTP-запросов: число и время SQL-запросов.
+
+Для каждого запроса считаются SQL-запросы (см. metrics.query_metrics), итог
+отдаётся в заголовке Server-Timing и пишется в лог JSON-строкой.
+У эндпоинтов есть бюджет SQL-запросов (QUERY_BUDGETS); превышение логируется,
+а при QUERY_BUDGET_STRICT=true запрос сверх бюджета падает с QueryBudgetExceeded -
+так N+1 ловится на смоук-прогонах и нагрузочном стенде.
+Длительность запроса и число SQL-запросов попадают в гистограммы /metrics
+с меткой шаблона маршрута (значения path-параметров заменены на {имя}).
+"""
+import json
+import logging
+import os
+import time
+from typing import Optional
+
+from starlette.datastructures import MutableHeaders
+
+from .metrics import DB_QUERIES_PER_REQUEST, HTTP_REQUEST_DURATION, query_metrics
+
+logger = logging.getLogger("app.requests")
+
+QUERY_BUDGET_STRICT = os.getenv("QUERY_BUDGET_STRICT", "false").lower() == "true"
+QUERY_BUDGET_DEFAULT = int(os.getenv("QUERY_BUDGET_DEFAULT", "50"))
+# off - не логировать, slow - только медленные и сверх бюджета, all - все запросы
+REQUEST_LOG = os.getenv("REQUEST_LOG", "slow")
+SLOW_REQUEST_MS = float(os.getenv("SLOW_REQUEST_MS", "500"))
+
+# Допустимое число SQL-запросов на вызов эндпоинта (повторы при конфликтах в бюджет не заложены).
+# Служебные запросы - промахи кэша составов и ключи Idempotency-Key - расширяют
+# бюджет сами (query_metrics.allow), сюда закладывается только логика эндпоинта.
+QUERY_BUDGETS = {
+    "/team/add": 6,
+    "/team/sync": 14,
+    "/team/get": 1,
+    "/team/deactivateUsers": 12,
+    "/users/setIsActive": 4,
+    "/users/getReview": 3,
+    "/users/getReview/stream": 3,
+    # create и reassign - один запрос записи (CTE) плюс чтение нагрузки либо блокировка PR
+    "/pullRequest/create": 2,
+    "/pullRequest/createBatch": 8,
+    "/pullRequest/merge": 6,
+    "/pullRequest/reassign": 2,
+    # пакетные: число запросов не зависит от размера пакета
+    "/pullRequest/mergeBatch": 6,
+    "/pullRequest/reassignBatch": 8,
+    "/stats/assignments": 5,
+    "/stats/pr": 5,
+    "/stats/overview": 5,
+    "/health": 0,
+    "/health/pool": 0,
+    "/health/ready": 1,
+    "/metrics": 0,
+}
+
+
+def query_budget(path: str) -> Optional[int]:
+    return QUERY_BUDGETS.get(path, QUERY_BUDGET_DEFAULT)
+
+
+def route_label(scope) -> str:
+    """Шаблон маршрута для меток метрик: число рядов не зависит от id в пути"""
+    if "endpoint" not in scope:
+        return "unmatched"
+    path = scope["path"]
+    for name, value in scope.get("path_params", {}).items():
+        path = path.replace(f"/{value}", f"/{{{name}}}", 1)
+    return path
+
+
+class QueryStatsMiddleware:
+    """ASGI-middleware: статистика SQL-запросов в Server-Timing и логе"""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        started = time.perf_counter()
+        token = query_metrics.start_request(query_budget(scope["path"]), QUERY_BUDGET_STRICT)
+        stats = query_metrics.current()
+        status_code = 500
+
+        async def send_with_timing(message):
+            nonlocal status_code
+            if message["type"] == "http.response.start":
+                status_code = message["status"]
+                # Для потоковых ответов здесь учтены только запросы до начала выдачи
+                headers = MutableHeaders(scope=message)
+                headers.append("Server-Timing", (
+                    f'db;dur={stats.total * 1000:.2f};desc="queries={stats.count}", '
+                    f"total;dur={(time.perf_counter() - started) * 1000:.2f}"
+                ))
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_with_timing)
+        finally:
+            query_metrics.finish_request(token)
+            duration = time.perf_counter() - started
+            route = route_label(scope)
+            HTTP_REQUEST_DURATION.observe(duration, method=scope["method"], route=route, status=str(status_code))
+            DB_QUERIES_PER_REQUEST.observe(stats.count, route=route)
+            self._log(scope, status_code, duration * 1000, stats)
+
+    def _log(self, scope, status_code: int, duration_ms: float, stats):
+        over_budget = stats.over_budget
+        slow = duration_ms >= SLOW_REQUEST_MS
+        if REQUEST_LOG == "off" or (REQUEST_LOG == "slow" and not (over_budget or slow)):
+            return
+
+        record = {
+            "event": "request",
+            "method": scope["method"],
+            "path": scope["path"],
+            "status": status_code,
+            "duration_ms": round(duration_ms, 2),
+            "db_queries": stats.count,
+            "db_ms": round(stats.total * 1000, 2),
+            "db_slowest_ms": round(stats.slowest * 1000, 2),
+            "db_slowest_sql": (stats.slowest_statement or "")[:300] or None,
+            "query_budget": stats.budget,
+        }
+        level = logging.WARNING if over_budget else logging.INFO
+        logger.log(level, json.dumps(record, ensure_ascii=False))
@@ -1,5 +1,5 @@
-from sqlalchemy import Column, String, Boolean, DateTime, ForeignKey
-from sqlalchemy.dialects.postgresql import ARRAY
+from sqlalchemy import Column, String, Boolean, Integer, BigInteger, DateTime, ForeignKey, Index, Text, text
+from sqlalchemy.dialects.postgresql import ARRAY, JSONB
 from sqlalchemy.orm import relationship
 from sqlalchemy.sql import func
 from .database import Base
@@ -21,21 +21,119 @@ class User(Base):
     username = Column(String, nullable=False)
     team_name = Column(String, ForeignKey("teams.team_name"), nullable=False)
     is_active = Column(Boolean, default=True)
+    open_review_count = Column(Integer, nullable=False, default=0, server_default="0")  # открытые PR на ревью
     created_at = Column(DateTime(timezone=True), server_default=func.now())
     
     team = relationship("Team", back_populates="members")
     authored_prs = relationship("PullRequest", foreign_keys="PullRequest.author_id", back_populates="author")
 
 
+class PullRequestId(Base):
+    """
+    Реестр id PR. pull_requests секционирована, и её первичный ключ обязан включать
+    ключи секционирования, поэтому глобальную уникальность pull_request_id держит эта таблица.
+    Id архивированных PR остаются занятыми.
+    """
+    __tablename__ = "pull_request_ids"
+
+    pull_request_id = Column(String, primary_key=True)
+
+
 class PullRequest(Base):
+    """
+    PR. Таблица секционирована по status: открытые PR - в небольшой секции
+    pull_requests_open, мердженые - в pull_requests_merged, которая дополнительно
+    разбита по месяцам created_at (см. services/partitions.py). Merge переносит строку
+    между секциями.
+    """
     __tablename__ = "pull_requests"
     
-    pull_request_id = Column(String, primary_key=True, index=True)
+    pull_request_id = Column(String, ForeignKey("pull_request_ids.pull_request_id", ondelete="CASCADE"), primary_key=True)
     pull_request_name = Column(String, nullable=False)
     author_id = Column(String, ForeignKey("users.user_id"), nullable=False)
-    status = Column(String, default="OPEN")  # OPEN, MERGED
+    status = Column(String, primary_key=True, default="OPEN")  # OPEN, MERGED
     assigned_reviewers = Column(ARRAY(String), default=[])
-    created_at = Column(DateTime(timezone=True), server_default=func.now())
+    created_at = Column(DateTime(timezone=True), primary_key=True, server_default=func.now())
     merged_at = Column(DateTime(timezone=True), nullable=True)
+    # Версия строки для оптимистической блокировки (массовые UPDATE увеличивают её явно)
+    version = Column(Integer, nullable=False, default=1, server_default="1")
     
-    author = relationship("User", foreign_keys=[author_id], back_populates="authored_prs")
\ No newline at end of file
+    author = relationship("User", foreign_keys=[author_id], back_populates="authored_prs")
+
+    __table_args__ = {"postgresql_partition_by": "LIST (status)"}
+    # Ключи секционирования входят в первичный ключ таблицы, но не в идентичность объекта
+    __mapper_args__ = {"version_id_col": version, "primary_key": [pull_request_id]}
+
+
+class PRReviewer(Base):
+    """Назначение ревьювера на PR (нормализованная копия assigned_reviewers для индексного поиска)"""
+    __tablename__ = "pr_reviewers"
+
+    pull_request_id = Column(String, ForeignKey("pull_request_ids.pull_request_id", ondelete="CASCADE"), primary_key=True)
+    user_id = Column(String, ForeignKey("users.user_id"), primary_key=True)
+    status = Column(String, nullable=False, default="OPEN", server_default="OPEN")  # дублирует PullRequest.status
+    assigned_at = Column(DateTime(timezone=True), nullable=False, server_default=func.now())
+
+    __table_args__ = (
+        Index("ix_pr_reviewers_user_id", "user_id", "pull_request_id"),
+        Index("ix_pr_reviewers_open_user_id", "user_id", postgresql_where=text("status = 'OPEN'")),
+        # Ключ постраничной выдачи /users/getReview
+        Index("ix_pr_reviewers_user_status_assigned_at", "user_id", "status", "assigned_at", "pull_request_id"),
+    )
+
+class StatsRollup(Base):
+    """Однострочная сводка для /stats, обновляется инкрементально вместе с записями"""
+    __tablename__ = "stats_rollup"
+
+    id = Column(Integer, primary_key=True, default=1)
+    total_teams = Column(Integer, nullable=False, default=0)
+    total_users = Column(Integer, nullable=False, default=0)
+    active_users = Column(Integer, nullable=False, default=0)
+    total_pr = Column(Integer, nullable=False, default=0)
+    open_pr = Column(Integer, nullable=False, default=0)
+    merged_pr = Column(Integer, nullable=False, default=0)
+    total_reviewers = Column(Integer, nullable=False, default=0)  # сумма размеров assigned_reviewers
+    max_reviewers_pr_id = Column(String, nullable=True)
+    max_reviewers_pr_name = Column(String, nullable=True)
+    max_reviewer_count = Column(Integer, nullable=False, default=0)
+    max_reviewers_stale = Column(Boolean, nullable=False, default=False)  # PR-максимум потерял ревьювера
+    last_pr_created_at = Column(DateTime(timezone=True), nullable=True)
+    data_version = Column(BigInteger, nullable=False, default=0)  # растёт при изменении счётчиков, ключ кэша /stats
+
+
+class IdempotencyKey(Base):
+    """Сохранённый успешный ответ на запрос с заголовком Idempotency-Key"""
+    __tablename__ = "idempotency_keys"
+
+    scope = Column(String, primary_key=True)  # эндпоинт, например pullRequest/create
+    key = Column(String, primary_key=True)
+    request_hash = Column(String, nullable=False)  # sha256 тела запроса
+    status_code = Column(Integer, nullable=False)
+    response_body = Column(Text, nullable=False)
+    created_at = Column(DateTime(timezone=True), server_default=func.now())
+    expires_at = Column(DateTime(timezone=True), nullable=False, index=True)
+
+
+class DeactivationJob(Base):
+    """Фоновая массовая деактивация (POST /team/deactivateUsers?async=true)"""
+    __tablename__ = "deactivation_jobs"
+
+    job_id = Column(String, primary_key=True)
+    team_name = Column(String, nullable=False)
+    user_ids = Column(ARRAY(String), nullable=False)
+    status = Column(String, nullable=False, default="QUEUED", server_default="QUEUED")  # QUEUED, RUNNING, DONE, FAILED
+    processed_users = Column(Integer, nullable=False, default=0, server_default="0")  # сколько user_ids уже обработано
+    deactivated_users = Column(ARRAY(String), nullable=False, default=list, server_default="{}")
+    failed_deactivations = Column(ARRAY(String), nullable=False, default=list, server_default="{}")
+    reassigned_prs = Column(JSONB, nullable=False, default=list, server_default="[]")
+    error = Column(Text)
+    created_at = Column(DateTime(timezone=True), server_default=func.now())
+    started_at = Column(DateTime(timezone=True))
+    heartbeat_at = Column(DateTime(timezone=True))  # обновляется после каждой пачки
+    finished_at = Column(DateTime(timezone=True))
+    processing_time_ms = Column(Integer)
+
+    __table_args__ = (
+        # Очередь: воркер выбирает задачи по статусу в порядке создания
+        Index("ix_deactivation_jobs_status_created_at", "status", "created_at"),
+    )
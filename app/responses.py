@@ -0,0 +1,31 @@
+"""
+Сериализация ответов через orjson.
+
+FastJSONResponse - класс ответа по умолчанию (см. main.py): orjson кодирует
+в разы быстрее json из стандартной библиотеки. Даты в UTC пишутся с суффиксом Z,
+как их сериализует Pydantic, поэтому формат ответов не меняется.
+
+trusted() отдаёт данные, минуя повторную проверку через response_model.
+Только для словарей, собранных из колонок базы или из уже проверенного тела
+запроса: ключи и их порядок должны совпадать со схемой ответа эндпоинта.
+"""
+from typing import Any, Dict, Optional
+
+import orjson
+from fastapi.responses import ORJSONResponse
+
+ORJSON_OPTIONS = orjson.OPT_UTC_Z | orjson.OPT_NON_STR_KEYS
+
+
+def dumps(content: Any) -> bytes:
+    return orjson.dumps(content, option=ORJSON_OPTIONS)
+
+
+class FastJSONResponse(ORJSONResponse):
+    def render(self, content: Any) -> bytes:
+        return dumps(content)
+
+
+def trusted(content: Any, status_code: int = 200, headers: Optional[Dict[str, str]] = None) -> FastJSONResponse:
+    """Ответ из готовых данных без валидации response_model"""
+    return FastJSONResponse(content, status_code=status_code, headers=headers)
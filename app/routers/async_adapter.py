@@ -0,0 +1,24 @@
+"""
+Запуск синхронных обработчиков поверх AsyncSession (режим DB_ASYNC_MODE).
+
+AsyncSession.run_sync выполняет обработчик в greenlet с обычной Session,
+при этом ввод-вывод идёт через asyncpg без потоков из threadpool.
+Поэтому логика эндпоинтов, crud и сервисов общая для обоих режимов.
+"""
+from typing import Any, Callable, Optional, Type
+
+from fastapi import Response
+from pydantic import BaseModel
+from sqlalchemy.ext.asyncio import AsyncSession
+
+
+async def call_sync_handler(db: AsyncSession, handler: Callable, *args,
+                            response_model: Optional[Type[BaseModel]] = None, **kwargs) -> Any:
+    def run(session):
+        result = handler(*args, db=session, **kwargs)
+        # ORM-объекты сериализуем внутри greenlet, пока доступна ленивая загрузка
+        if response_model is not None and not isinstance(result, (Response, BaseModel)):
+            return response_model.model_validate(result, from_attributes=True)
+        return result
+
+    return await db.run_sync(run)
@@ -2,11 +2,76 @@
 Роутер для health check эндпоинтов.
 Простые эндпоинты для мониторинга работы сервиса.
 """
-from fastapi import APIRouter
+from fastapi import APIRouter, Response
+from fastapi.responses import JSONResponse
+from sqlalchemy import text
+from sqlalchemy.exc import SQLAlchemyError
+
+from ..database import async_engine, engine
+from ..metrics import pool_metrics, registry
 
 router = APIRouter(tags=["Health"])
 
+# charset=utf-8 Starlette допишет сам
+PROMETHEUS_CONTENT_TYPE = "text/plain; version=0.0.4"
+
 
 @router.get("/health")
 def health_check():
-    return {"status": "healthy"}
\ No newline at end of file
+    return {"status": "healthy"}
+
+
+@router.get("/health/pool")
+def pool_stats():
+    """
+    Состояние пула соединений и время ожидания соединения
+    """
+    return pool_metrics.snapshot()
+
+
+def _pool_check(pool) -> dict:
+    """Есть ли в пуле свободное соединение (у NullPool лимита нет)"""
+    size = getattr(pool, "size", None)
+    if size is None:
+        return {"ok": True}
+    max_overflow = getattr(pool, "_max_overflow", 0)
+    checked_out = pool.checkedout()
+    limit = None if max_overflow < 0 else size() + max_overflow
+    return {
+        "ok": limit is None or checked_out < limit,
+        "checked_out": checked_out,
+        "limit": limit,
+    }
+
+
+@router.get("/health/ready")
+def readiness_check():
+    """
+    Готовность принимать трафик: в пулах есть свободные соединения и база отвечает.
+    503, если пул исчерпан (запрос встал бы в очередь на pool_timeout) или база недоступна.
+    """
+    checks = {"pool": _pool_check(engine.pool)}
+    if async_engine is not None:
+        checks["async_pool"] = _pool_check(async_engine.sync_engine.pool)
+
+    if checks["pool"]["ok"]:
+        try:
+            with engine.connect() as conn:
+                conn.execute(text("SELECT 1"))
+            checks["database"] = {"ok": True}
+        except SQLAlchemyError as e:
+            checks["database"] = {"ok": False, "error": type(e).__name__}
+    else:
+        checks["database"] = {"ok": False, "error": "pool exhausted"}
+
+    if all(check["ok"] for check in checks.values()):
+        return {"status": "ready", "checks": checks}
+    return JSONResponse(status_code=503, content={"status": "not_ready", "checks": checks})
+
+
+@router.get("/metrics")
+def metrics():
+    """
+    Метрики в текстовом формате Prometheus
+    """
+    return Response(registry.render(), media_type=PROMETHEUS_CONTENT_TYPE)
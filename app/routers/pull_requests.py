@@ -1,31 +1,39 @@
-from fastapi import APIRouter, Depends, HTTPException, status
+from typing import Callable, Dict, Optional
+
+from fastapi import APIRouter, Depends, Header, HTTPException, Response, status
+from pydantic import BaseModel
 from sqlalchemy.orm import Session
 from .. import  schemas
 from .. import  crud
-from ..services.assignment import assign_reviewers, reassign_reviewer
+from ..services.assignment import assign_reviewers, lock_pr_for_reassign, reassign_reviewer
+from ..services.roster_cache import roster_cache
+from ..services.batch import create_prs_batch, merge_prs_batch, reassign_prs_batch
+from ..services.concurrency import run_with_retry
+from ..services.idempotency import IdempotencyKeyMismatch, idempotency_store, request_hash
 from ..database import get_db
+from ..responses import dumps, trusted
 
 router = APIRouter(prefix="/pullRequest", tags=["PullRequests"])
 
 
 @router.post("/create", response_model=schemas.PullRequestResponse, status_code=status.HTTP_201_CREATED)
-def create_pull_request(pr: schemas.PullRequestCreate, db: Session = Depends(get_db)):
-    # Проверяем, существует ли PR
-    existing_pr = crud.get_pr(db, pr.pull_request_id)
-    if existing_pr:
-        raise HTTPException(
-            status_code=status.HTTP_409_CONFLICT,
-            detail={
-                "error": {
-                    "code": "PR_EXISTS",
-                    "message": "PR id already exists"
-                }
-            }
-        )
-    
-    # Проверяем, существует ли автор
-    author = crud.get_user(db, pr.author_id)
-    if not author:
+def create_pull_request(
+    pr: schemas.PullRequestCreate,
+    idempotency_key: Optional[str] = Header(None, alias="Idempotency-Key", max_length=255),
+    db: Session = Depends(get_db)
+):
+    return _idempotent(
+        db, "pullRequest/create", idempotency_key, pr, status.HTTP_201_CREATED,
+        lambda finish: _create(db, pr, finish)
+    )
+
+
+def _create(db: Session, pr: schemas.PullRequestCreate, finish: Callable[[Dict], None]):
+    # Автора проверяем по кэшу составов команд, существование PR - сам INSERT ... ON CONFLICT
+    if not roster_cache.get_user_team(db, pr.author_id):
+        # Если не сходится и то и другое, как и раньше отвечаем PR_EXISTS
+        if crud.pr_exists(db, pr.pull_request_id):
+            _raise_pr_exists()
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
             detail={
@@ -36,20 +44,67 @@ def create_pull_request(pr: schemas.PullRequestCreate, db: Session = Depends(get
             }
         )
     
-    # Назначаем ревьюверов
-    reviewers = assign_reviewers(db, pr.author_id)
+    def create():
+        # Назначаем ревьюверов
+        reviewers = assign_reviewers(db, pr.author_id)
+        
+        # Создаём PR (None - PR с таким id уже есть, в том числе созданный параллельно)
+        created = crud.create_pr(db, pr, reviewers, commit=False)
+        if created is None:
+            _raise_pr_exists()
+        finish(created)
+        return created
     
-    # Создаём PR
-    db_pr = crud.create_pr(db, pr, reviewers)
-    return db_pr
+    return run_with_retry(db, create)
+
+
+def _raise_pr_exists():
+    raise HTTPException(
+        status_code=status.HTTP_409_CONFLICT,
+        detail={
+            "error": {
+                "code": "PR_EXISTS",
+                "message": "PR id already exists"
+            }
+        }
+    )
+
+
+@router.post("/createBatch", response_model=schemas.PullRequestBatchCreateResponse)
+def create_pull_requests_batch(batch: schemas.PullRequestBatchCreate, db: Session = Depends(get_db)):
+    """
+    Пакетное создание PR в одной транзакции с результатом по каждому элементу
+    """
+    results = run_with_retry(db, lambda: create_prs_batch(db, batch.pull_requests))
+    return trusted({
+        "results": results,
+        "created": sum(1 for item in results if item["status"] == "CREATED")
+    })
 
 
 @router.post("/merge", response_model=schemas.PullRequestResponse)
-def merge_pull_request(pr_merge: schemas.PullRequestMerge, db: Session = Depends(get_db)):
+def merge_pull_request(
+    pr_merge: schemas.PullRequestMerge,
+    idempotency_key: Optional[str] = Header(None, alias="Idempotency-Key", max_length=255),
+    db: Session = Depends(get_db)
+):
     """
     Помечает PR как MERGED
     """
-    db_pr = crud.merge_pr(db, pr_merge.pull_request_id)
+    return _idempotent(
+        db, "pullRequest/merge", idempotency_key, pr_merge, status.HTTP_200_OK,
+        lambda finish: _merge(db, pr_merge, finish)
+    )
+
+
+def _merge(db: Session, pr_merge: schemas.PullRequestMerge, finish: Callable[[Dict], None]):
+    def merge():
+        merged = crud.merge_pr(db, pr_merge.pull_request_id, commit=False)
+        if merged:
+            finish(merged)
+        return merged
+
+    db_pr = run_with_retry(db, merge)
     if not db_pr:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
@@ -63,13 +118,31 @@ def merge_pull_request(pr_merge: schemas.PullRequestMerge, db: Session = Depends
     return db_pr
 
 
-@router.post("/reassign")
+@router.post("/mergeBatch", response_model=schemas.PullRequestMergeBatchResponse)
+def merge_pull_requests_batch(batch: schemas.PullRequestMergeBatch, db: Session = Depends(get_db)):
+    """
+    Пакетный merge PR в одной транзакции с результатом по каждому элементу
+    """
+    results = run_with_retry(db, lambda: merge_prs_batch(db, batch.pull_request_ids))
+    return trusted({
+        "results": results,
+        "merged": sum(1 for item in results if item["status"] == "MERGED")
+    })
+
+
+@router.post("/reassign", response_model=schemas.PullRequestReassignResponse)
 def reassign_pull_request(reassign: schemas.PullRequestReassign, db: Session = Depends(get_db)):
     """
     Переназначение конкретного ревьювера на другого из его команды
     """
-    pr = crud.get_pr(db, reassign.pull_request_id)
-    if not pr:
+    return run_with_retry(db, lambda: _reassign(db, reassign))
+
+
+def _reassign(db: Session, reassign: schemas.PullRequestReassign):
+    # Проверки делаем под блокировкой PR, чтобы параллельный merge/reassign их не обошёл
+    # Блокируется только открытый PR; смерженный от несуществующего отличает реестр id
+    pr, candidates = lock_pr_for_reassign(db, reassign.pull_request_id, reassign.old_user_id)
+    if not pr and not crud.pr_exists(db, reassign.pull_request_id):
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
             detail={
@@ -81,7 +154,7 @@ def reassign_pull_request(reassign: schemas.PullRequestReassign, db: Session = D
         )
     
     # Проверяем статус
-    if pr.status == "MERGED":
+    if not pr:
         raise HTTPException(
             status_code=status.HTTP_409_CONFLICT,
             detail={
@@ -105,8 +178,10 @@ def reassign_pull_request(reassign: schemas.PullRequestReassign, db: Session = D
         )
     
     # Переназначаем ревьювера
-    new_reviewer_id = reassign_reviewer(db, reassign.pull_request_id, reassign.old_user_id)
-    if not new_reviewer_id:
+    reassigned = reassign_reviewer(db, pr, reassign.old_user_id, candidates)
+    if not reassigned:
+        # Блокировку PR больше не держим
+        db.rollback()
         raise HTTPException(
             status_code=status.HTTP_409_CONFLICT,
             detail={
@@ -117,10 +192,88 @@ def reassign_pull_request(reassign: schemas.PullRequestReassign, db: Session = D
             }
         )
     
-    # Обновляем данные PR
-    db.refresh(pr)
-    
-    return {
-        "pr": schemas.PullRequestResponse.from_orm(pr),
+    # Ответ - из RETURNING того же запроса, после коммита PR не перечитываем
+    response, new_reviewer_id = reassigned
+    return trusted({
+        "pr": response,
         "replaced_by": new_reviewer_id
-    }
\ No newline at end of file
+    })
+
+
+@router.post("/reassignBatch", response_model=schemas.PullRequestReassignBatchResponse)
+def reassign_pull_requests_batch(batch: schemas.PullRequestReassignBatch, db: Session = Depends(get_db)):
+    """
+    Пакетное переназначение ревьюверов в одной транзакции по одному снимку составов команд.
+    Ошибки отдельных элементов (NOT_FOUND, PR_MERGED, NOT_ASSIGNED, NO_CANDIDATE) - в их статусе
+    """
+    results = run_with_retry(db, lambda: reassign_prs_batch(db, batch.reassignments))
+    return trusted({
+        "results": results,
+        "reassigned": sum(1 for item in results if item["status"] == "REASSIGNED")
+    })
+
+
+def _idempotent(db: Session, scope: str, key: Optional[str], payload: BaseModel,
+                status_code: int, run: Callable):
+    """
+    Выполняет run(finish) с учётом Idempotency-Key: повтор с тем же ключом и телом
+    получает сохранённый ответ без выполнения операции. Без ключа - обычный вызов.
+    run() возвращает поля PullRequestResponse из базы, они отдаются без повторной проверки;
+    finish(result) завершает транзакцию операции - с ключом он записывается в неё же,
+    так что операция и сохранённый ответ коммитятся (или теряются при сбое) вместе.
+    """
+    if not key:
+        return trusted(run(lambda result: db.commit()), status_code=status_code)
+
+    payload_hash = request_hash(payload.model_dump_json())
+    stored = _lookup_idempotent(db, scope, key, payload_hash)
+    if stored:
+        return _replay(stored)
+
+    body = None
+
+    def finish(result: Dict):
+        nonlocal body
+        body = dumps(result).decode()
+        if not idempotency_store.save(db, scope, key, payload_hash, status_code, body):
+            raise _IdempotencyKeyTaken()
+
+    try:
+        run(finish)
+    except (HTTPException, _IdempotencyKeyTaken):
+        # Параллельный запрос с тем же ключом закоммитил операцию первым: этот запрос ждал
+        # его блокировок и получил ошибку (например PR_EXISTS) - отдаём ответ первого.
+        # Прочие ошибки не сохраняются и пробрасываются
+        stored = _lookup_idempotent(db, scope, key, payload_hash)
+        if stored:
+            return _replay(stored)
+        raise
+    return Response(content=body, status_code=status_code, media_type="application/json")
+
+
+class _IdempotencyKeyTaken(Exception):
+    """Ключ сохранён параллельным запросом; транзакция этого запроса откачена"""
+
+
+def _lookup_idempotent(db: Session, scope: str, key: str, payload_hash: str):
+    try:
+        return idempotency_store.lookup(db, scope, key, payload_hash)
+    except IdempotencyKeyMismatch:
+        raise HTTPException(
+            status_code=status.HTTP_422_UNPROCESSABLE_ENTITY,
+            detail={
+                "error": {
+                    "code": "IDEMPOTENCY_KEY_REUSED",
+                    "message": "Idempotency-Key was already used with a different request"
+                }
+            }
+        )
+
+
+def _replay(stored) -> Response:
+    return Response(
+        content=stored.body,
+        status_code=stored.status_code,
+        media_type="application/json",
+        headers={"Idempotent-Replayed": "true"}
+    )
@@ -0,0 +1,59 @@
+"""
+Асинхронные версии эндпоинтов /pullRequest (DB_ASYNC_MODE=true).
+"""
+from typing import Optional
+
+from fastapi import APIRouter, Depends, Header, status
+from sqlalchemy.ext.asyncio import AsyncSession
+from .. import schemas
+from ..database import get_async_db
+from . import pull_requests
+from .async_adapter import call_sync_handler
+
+router = APIRouter(prefix="/pullRequest", tags=["PullRequests"])
+
+
+@router.post("/create", response_model=schemas.PullRequestResponse, status_code=status.HTTP_201_CREATED)
+async def create_pull_request(
+    pr: schemas.PullRequestCreate,
+    idempotency_key: Optional[str] = Header(None, alias="Idempotency-Key", max_length=255),
+    db: AsyncSession = Depends(get_async_db)
+):
+    return await call_sync_handler(
+        db, pull_requests.create_pull_request, pr,
+        idempotency_key=idempotency_key,
+        response_model=schemas.PullRequestResponse
+    )
+
+
+@router.post("/createBatch", response_model=schemas.PullRequestBatchCreateResponse)
+async def create_pull_requests_batch(batch: schemas.PullRequestBatchCreate, db: AsyncSession = Depends(get_async_db)):
+    return await call_sync_handler(db, pull_requests.create_pull_requests_batch, batch)
+
+
+@router.post("/merge", response_model=schemas.PullRequestResponse)
+async def merge_pull_request(
+    pr_merge: schemas.PullRequestMerge,
+    idempotency_key: Optional[str] = Header(None, alias="Idempotency-Key", max_length=255),
+    db: AsyncSession = Depends(get_async_db)
+):
+    return await call_sync_handler(
+        db, pull_requests.merge_pull_request, pr_merge,
+        idempotency_key=idempotency_key,
+        response_model=schemas.PullRequestResponse
+    )
+
+
+@router.post("/mergeBatch", response_model=schemas.PullRequestMergeBatchResponse)
+async def merge_pull_requests_batch(batch: schemas.PullRequestMergeBatch, db: AsyncSession = Depends(get_async_db)):
+    return await call_sync_handler(db, pull_requests.merge_pull_requests_batch, batch)
+
+
+@router.post("/reassign", response_model=schemas.PullRequestReassignResponse)
+async def reassign_pull_request(reassign: schemas.PullRequestReassign, db: AsyncSession = Depends(get_async_db)):
+    return await call_sync_handler(db, pull_requests.reassign_pull_request, reassign)
+
+
+@router.post("/reassignBatch", response_model=schemas.PullRequestReassignBatchResponse)
+async def reassign_pull_requests_batch(batch: schemas.PullRequestReassignBatch, db: AsyncSession = Depends(get_async_db)):
+    return await call_sync_handler(db, pull_requests.reassign_pull_requests_batch, batch)
@@ -1,24 +1,49 @@
-from fastapi import APIRouter, Depends, HTTPException
+from fastapi import APIRouter, Depends, HTTPException, Request, Response, status
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import JSONResponse
 from sqlalchemy.orm import Session
 from sqlalchemy import func, case, and_
+from typing import Callable
 import logging
 
 from ..database import get_db
 from .. import models
+from ..services import stats_rollup
+from ..services.stats_cache import stats_cache
 
 logger = logging.getLogger(__name__)
 
 router = APIRouter(prefix="/stats", tags=["Statistics"])
 
 
+def _cached_response(request: Request, db: Session, key: str, build: Callable[[Session], dict]) -> Response:
+    """
+    Отдаёт ответ из кэша статистики с ETag; при совпадении If-None-Match - 304 без тела
+    """
+    entry = stats_cache.get(db, key, lambda session: JSONResponse(jsonable_encoder(build(session))).body)
+    headers = {"ETag": entry.etag, "Cache-Control": "no-cache"}
+
+    if_none_match = request.headers.get("if-none-match")
+    if if_none_match:
+        tags = [tag.strip() for tag in if_none_match.split(",")]
+        if "*" in tags or entry.etag in tags:
+            return Response(status_code=status.HTTP_304_NOT_MODIFIED, headers=headers)
+
+    return Response(content=entry.body, media_type="application/json", headers=headers)
+
+
 @router.get("/assignments", summary="Статистика назначений ревьюеров")
-def get_assignment_stats(db: Session = Depends(get_db)):
+def get_assignment_stats(request: Request, db: Session = Depends(get_db)):
     """
     Возвращает статистику назначений ревьюеров:
     - Количество назначений по пользователям
     - Общее количество назначений
     - Самые активные ревьюверы
     """
+    return _cached_response(request, db, "assignments", _assignment_stats)
+
+
+def _assignment_stats(db: Session) -> dict:
     try:
         # Статистика по пользователям: количество назначений на PR
         user_assignment_stats = db.query(
@@ -26,41 +51,32 @@ def get_assignment_stats(db: Session = Depends(get_db)):
             models.User.username,
             models.Team.team_name,
             models.User.is_active,
-            func.count(models.PullRequest.pull_request_id).label('assignment_count')
+            func.count(models.PRReviewer.pull_request_id).label('assignment_count')
         ).join(
             models.Team, models.User.team_name == models.Team.team_name
         ).join(
-            models.PullRequest, 
-            func.array_to_string(models.PullRequest.assigned_reviewers, ',').contains(models.User.user_id)
+            models.PRReviewer, models.PRReviewer.user_id == models.User.user_id
         ).group_by(
             models.User.user_id,
             models.User.username,
             models.Team.team_name,
             models.User.is_active
         ).order_by(
-            func.count(models.PullRequest.pull_request_id).desc()
+            func.count(models.PRReviewer.pull_request_id).desc()
         ).all()
 
-        # Общая статистика
-        total_assignments = db.query(func.count(models.PullRequest.pull_request_id)).scalar() or 0
-        total_users = db.query(func.count(models.User.user_id)).scalar() or 0
-        active_users = db.query(func.count(models.User.user_id)).filter(models.User.is_active == True).scalar() or 0
-        
-        # PR по статусам
-        pr_status_stats = db.query(
-            models.PullRequest.status,
-            func.count(models.PullRequest.pull_request_id).label('count')
-        ).group_by(models.PullRequest.status).all()
+        # Общая статистика (из инкрементальной сводки)
+        rollup = stats_rollup.get_rollup(db)
+        pr_by_status = {"OPEN": rollup.open_pr, "MERGED": rollup.merged_pr}
 
         # Назначения по командам
         team_assignment_stats = db.query(
             models.Team.team_name,
-            func.count(models.PullRequest.pull_request_id).label('assignment_count')
+            func.count(models.PRReviewer.pull_request_id).label('assignment_count')
         ).join(
             models.User, models.Team.team_name == models.User.team_name
         ).join(
-            models.PullRequest,
-            func.array_to_string(models.PullRequest.assigned_reviewers, ',').contains(models.User.user_id)
+            models.PRReviewer, models.PRReviewer.user_id == models.User.user_id
         ).group_by(models.Team.team_name).all()
 
         return {
@@ -75,12 +91,12 @@ def get_assignment_stats(db: Session = Depends(get_db)):
                 for user_id, username, team_name, is_active, assignment_count in user_assignment_stats
             ],
             "summary": {
-                "total_assignments": total_assignments,
-                "total_users": total_users,
-                "active_users": active_users,
-                "inactive_users": total_users - active_users,
+                "total_assignments": rollup.total_pr,
+                "total_users": rollup.total_users,
+                "active_users": rollup.active_users,
+                "inactive_users": rollup.total_users - rollup.active_users,
                 "pr_by_status": {
-                    status: count for status, count in pr_status_stats
+                    status: count for status, count in pr_by_status.items() if count
                 }
             },
             "team_assignments": [
@@ -98,13 +114,17 @@ def get_assignment_stats(db: Session = Depends(get_db)):
 
 
 @router.get("/pr", summary="Статистика по Pull Request'ам")
-def get_pr_stats(db: Session = Depends(get_db)):
+def get_pr_stats(request: Request, db: Session = Depends(get_db)):
     """
     Возвращает статистику по PR:
     - Количество PR по командам
     - Количество PR по авторам
     - Среднее количество ревьюверов на PR
     """
+    return _cached_response(request, db, "pr", _pr_stats)
+
+
+def _pr_stats(db: Session) -> dict:
     try:
         # PR по командам (через авторов)
         pr_by_team = db.query(
@@ -180,41 +200,36 @@ def get_pr_stats(db: Session = Depends(get_db)):
 
 
 @router.get("/overview", summary="Общая статистика")
-def get_overview_stats(db: Session = Depends(get_db)):
+def get_overview_stats(request: Request, db: Session = Depends(get_db)):
     """
     Возвращает общую сводку статистики системы
     """
-    try:
-        # Основные метрики
-        total_teams = db.query(func.count(models.Team.team_name)).scalar() or 0
-        total_users = db.query(func.count(models.User.user_id)).scalar() or 0
-        active_users = db.query(func.count(models.User.user_id)).filter(models.User.is_active == True).scalar() or 0
-        total_pr = db.query(func.count(models.PullRequest.pull_request_id)).scalar() or 0
-        open_pr = db.query(func.count(models.PullRequest.pull_request_id)).filter(models.PullRequest.status == 'OPEN').scalar() or 0
-        merged_pr = db.query(func.count(models.PullRequest.pull_request_id)).filter(models.PullRequest.status == 'MERGED').scalar() or 0
-
-        # Среднее количество ревьюверов на PR
-        avg_reviewers = db.query(
-            func.avg(func.cardinality(models.PullRequest.assigned_reviewers))
-        ).scalar() or 0
+    return _cached_response(request, db, "overview", _overview_stats)
 
-        # PR с максимальным количеством ревьюверов
-        max_reviewers_pr = db.query(
-            models.PullRequest.pull_request_id,
-            models.PullRequest.pull_request_name,
-            func.cardinality(models.PullRequest.assigned_reviewers).label('reviewer_count')
-        ).order_by(
-            func.cardinality(models.PullRequest.assigned_reviewers).desc()
-        ).first()
+
+def _overview_stats(db: Session) -> dict:
+    try:
+        # Одна строка инкрементальной сводки вместо агрегатов по pull_requests
+        rollup = stats_rollup.get_rollup(db)
+        total_users = rollup.total_users
+        active_users = rollup.active_users
+        total_pr = rollup.total_pr
+        merged_pr = rollup.merged_pr
+        avg_reviewers = (rollup.total_reviewers / total_pr) if total_pr > 0 else 0
+        max_reviewers_pr = (
+            rollup.max_reviewers_pr_id,
+            rollup.max_reviewers_pr_name,
+            rollup.max_reviewer_count
+        ) if rollup.max_reviewers_pr_id else None
 
         return {
             "overview": {
-                "total_teams": total_teams,
+                "total_teams": rollup.total_teams,
                 "total_users": total_users,
                 "active_users": active_users,
                 "inactive_users": total_users - active_users,
                 "total_pr": total_pr,
-                "open_pr": open_pr,
+                "open_pr": rollup.open_pr,
                 "merged_pr": merged_pr,
                 "completion_rate": (merged_pr / total_pr * 100) if total_pr > 0 else 0
             },
@@ -226,7 +241,7 @@ def get_overview_stats(db: Session = Depends(get_db)):
                     "reviewer_count": max_reviewers_pr[2] if max_reviewers_pr else 0
                 } if max_reviewers_pr else None
             },
-            "last_updated": db.query(func.max(models.PullRequest.created_at)).scalar()
+            "last_updated": rollup.last_pr_created_at
         }
     
     except Exception as e:
@@ -1,16 +1,21 @@
-from fastapi import APIRouter, Depends, HTTPException, status
+from fastapi import APIRouter, Depends, HTTPException, Query, status
 from sqlalchemy.orm import Session
 from .. import  schemas
 from .. import  crud
 from ..database import get_db
+from ..services import deactivation_jobs
 from ..services.bulk_deactivation import BulkDeactivationService
+from ..services.concurrency import ConcurrentUpdateError, run_with_retry
+from ..services.team_sync import sync_team
+from ..metrics import QueryBudgetExceeded
+from ..responses import trusted
 
 router = APIRouter(prefix="/team", tags=["Teams"])
 
 
 @router.post("/add", response_model=schemas.TeamResponse, status_code=status.HTTP_201_CREATED)
 def create_team(team: schemas.TeamCreate, db: Session = Depends(get_db)):
-    db_team = crud.create_team(db, team)
+    db_team = run_with_retry(db, lambda: crud.create_team(db, team))
     if not db_team:
         raise HTTPException(
             status_code=status.HTTP_400_BAD_REQUEST,
@@ -21,12 +26,12 @@ def create_team(team: schemas.TeamCreate, db: Session = Depends(get_db)):
                 }
             }
         )
-    return db_team
+    return trusted(db_team, status_code=status.HTTP_201_CREATED)
 
 
 @router.get("/get", response_model=schemas.TeamResponse)
 def get_team(team_name: str, db: Session = Depends(get_db)):
-    db_team = crud.get_team(db, team_name)
+    db_team = crud.get_team_response(db, team_name)
     if not db_team:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
@@ -37,24 +42,60 @@ def get_team(team_name: str, db: Session = Depends(get_db)):
                 }
             }
         )
-    return db_team
+    return trusted(db_team)
 
 
+@router.put("/sync", response_model=schemas.TeamSyncResponse, summary="Синхронизация состава команды")
+def sync_team_roster(team: schemas.TeamCreate, db: Session = Depends(get_db)):
+    """
+    Приводит команду к переданному полному составу одной транзакцией: добавляет
+    новых участников, обновляет изменившихся, деактивирует отсутствующих в списке
+    (их открытые PR переназначаются). Команда создаётся, если её нет.
+    """
+    return trusted(run_with_retry(db, lambda: sync_team(db, team)))
+
 
-@router.post("/deactivateUsers", response_model=schemas.TeamDeactivateResponse, summary="Массовая деактивация пользователей команды")
-def deactivate_users_team(deactivate_request: schemas.TeamDeactivateRequest, db: Session = Depends(get_db)):
+
+@router.post(
+    "/deactivateUsers",
+    response_model=schemas.TeamDeactivateResponse,
+    responses={status.HTTP_202_ACCEPTED: {"model": schemas.DeactivationJobResponse}},
+    summary="Массовая деактивация пользователей команды"
+)
+def deactivate_users_team(
+    deactivate_request: schemas.TeamDeactivateRequest,
+    async_mode: bool = Query(False, alias="async"),
+    db: Session = Depends(get_db)
+):
     """
     Массовая деактивация пользователей команды с безопасным переназначением открытых PR.
+    С async=true задача ставится в очередь (202 и job_id), прогресс - в GET /team/deactivateUsers/{job_id}.
     """
+    if async_mode:
+        if not crud.get_team(db, deactivate_request.team_name):
+            raise HTTPException(
+                status_code=status.HTTP_404_NOT_FOUND,
+                detail={
+                    "error": {
+                        "code": "NOT_FOUND",
+                        "message": f"Команда {deactivate_request.team_name} не найдена"
+                    }
+                }
+            )
+        job = deactivation_jobs.enqueue(db, deactivate_request.team_name, deactivate_request.user_ids)
+        return trusted(schemas.DeactivationJobResponse(**job).model_dump(mode="json"), status_code=status.HTTP_202_ACCEPTED)
+
     try:
         service = BulkDeactivationService(db)
-        result = service.deactivate_users_with_reassignment(
+        result = run_with_retry(db, lambda: service.deactivate_users_with_reassignment(
             deactivate_request.team_name,
             deactivate_request.user_ids
-        )
+        ))
         
-        return result
+        return trusted(result)
         
+    except (ConcurrentUpdateError, QueryBudgetExceeded):
+        raise
     except ValueError as e:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
@@ -74,4 +115,20 @@ def deactivate_users_team(deactivate_request: schemas.TeamDeactivateRequest, db:
                     "message": "Ошибка при массовой деактивации пользователей"
                 }
             }
-        )
\ No newline at end of file
+        )
+
+
+@router.get("/deactivateUsers/{job_id}", response_model=schemas.DeactivationJobResponse, summary="Статус фоновой массовой деактивации")
+def get_deactivation_job(job_id: str, db: Session = Depends(get_db)):
+    job = deactivation_jobs.get_job(db, job_id)
+    if not job:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail={
+                "error": {
+                    "code": "NOT_FOUND",
+                    "message": "resource not found"
+                }
+            }
+        )
+    return job
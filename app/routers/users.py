@@ -1,15 +1,26 @@
-from fastapi import APIRouter, Depends, HTTPException, status
+import base64
+import json
+from datetime import datetime
+from typing import Optional, Tuple
+
+from fastapi import APIRouter, Depends, HTTPException, Query, status
+from fastapi.responses import StreamingResponse
 from sqlalchemy.orm import Session
 from .. import schemas
 from .. import crud
-from ..database import get_db
+from ..database import SessionLocal, get_db
+from ..services.concurrency import run_with_retry
+from ..responses import dumps, trusted
+
+# Сколько строк за раз забирать из серверного курсора при потоковой выдаче
+STREAM_BATCH_SIZE = 500
 
 router = APIRouter(prefix="/users", tags=["Users"])
 
 
 @router.post("/setIsActive", response_model=schemas.UserResponse)
 def set_user_active(user_update: schemas.UserUpdateActive, db: Session = Depends(get_db)):
-    db_user = crud.update_user_active(db, user_update)
+    db_user = run_with_retry(db, lambda: crud.update_user_active(db, user_update))
     if not db_user:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
@@ -20,17 +31,71 @@ def set_user_active(user_update: schemas.UserUpdateActive, db: Session = Depends
                 }
             }
         )
-    return db_user
+    return trusted(db_user)
 
 
 @router.get("/getReview", response_model=schemas.UserPRsResponse)
-def get_user_reviews(user_id: str, db: Session = Depends(get_db)):
+def get_user_reviews(
+    user_id: str,
+    status_filter: Optional[str] = Query(None, alias="status", pattern="^(OPEN|MERGED)$"),
+    limit: Optional[int] = Query(None, ge=1, le=1000),
+    cursor: Optional[str] = None,
+    db: Session = Depends(get_db)
+):
     """
     Получить PR'ы, где пользователь назначен ревьювером.
+    Без limit возвращается весь список; с limit - страница и next_cursor для следующей.
+    """
+
+    _ensure_user_exists(db, user_id)
+
+    after = _decode_cursor(cursor) if cursor else None
+    # Берём на строку больше, чтобы понять, есть ли следующая страница
+    rows = crud.get_prs_by_reviewer(
+        db, user_id, status=status_filter, after=after,
+        limit=limit + 1 if limit else None
+    ).all()
+
+    next_cursor = None
+    if limit and len(rows) > limit:
+        rows = rows[:limit]
+        next_cursor = _encode_cursor(rows[-1].assigned_at, rows[-1].pull_request_id)
+
+    return trusted({
+        "user_id": user_id,
+        "pull_requests": [crud.pr_short(row) for row in rows],
+        "next_cursor": next_cursor
+    })
+
+
+@router.get("/getReview/stream")
+def stream_user_reviews(
+    user_id: str,
+    status_filter: Optional[str] = Query(None, alias="status", pattern="^(OPEN|MERGED)$"),
+    db: Session = Depends(get_db)
+):
     """
+    Все PR ревьювера в формате NDJSON (по объекту PullRequestShort на строку).
+    Строки читаются серверным курсором пачками, поэтому память не зависит от числа PR.
+    """
+
+    _ensure_user_exists(db, user_id)
+
+    def generate():
+        # Своя сессия: генератор работает уже после выхода из обработчика
+        stream_db = SessionLocal()
+        try:
+            query = crud.get_prs_by_reviewer(stream_db, user_id, status=status_filter)
+            for row in query.yield_per(STREAM_BATCH_SIZE):
+                yield dumps(crud.pr_short(row)) + b"\n"
+        finally:
+            stream_db.close()
 
-    user = crud.get_user(db, user_id)
-    if not user:
+    return StreamingResponse(generate(), media_type="application/x-ndjson")
+
+
+def _ensure_user_exists(db: Session, user_id: str):
+    if not crud.get_user(db, user_id):
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
             detail={
@@ -40,9 +105,25 @@ def get_user_reviews(user_id: str, db: Session = Depends(get_db)):
                 }
             }
         )
-    
-    prs = crud.get_prs_by_reviewer(db, user_id)
-    return schemas.UserPRsResponse(
-        user_id=user_id,
-        pull_requests=[schemas.PullRequestShort.from_orm(pr) for pr in prs]
-    )
\ No newline at end of file
+
+
+def _encode_cursor(assigned_at: datetime, pull_request_id: str) -> str:
+    raw = json.dumps([assigned_at.isoformat(), pull_request_id]).encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip("=")
+
+
+def _decode_cursor(cursor: str) -> Tuple[datetime, str]:
+    try:
+        raw = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4))
+        assigned_at, pull_request_id = json.loads(raw)
+        return datetime.fromisoformat(assigned_at), str(pull_request_id)
+    except (ValueError, TypeError):
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail={
+                "error": {
+                    "code": "INVALID_CURSOR",
+                    "message": "cursor is malformed"
+                }
+            }
+        )
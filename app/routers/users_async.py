@@ -0,0 +1,45 @@
+"""
+Асинхронные версии эндпоинтов /users (DB_ASYNC_MODE=true).
+"""
+from typing import Optional
+
+from fastapi import APIRouter, Depends, Query
+from sqlalchemy.ext.asyncio import AsyncSession
+from .. import schemas
+from ..database import get_async_db
+from . import users
+from .async_adapter import call_sync_handler
+
+router = APIRouter(prefix="/users", tags=["Users"])
+
+
+@router.post("/setIsActive", response_model=schemas.UserResponse)
+async def set_user_active(user_update: schemas.UserUpdateActive, db: AsyncSession = Depends(get_async_db)):
+    return await call_sync_handler(
+        db, users.set_user_active, user_update,
+        response_model=schemas.UserResponse
+    )
+
+
+@router.get("/getReview", response_model=schemas.UserPRsResponse)
+async def get_user_reviews(
+    user_id: str,
+    status_filter: Optional[str] = Query(None, alias="status", pattern="^(OPEN|MERGED)$"),
+    limit: Optional[int] = Query(None, ge=1, le=1000),
+    cursor: Optional[str] = None,
+    db: AsyncSession = Depends(get_async_db)
+):
+    return await call_sync_handler(
+        db, users.get_user_reviews, user_id,
+        status_filter=status_filter, limit=limit, cursor=cursor
+    )
+
+
+@router.get("/getReview/stream")
+async def stream_user_reviews(
+    user_id: str,
+    status_filter: Optional[str] = Query(None, alias="status", pattern="^(OPEN|MERGED)$"),
+    db: AsyncSession = Depends(get_async_db)
+):
+    # Проверка пользователя идёт через asyncpg, а сам поток - через синхронную сессию в threadpool
+    return await call_sync_handler(db, users.stream_user_reviews, user_id, status_filter=status_filter)
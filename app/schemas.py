@@ -43,6 +43,21 @@ class PullRequestCreate(BaseModel):
     author_id: str
 
 
+class PullRequestBatchCreate(BaseModel):
+    pull_requests: List[PullRequestCreate]
+
+
+class PullRequestBatchItemResult(BaseModel):
+    pull_request_id: str
+    status: str  # CREATED, PR_EXISTS, NOT_FOUND
+    assigned_reviewers: List[str] = []
+
+
+class PullRequestBatchCreateResponse(BaseModel):
+    results: List[PullRequestBatchItemResult]
+    created: int
+
+
 class PullRequestMerge(BaseModel):
     pull_request_id: str
 
@@ -65,6 +80,42 @@ class PullRequestResponse(BaseModel):
         from_attributes = True
 
 
+class PullRequestReassignResponse(BaseModel):
+    pr: PullRequestResponse
+    replaced_by: str
+
+
+class PullRequestMergeBatch(BaseModel):
+    pull_request_ids: List[str]
+
+
+class PullRequestMergeBatchItemResult(BaseModel):
+    pull_request_id: str
+    status: str  # MERGED, ALREADY_MERGED, NOT_FOUND
+    pr: Optional[PullRequestResponse] = None
+
+
+class PullRequestMergeBatchResponse(BaseModel):
+    results: List[PullRequestMergeBatchItemResult]
+    merged: int
+
+
+class PullRequestReassignBatch(BaseModel):
+    reassignments: List[PullRequestReassign]
+
+
+class PullRequestReassignBatchItemResult(BaseModel):
+    pull_request_id: str
+    old_user_id: str
+    status: str  # REASSIGNED, NOT_FOUND, PR_MERGED, NOT_ASSIGNED, NO_CANDIDATE
+    replaced_by: Optional[str] = None
+
+
+class PullRequestReassignBatchResponse(BaseModel):
+    results: List[PullRequestReassignBatchItemResult]
+    reassigned: int
+
+
 class PullRequestShort(BaseModel):
     pull_request_id: str
     pull_request_name: str
@@ -78,6 +129,7 @@ class PullRequestShort(BaseModel):
 class UserPRsResponse(BaseModel):
     user_id: str
     pull_requests: List[PullRequestShort]
+    next_cursor: Optional[str] = None  # есть, если запрошен limit и остались PR
 
 
 class ErrorResponse(BaseModel):
@@ -111,4 +163,30 @@ class TeamDeactivateResponse(BaseModel):
     deactivated_users: List[str]
     failed_deactivations: List[str]
     reassigned_prs: List[PRReassignmentInfo]
-    total_operations: int
\ No newline at end of file
+    total_operations: int
+    processing_time_ms: int
+
+
+class TeamSyncResponse(BaseModel):
+    team_name: str
+    created: bool
+    added_users: List[str]
+    updated_users: List[str]
+    deactivated_users: List[str]
+    reassigned_prs: List[PRReassignmentInfo]
+
+
+class DeactivationJobResponse(BaseModel):
+    job_id: str
+    team_name: str
+    status: str  # QUEUED, RUNNING, DONE, FAILED
+    total_users: int
+    processed_users: int  # прогресс: сколько user_ids уже обработано
+    deactivated_users: List[str] = []
+    failed_deactivations: List[str] = []
+    reassigned_prs: List[PRReassignmentInfo] = []
+    error: Optional[str] = None
+    created_at: Optional[datetime] = None
+    started_at: Optional[datetime] = None
+    finished_at: Optional[datetime] = None
+    processing_time_ms: Optional[int] = None
\ No newline at end of file
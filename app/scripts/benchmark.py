@@ -0,0 +1,680 @@
+"""
+Нагрузочный стенд: синтетическая организация и прогон смеси запросов.
+
+    # Сгенерировать организацию через API и сохранить её описание
+    python -m app.scripts.benchmark seed --base-url http://localhost:8080 --teams 50 --users-per-team 20 --prs 20000
+
+    # Прогнать смесь запросов из JSONL и записать отчёт
+    python -m app.scripts.benchmark run --base-url http://localhost:8080 --concurrency 32 --duration 30 --output report.json
+
+    # Микробенчмарк чтения и сериализации /team/get: ORM против проекции колонок
+    python -m app.scripts.benchmark micro --members 1000 --repeat 50
+
+    # Массовая деактивация: часть большой команды с открытыми PR на ревью
+    python -m app.scripts.benchmark deactivate --members 2000 --prs 50000 --deactivate 200 --repeat 3
+
+    # Кодирование больших ответов getReview и deactivateUsers (без базы)
+    python -m app.scripts.benchmark serialize --items 10000 --repeat 20
+
+    # Холодный старт воркера: от запуска uvicorn до готовности /health/ready
+    python -m app.scripts.benchmark startup --repeat 5
+
+Сценарии задаются JSONL (по умолчанию benchmark_scenarios.jsonl рядом со скриптом):
+{"name", "method", "path", "params"?, "body"?, "weight"}. В строках params/body
+подставляются {team}, {team_user}, {user}, {pr}, {pr_reviewer} (ревьювер этого PR) и {new_id}.
+
+Отчёт: по каждому сценарию и в целом - число запросов, коды ответов, RPS,
+p50/p95/p99 задержки в мс. С --profile-queries каждый сценарий дополнительно
+выполняется последовательно внутри процесса (нужен httpx для TestClient),
+и в отчёт попадает число SQL-запросов на запрос.
+
+micro работает напрямую с базой из DATABASE_URL: создаёт временную команду
+в транзакции, которая затем откатывается, и печатает время выборки и
+сериализации в TeamResponse в пересчёте на 1000 участников.
+deactivate так же во временной транзакции создаёт команду из --members человек
+и --prs открытых PR по два ревьювера, затем --repeat раз деактивирует первых
+--deactivate участников через BulkDeactivationService (каждый повтор в savepoint,
+который откатывается) и печатает время, число переназначений и SQL-запросов.
+serialize сравнивает на синтетических ответах путь FastAPI по умолчанию
+(проверка response_model + json), ту же проверку с orjson и trusted-ответ.
+startup запускает отдельный процесс uvicorn на свободном порту и ждёт первого
+200 от /health/ready; код выхода 1, если худший старт дольше --target-ms.
+"""
+import argparse
+import http.client
+import itertools
+import json
+import math
+import os
+import random
+import socket
+import subprocess
+import sys
+import threading
+import time
+import uuid
+from collections import Counter, defaultdict
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Dict, List, Optional, Tuple
+from urllib.parse import urlencode, urlsplit
+
+DEFAULT_SCENARIOS = os.path.join(os.path.dirname(__file__), "benchmark_scenarios.jsonl")
+BATCH_SIZE = 500
+
+
+class HttpClient:
+    """Клиент на http.client с keep-alive: одно соединение на поток"""
+
+    def __init__(self, base_url: str, timeout: float = 30.0):
+        parts = urlsplit(base_url)
+        self.host = parts.hostname
+        self.port = parts.port or 80
+        self.timeout = timeout
+        self._local = threading.local()
+
+    def _connection(self) -> http.client.HTTPConnection:
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = http.client.HTTPConnection(self.host, self.port, timeout=self.timeout)
+            self._local.conn = conn
+        return conn
+
+    def request(self, method: str, path: str, params: Optional[Dict] = None,
+                body: Optional[Any] = None) -> Tuple[int, bytes, Dict[str, str]]:
+        if params:
+            path += "?" + urlencode(params)
+        data = json.dumps(body) if body is not None else None
+        headers = {"Content-Type": "application/json"} if data is not None else {}
+
+        for attempt in range(2):
+            conn = self._connection()
+            try:
+                conn.request(method, path, body=data, headers=headers)
+                resp = conn.getresponse()
+                payload = resp.read()
+                return resp.status, payload, {key.lower(): value for key, value in resp.getheaders()}
+            except (http.client.HTTPException, ConnectionError):
+                # Сервер закрыл keep-alive соединение - переподключаемся один раз
+                conn.close()
+                self._local.conn = None
+                if attempt:
+                    raise
+
+
+class Org:
+    """Описание синтетической организации: команды, участники, PR и их ревьюверы"""
+
+    def __init__(self, teams: Dict[str, List[str]], prs: Dict[str, List[str]]):
+        self.teams = teams
+        self.prs = prs
+        self.team_names = list(teams)
+        self.user_ids = [user_id for members in teams.values() for user_id in members]
+        self.pr_ids = list(prs)
+        self._ids = itertools.count()
+        self._run_id = uuid.uuid4().hex[:8]
+
+    @classmethod
+    def load(cls, path: str) -> "Org":
+        with open(path) as f:
+            data = json.load(f)
+        return cls(data["teams"], data["prs"])
+
+    def dump(self, path: str):
+        with open(path, "w") as f:
+            json.dump({"teams": self.teams, "prs": self.prs}, f)
+
+    def context(self) -> Dict[str, str]:
+        """Значения подстановок для одного запроса"""
+        team = random.choice(self.team_names)
+        pr = random.choice(self.pr_ids) if self.pr_ids else ""
+        reviewers = self.prs.get(pr) or self.user_ids
+        return {
+            "team": team,
+            "team_user": random.choice(self.teams[team]),
+            "user": random.choice(self.user_ids),
+            "pr": pr,
+            "pr_reviewer": random.choice(reviewers),
+        }
+
+    def new_id(self) -> str:
+        return f"bench-{self._run_id}-{next(self._ids)}"
+
+
+def render(template: Any, context: Dict[str, str], org: Org) -> Any:
+    """Подставляет значения в строки шаблона (рекурсивно по спискам и словарям)"""
+    if isinstance(template, str):
+        if "{new_id}" in template:
+            template = template.replace("{new_id}", org.new_id())
+        return template.format(**context) if "{" in template else template
+    if isinstance(template, list):
+        return [render(item, context, org) for item in template]
+    if isinstance(template, dict):
+        return {key: render(value, context, org) for key, value in template.items()}
+    return template
+
+
+def load_scenarios(path: str) -> List[Dict]:
+    scenarios = []
+    with open(path) as f:
+        for line in f:
+            line = line.strip()
+            if line and not line.startswith("#"):
+                scenarios.append(json.loads(line))
+    return [scenario for scenario in scenarios if scenario.get("weight", 1) > 0]
+
+
+def percentile(sorted_values: List[float], p: float) -> Optional[float]:
+    if not sorted_values:
+        return None
+    # nearest-rank
+    index = min(len(sorted_values) - 1, max(0, math.ceil(p / 100 * len(sorted_values)) - 1))
+    return sorted_values[index]
+
+
+def summarize(latencies: List[float], statuses: Counter, elapsed: float) -> Dict:
+    values = sorted(latencies)
+    return {
+        "requests": len(values),
+        "rps": round(len(values) / elapsed, 1) if elapsed else None,
+        "statuses": {str(code): count for code, count in sorted(statuses.items())},
+        "errors_5xx": sum(count for code, count in statuses.items() if code >= 500),
+        "latency_ms": {
+            "mean": round(sum(values) / len(values), 2) if values else None,
+            "p50": percentile(values, 50),
+            "p95": percentile(values, 95),
+            "p99": percentile(values, 99),
+            "max": values[-1] if values else None,
+        },
+    }
+
+
+def seed(args) -> int:
+    client = HttpClient(args.base_url)
+    prefix = f"bench-{uuid.uuid4().hex[:6]}"
+    teams = {
+        f"{prefix}-t{t}": [f"{prefix}-t{t}-u{u}" for u in range(args.users_per_team)]
+        for t in range(args.teams)
+    }
+
+    started = time.perf_counter()
+    for team_name, members in teams.items():
+        status, payload, _ = client.request("POST", "/team/add", body={
+            "team_name": team_name,
+            "members": [{"user_id": user_id, "username": user_id, "is_active": True} for user_id in members],
+        })
+        if status != 201:
+            print(f"Не удалось создать команду {team_name}: {status} {payload[:200]}")
+            return 1
+
+    user_ids = [user_id for members in teams.values() for user_id in members]
+    prs: Dict[str, List[str]] = {}
+    items = [
+        {"pull_request_id": f"{prefix}-pr{i}", "pull_request_name": "bench", "author_id": random.choice(user_ids)}
+        for i in range(args.prs)
+    ]
+    for start in range(0, len(items), BATCH_SIZE):
+        status, payload, _ = client.request("POST", "/pullRequest/createBatch", body={"pull_requests": items[start:start + BATCH_SIZE]})
+        if status != 200:
+            print(f"Не удалось создать PR: {status} {payload[:200]}")
+            return 1
+        for result in json.loads(payload)["results"]:
+            prs[result["pull_request_id"]] = result["assigned_reviewers"]
+
+    to_merge = random.sample(list(prs), int(len(prs) * args.merged_ratio))
+    with ThreadPoolExecutor(max_workers=args.concurrency) as executor:
+        list(executor.map(lambda pr_id: client.request("POST", "/pullRequest/merge", body={"pull_request_id": pr_id}), to_merge))
+    for pr_id in to_merge:
+        del prs[pr_id]
+
+    Org(teams, prs).dump(args.org)
+    print(f"Создано команд: {len(teams)}, пользователей: {len(user_ids)}, PR: {len(items)} "
+          f"(смержено {len(to_merge)}) за {time.perf_counter() - started:.1f} с; описание в {args.org}")
+    return 0
+
+
+def run_load(client: HttpClient, org: Org, scenarios: List[Dict], concurrency: int,
+             duration: float, max_requests: Optional[int]) -> Dict:
+    weights = [scenario.get("weight", 1) for scenario in scenarios]
+    lock = threading.Lock()
+    latencies: Dict[str, List[float]] = defaultdict(list)
+    statuses: Dict[str, Counter] = defaultdict(Counter)
+    queries: Dict[str, List[int]] = defaultdict(list)
+    issued = itertools.count()
+    deadline = time.perf_counter() + duration
+
+    def worker():
+        while time.perf_counter() < deadline:
+            if max_requests is not None and next(issued) >= max_requests:
+                return
+            scenario = random.choices(scenarios, weights)[0]
+            context = org.context()
+            params = render(scenario.get("params"), context, org)
+            body = render(scenario.get("body"), context, org)
+
+            started = time.perf_counter()
+            try:
+                status, _, headers = client.request(scenario["method"], scenario["path"], params=params, body=body)
+            except (OSError, http.client.HTTPException):
+                status, headers = 599, {}
+            elapsed_ms = (time.perf_counter() - started) * 1000
+
+            query_count = _queries_from_server_timing(headers.get("server-timing"))
+            with lock:
+                latencies[scenario["name"]].append(round(elapsed_ms, 3))
+                statuses[scenario["name"]][status] += 1
+                if query_count is not None:
+                    queries[scenario["name"]].append(query_count)
+
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as executor:
+        for future in [executor.submit(worker) for _ in range(concurrency)]:
+            future.result()
+    elapsed = time.perf_counter() - started
+
+    report = {"elapsed_s": round(elapsed, 2), "scenarios": {}}
+    for name in sorted(latencies):
+        report["scenarios"][name] = summarize(latencies[name], statuses[name], elapsed)
+        if queries[name]:
+            report["scenarios"][name]["queries_per_request"] = round(sum(queries[name]) / len(queries[name]), 2)
+
+    all_statuses = sum(statuses.values(), Counter())
+    report["total"] = summarize([value for values in latencies.values() for value in values], all_statuses, elapsed)
+    return report
+
+
+def _queries_from_server_timing(header: Optional[str]) -> Optional[int]:
+    """Число SQL-запросов из Server-Timing (метрика db;desc="queries=N"), если сервер его отдаёт"""
+    if not header:
+        return None
+    for metric in header.split(","):
+        for part in metric.split(";"):
+            part = part.strip()
+            if part.startswith('desc="queries='):
+                return int(part[len('desc="queries='):].rstrip('"'))
+    return None
+
+
+def profile_queries(org: Org, scenarios: List[Dict], repeats: int) -> Dict[str, float]:
+    """
+    Последовательно выполняет каждый сценарий внутри процесса и считает SQL-запросы
+    через события движка (параллельных запросов нет, поэтому счёт однозначен).
+    """
+    try:
+        from fastapi.testclient import TestClient
+    except ImportError:
+        raise SystemExit("--profile-queries требует httpx (pip install httpx)")
+
+    from sqlalchemy import event
+    from ..database import engine, async_engine
+    from ..main import app
+
+    counter = {"queries": 0}
+
+    def count(*_):
+        counter["queries"] += 1
+
+    engines = [engine] + ([async_engine.sync_engine] if async_engine is not None else [])
+    for target in engines:
+        event.listen(target, "before_cursor_execute", count)
+
+    result = {}
+    try:
+        with TestClient(app) as client:
+            for scenario in scenarios:
+                counts = []
+                for _ in range(repeats):
+                    context = org.context()
+                    counter["queries"] = 0
+                    client.request(
+                        scenario["method"], scenario["path"],
+                        params=render(scenario.get("params"), context, org),
+                        json=render(scenario.get("body"), context, org)
+                    )
+                    counts.append(counter["queries"])
+                result[scenario["name"]] = round(sum(counts) / len(counts), 2)
+    finally:
+        for target in engines:
+            event.remove(target, "before_cursor_execute", count)
+    return result
+
+
+def run(args) -> int:
+    org = Org.load(args.org)
+    scenarios = load_scenarios(args.scenarios)
+    if args.only:
+        scenarios = [scenario for scenario in scenarios if scenario["name"] in args.only]
+    if not scenarios:
+        print("Нет сценариев для прогона")
+        return 1
+
+    client = HttpClient(args.base_url)
+    if args.warmup > 0:
+        run_load(client, org, scenarios, args.concurrency, args.warmup, None)
+
+    report = run_load(client, org, scenarios, args.concurrency, args.duration, args.requests)
+    report["config"] = {
+        "base_url": args.base_url,
+        "scenarios_file": args.scenarios,
+        "concurrency": args.concurrency,
+        "duration_s": args.duration,
+        "teams": len(org.teams),
+        "users": len(org.user_ids),
+        "open_prs": len(org.pr_ids),
+    }
+
+    if args.profile_queries:
+        for name, value in profile_queries(org, scenarios, args.profile_repeats).items():
+            report["scenarios"].setdefault(name, {})["queries_per_request"] = value
+
+    for name, stats in report["scenarios"].items():
+        latency = stats.get("latency_ms", {})
+        print(f"{name:24} n={stats.get('requests', 0):<7} rps={stats.get('rps')!s:<8} "
+              f"p50={latency.get('p50')!s:<8} p95={latency.get('p95')!s:<8} p99={latency.get('p99')!s:<8} "
+              f"q/req={stats.get('queries_per_request', '-')} codes={stats.get('statuses', {})}")
+    total = report["total"]
+    print(f"{'TOTAL':24} n={total['requests']:<7} rps={total['rps']!s:<8} "
+          f"p50={total['latency_ms']['p50']!s:<8} p95={total['latency_ms']['p95']!s:<8} p99={total['latency_ms']['p99']!s:<8}")
+
+    with open(args.output, "w") as f:
+        json.dump(report, f, indent=2, ensure_ascii=False)
+    print(f"Отчёт: {args.output}")
+    return 0
+
+
+def micro(args) -> int:
+    from sqlalchemy import insert
+    from .. import crud, models, schemas
+    from ..database import SessionLocal
+
+    team_name = f"micro-{uuid.uuid4().hex[:8]}"
+    db = SessionLocal()
+    try:
+        # Временная команда живёт только в этой транзакции
+        db.execute(insert(models.Team).values(team_name=team_name))
+        db.execute(insert(models.User), [
+            {"user_id": f"{team_name}-u{i}", "username": f"user {i}", "team_name": team_name, "is_active": i % 10 != 0}
+            for i in range(args.members)
+        ])
+
+        def orm_fetch():
+            # Пустая identity map: каждый повтор заново создаёт ORM-объекты, как в новом запросе
+            db.expunge_all()
+            team = crud.get_team(db, team_name)
+            team.members  # ленивая загрузка, как при сериализации ORM-объекта
+            return team
+
+        variants = {
+            "orm": (orm_fetch, lambda team: schemas.TeamResponse.model_validate(team, from_attributes=True)),
+            "projection": (lambda: crud.get_team_response(db, team_name), schemas.TeamResponse.model_validate),
+        }
+        scale = 1000 / args.members
+        for name, (fetch, validate) in variants.items():
+            fetch_times, serialize_times = [], []
+            for _ in range(args.repeat):
+                started = time.perf_counter()
+                data = fetch()
+                fetched = time.perf_counter()
+                validate(data).model_dump_json()
+                fetch_times.append(fetched - started)
+                serialize_times.append(time.perf_counter() - fetched)
+            fetch_ms = sorted(fetch_times)[len(fetch_times) // 2] * 1000 * scale
+            serialize_ms = sorted(serialize_times)[len(serialize_times) // 2] * 1000 * scale
+            print(f"{name:12} выборка={fetch_ms:.2f} мс  сериализация={serialize_ms:.2f} мс  "
+                  f"итого={fetch_ms + serialize_ms:.2f} мс на 1000 участников (медиана из {args.repeat})")
+    finally:
+        db.rollback()
+        db.close()
+    return 0
+
+
+def deactivate(args) -> int:
+    from sqlalchemy import event, text
+    from ..database import SessionLocal, engine
+    from ..services.bulk_deactivation import BulkDeactivationService
+
+    if args.members < 3 or not 0 < args.deactivate <= args.members or args.repeat < 1:
+        raise SystemExit("нужно --members >= 3, 0 < --deactivate <= --members и --repeat >= 1")
+
+    team_name = f"deact-{uuid.uuid4().hex[:8]}"
+    params = {"team": team_name, "members": args.members, "prs": args.prs}
+    db = SessionLocal()
+    counter = {"queries": 0}
+
+    def count(*_):
+        counter["queries"] += 1
+
+    try:
+        # Данные генерируются на стороне базы и живут только в этой транзакции.
+        # Автор PR i - участник i % members, ревьюверы - два следующих за ним со сдвигом
+        # d (1 <= d <= members - 2), так что они отличны от автора и друг от друга
+        db.execute(text("INSERT INTO teams (team_name) VALUES (:team)"), params)
+        db.execute(text(
+            "INSERT INTO users (user_id, username, team_name, is_active) "
+            "SELECT :team || '-u' || i, 'user ' || i, :team, true FROM generate_series(0, :members - 1) AS i"
+        ), params)
+        db.execute(text(
+            "INSERT INTO pull_request_ids (pull_request_id) "
+            "SELECT :team || '-pr' || i FROM generate_series(0, :prs - 1) AS i"
+        ), params)
+        db.execute(text(
+            "INSERT INTO pull_requests (pull_request_id, pull_request_name, author_id, status, assigned_reviewers) "
+            "SELECT :team || '-pr' || i, 'PR ' || i, :team || '-u' || (i % :members), 'OPEN', "
+            "       ARRAY[:team || '-u' || ((i + d) % :members), :team || '-u' || ((i + d + 1) % :members)] "
+            "FROM generate_series(0, :prs - 1) AS i, LATERAL (SELECT 1 + (i * 7919) % (:members - 2) AS d) AS shift"
+        ), params)
+        db.execute(text(
+            "INSERT INTO pr_reviewers (pull_request_id, user_id, status) "
+            "SELECT pull_request_id, unnest(assigned_reviewers), 'OPEN' FROM pull_requests "
+            "WHERE status = 'OPEN' AND pull_request_id LIKE :team || '-pr%'"
+        ), params)
+        db.execute(text(
+            "UPDATE users u SET open_review_count = load.count "
+            "FROM (SELECT user_id, count(*) AS count FROM pr_reviewers WHERE status = 'OPEN' GROUP BY user_id) AS load "
+            "WHERE u.user_id = load.user_id AND u.team_name = :team"
+        ), params)
+        db.execute(text("ANALYZE users, pr_reviewers, pull_requests_open"))
+
+        user_ids = [f"{team_name}-u{i}" for i in range(args.deactivate)]
+        event.listen(engine, "before_cursor_execute", count)
+        timings = []
+        for _ in range(args.repeat):
+            savepoint = db.begin_nested()
+            counter["queries"] = 0
+            started = time.perf_counter()
+            result = BulkDeactivationService(db).deactivate_users_with_reassignment(team_name, user_ids, commit=False)
+            timings.append((time.perf_counter() - started) * 1000)
+            queries = counter["queries"]
+            savepoint.rollback()
+        event.remove(engine, "before_cursor_execute", count)
+
+        values = sorted(timings)
+        print(json.dumps({
+            "members": args.members,
+            "open_prs": args.prs,
+            "deactivated": len(result["deactivated_users"]),
+            "reassigned": len(result["reassigned_prs"]),
+            "queries": queries,
+            "ms": {"p50": round(percentile(values, 50), 1), "max": round(values[-1], 1)},
+            "repeat": args.repeat,
+        }, ensure_ascii=False, indent=2))
+    finally:
+        if event.contains(engine, "before_cursor_execute", count):
+            event.remove(engine, "before_cursor_execute", count)
+        db.rollback()
+        db.close()
+    return 0
+
+
+def serialize(args) -> int:
+    import asyncio
+    from fastapi.responses import JSONResponse
+    from fastapi.routing import serialize_response
+    from fastapi.utils import create_response_field
+    from .. import schemas
+    from ..responses import FastJSONResponse, trusted
+
+    payloads = {
+        "getReview": (schemas.UserPRsResponse, {
+            "user_id": "u-0",
+            "pull_requests": [
+                {"pull_request_id": f"pr-{i}", "pull_request_name": f"Feature {i}", "author_id": f"u-{i % 50}", "status": "OPEN"}
+                for i in range(args.items)
+            ],
+            "next_cursor": None,
+        }),
+        "deactivateUsers": (schemas.TeamDeactivateResponse, {
+            "deactivated_users": [f"u-{i}" for i in range(10)],
+            "failed_deactivations": [],
+            "reassigned_prs": [
+                {"pull_request_id": f"pr-{i}", "pull_request_name": f"Feature {i}", "old_reviewer": f"u-{i % 10}",
+                 "new_reviewer": f"u-{10 + i % 40}", "status": "SUCCESS"}
+                for i in range(args.items)
+            ],
+            "total_operations": 10 + args.items,
+        }),
+    }
+
+    async def measure(model, payload) -> Dict[str, float]:
+        field = create_response_field(name=f"Response_{model.__name__}", type_=model)
+
+        async def validated(response_class):
+            content = await serialize_response(field=field, response_content=payload)
+            return response_class(content).body
+
+        async def fast():
+            return trusted(payload).body
+
+        variants = {
+            "response_model+json": lambda: validated(JSONResponse),
+            "response_model+orjson": lambda: validated(FastJSONResponse),
+            "trusted+orjson": fast,
+        }
+        bodies = set()
+        result = {}
+        for name, variant in variants.items():
+            timings = []
+            for _ in range(args.repeat):
+                started = time.perf_counter()
+                body = await variant()
+                timings.append(time.perf_counter() - started)
+            bodies.add(json.dumps(json.loads(body), sort_keys=True))
+            result[name] = sorted(timings)[len(timings) // 2] * 1000
+        if len(bodies) != 1:
+            raise RuntimeError(f"{model.__name__}: варианты дали разный JSON")
+        return result
+
+    for endpoint, (model, payload) in payloads.items():
+        timings = asyncio.run(measure(model, payload))
+        baseline = timings["response_model+json"]
+        for name, ms in timings.items():
+            print(f"{endpoint:16} {name:22} {ms:8.2f} мс  x{baseline / ms:.1f}  (медиана из {args.repeat}, {args.items} элементов)")
+    return 0
+
+
+def _free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def startup(args) -> int:
+    if args.repeat < 1:
+        raise SystemExit("нужно --repeat >= 1")
+
+    timings = []
+    for _ in range(args.repeat):
+        port = _free_port()
+        client = HttpClient(f"http://127.0.0.1:{port}", timeout=1.0)
+        started = time.perf_counter()
+        proc = subprocess.Popen(
+            [sys.executable, "-m", "uvicorn", "app.main:app", "--host", "127.0.0.1", "--port", str(port)],
+            stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL,
+        )
+        try:
+            while True:
+                if proc.poll() is not None:
+                    raise RuntimeError(f"uvicorn завершился с кодом {proc.returncode} до готовности")
+                if time.perf_counter() - started > args.timeout:
+                    raise RuntimeError(f"сервис не ответил на /health/ready за {args.timeout} с")
+                try:
+                    status, _, _ = client.request("GET", "/health/ready")
+                except OSError:
+                    status = None
+                if status == 200:
+                    break
+                time.sleep(0.01)
+            timings.append((time.perf_counter() - started) * 1000)
+        finally:
+            proc.terminate()
+            proc.wait()
+
+    values = sorted(timings)
+    print(json.dumps({
+        "repeat": args.repeat,
+        "target_ms": args.target_ms,
+        "cold_start_ms": {"p50": round(percentile(values, 50), 1), "max": round(values[-1], 1)},
+    }, ensure_ascii=False, indent=2))
+    return 0 if values[-1] <= args.target_ms else 1
+
+
+def build_parser() -> argparse.ArgumentParser:
+    parser = argparse.ArgumentParser(description="Нагрузочный стенд сервиса назначения ревьюверов")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    seed_parser = subparsers.add_parser("seed", help="создать синтетическую организацию через API")
+    seed_parser.add_argument("--base-url", default="http://localhost:8080")
+    seed_parser.add_argument("--teams", type=int, default=20)
+    seed_parser.add_argument("--users-per-team", type=int, default=10)
+    seed_parser.add_argument("--prs", type=int, default=5000)
+    seed_parser.add_argument("--merged-ratio", type=float, default=0.3)
+    seed_parser.add_argument("--concurrency", type=int, default=16)
+    seed_parser.add_argument("--org", default="bench_org.json", help="куда сохранить описание организации")
+    seed_parser.set_defaults(handler=seed)
+
+    run_parser = subparsers.add_parser("run", help="прогнать смесь запросов и записать отчёт")
+    run_parser.add_argument("--base-url", default="http://localhost:8080")
+    run_parser.add_argument("--org", default="bench_org.json")
+    run_parser.add_argument("--scenarios", default=DEFAULT_SCENARIOS)
+    run_parser.add_argument("--only", nargs="*", help="прогнать только указанные сценарии")
+    run_parser.add_argument("--concurrency", type=int, default=16)
+    run_parser.add_argument("--duration", type=float, default=30.0, help="секунд замера")
+    run_parser.add_argument("--warmup", type=float, default=3.0, help="секунд прогрева (не входят в отчёт)")
+    run_parser.add_argument("--requests", type=int, default=None, help="остановиться после N запросов")
+    run_parser.add_argument("--profile-queries", action="store_true", help="посчитать SQL-запросы на сценарий внутри процесса")
+    run_parser.add_argument("--profile-repeats", type=int, default=5)
+    run_parser.add_argument("--output", default="benchmark_report.json")
+    run_parser.set_defaults(handler=run)
+
+    micro_parser = subparsers.add_parser("micro", help="время выборки и сериализации команды: ORM против проекции")
+    micro_parser.add_argument("--members", type=int, default=1000)
+    micro_parser.add_argument("--repeat", type=int, default=50)
+    micro_parser.set_defaults(handler=micro)
+
+    deactivate_parser = subparsers.add_parser("deactivate", help="массовая деактивация с переназначением открытых PR")
+    deactivate_parser.add_argument("--members", type=int, default=2000)
+    deactivate_parser.add_argument("--prs", type=int, default=50000, help="открытых PR в команде")
+    deactivate_parser.add_argument("--deactivate", type=int, default=200, help="сколько участников деактивировать")
+    deactivate_parser.add_argument("--repeat", type=int, default=3)
+    deactivate_parser.set_defaults(handler=deactivate)
+
+    serialize_parser = subparsers.add_parser("serialize", help="кодирование больших ответов: response_model+json против orjson")
+    serialize_parser.add_argument("--items", type=int, default=10000)
+    serialize_parser.add_argument("--repeat", type=int, default=20)
+    serialize_parser.set_defaults(handler=serialize)
+
+    startup_parser = subparsers.add_parser("startup", help="холодный старт воркера до готовности /health/ready")
+    startup_parser.add_argument("--repeat", type=int, default=5)
+    startup_parser.add_argument("--target-ms", type=float, default=float(os.getenv("STARTUP_TARGET_MS", "1000")))
+    startup_parser.add_argument("--timeout", type=float, default=30.0, help="секунд ожидания одного старта")
+    startup_parser.set_defaults(handler=startup)
+
+    return parser
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    args = build_parser().parse_args(argv)
+    return args.handler(args)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
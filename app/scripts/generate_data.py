@@ -0,0 +1,308 @@
+"""
+Генератор синтетических данных для нагрузочных прогонов и оценки ёмкости.
+
+Создаёт организацию (команды, участники, PR с ревьюверами) напрямую в базе из
+DATABASE_URL через COPY, пачками по --batch-size PR: в памяти держится только
+текущая пачка и составы команд, поэтому объём ограничен лишь диском.
+
+Примеры:
+    # 10M PR: 2000 команд по 25 человек, 70% PR мерджены за последние 12 месяцев
+    python -m app.scripts.generate_data --teams 2000 --users-per-team 25 --prs 10000000 --merged-ratio 0.7
+
+    # Небольшая воспроизводимая организация и её описание для benchmark run
+    python -m app.scripts.generate_data --teams 20 --prs 50000 --seed 1 --org bench_org.json
+
+Ревьюверы выбираются, как это делает сервис: до двух активных участников команды
+автора, кроме него самого. --reviewer-skew задаёт перекос нагрузки: вес участника
+с рангом r в команде равен 1 / r^skew (0 - равномерно, 1 - закон Ципфа).
+Мердженые PR распределены по последним --months месяцам (месячные секции создаются
+заранее), открытые - по последним OPEN_PR_MAX_AGE_DAYS дням.
+
+Пачки генерируются в отдельном потоке, пока предыдущая грузится через COPY
+(не больше PREFETCH_BATCHES готовых пачек в памяти). Каждая пачка коммитится отдельно; счётчики нагрузки users.open_review_count и
+сводка stats_rollup обновляются в конце, поэтому прерванную загрузку проще
+удалить вместе с базой, чем доводить руками.
+"""
+import argparse
+import io
+import itertools
+import json
+import queue
+import random
+import sys
+import threading
+import time
+import uuid
+from collections import Counter
+from datetime import datetime, timedelta, timezone
+from typing import Dict, Iterator, List, Optional, Tuple
+
+from ..database import SessionLocal, engine
+from ..services import stats_rollup
+from ..services.partitions import ensure_partitions, month_start
+from .benchmark import Org
+
+MAX_REVIEWERS = 2
+OPEN_PR_MAX_AGE_DAYS = 30
+MAX_MERGE_DELAY = timedelta(days=14)
+# Сколько готовых пачек генератор держит впереди загрузки
+PREFETCH_BATCHES = 2
+
+
+def _copy(cursor, table: str, columns: str, rows: List[str]):
+    if rows:
+        cursor.copy_expert(f"COPY {table} ({columns}) FROM STDIN", io.StringIO("".join(rows)))
+
+
+def _timestamp(value: datetime) -> str:
+    return value.isoformat(sep=" ")
+
+
+class OrgGenerator:
+    """Случайная организация: составы команд и поток PR с ревьюверами"""
+
+    def __init__(self, rng: random.Random, prefix: str, teams: int, users_per_team: int,
+                 inactive_ratio: float, reviewer_skew: float):
+        self.rng = rng
+        self.teams: Dict[str, List[str]] = {
+            f"{prefix}-t{t}": [f"{prefix}-t{t}-u{u}" for u in range(users_per_team)]
+            for t in range(teams)
+        }
+        self.inactive = {
+            user_id for members in self.teams.values() for user_id in members
+            if rng.random() < inactive_ratio
+        }
+        # Ранги ревьюверов в команде случайны, веса по рангу общие для всех команд
+        self.candidates: Dict[str, List[str]] = {}
+        self.cum_weights: Dict[str, List[float]] = {}
+        for team_name, members in self.teams.items():
+            active = [user_id for user_id in members if user_id not in self.inactive]
+            rng.shuffle(active)
+            self.candidates[team_name] = active
+            self.cum_weights[team_name] = list(itertools.accumulate(
+                1 / (rank + 1) ** reviewer_skew for rank in range(len(active))
+            ))
+        self.team_names = list(self.teams)
+
+    def pick_pr(self):
+        """(author_id, reviewers) для очередного PR"""
+        team_name = self.rng.choice(self.team_names)
+        author_id = self.rng.choice(self.teams[team_name])
+        candidates = self.candidates[team_name]
+        available = len(candidates) - (author_id in candidates)
+        wanted = min(MAX_REVIEWERS, available)
+
+        reviewers: List[str] = []
+        while len(reviewers) < wanted:
+            for user_id in self.rng.choices(candidates, cum_weights=self.cum_weights[team_name], k=2 * MAX_REVIEWERS):
+                if user_id != author_id and user_id not in reviewers:
+                    reviewers.append(user_id)
+                    if len(reviewers) == wanted:
+                        break
+        return author_id, reviewers
+
+
+def load_org(cursor, org: OrgGenerator):
+    _copy(cursor, "teams", "team_name", [f"{team_name}\n" for team_name in org.teams])
+    _copy(cursor, "users", "user_id, username, team_name, is_active, open_review_count", [
+        f"{user_id}\t{user_id}\t{team_name}\t{'f' if user_id in org.inactive else 't'}\t0\n"
+        for team_name, members in org.teams.items() for user_id in members
+    ])
+
+
+def pr_batches(org: OrgGenerator, args, prefix: str, now: datetime, merged_since: datetime,
+               totals: Dict[str, int], open_loads: Counter,
+               sample: List[Tuple[str, List[str]]]) -> Iterator[Tuple[List[str], List[str], List[str]]]:
+    """Строки COPY для pull_request_ids, pull_requests и pr_reviewers пачками по args.batch_size PR"""
+    rng = org.rng
+    merged_span = (now - merged_since).total_seconds()
+    open_span = timedelta(days=OPEN_PR_MAX_AGE_DAYS).total_seconds()
+
+    for batch_start in range(0, args.prs, args.batch_size):
+        ids, prs, links = [], [], []
+        for i in range(batch_start, min(batch_start + args.batch_size, args.prs)):
+            pr_id = f"{prefix}-pr{i}"
+            author_id, reviewers = org.pick_pr()
+
+            if rng.random() < args.merged_ratio:
+                status = "MERGED"
+                created_at = merged_since + timedelta(seconds=rng.random() * merged_span)
+                merged_at = _timestamp(min(now, created_at + rng.random() * MAX_MERGE_DELAY))
+                version = 2
+                totals["merged_pr"] += 1
+            else:
+                status = "OPEN"
+                created_at = now - timedelta(seconds=rng.random() * open_span)
+                merged_at = "\\N"
+                version = 1
+                totals["open_pr"] += 1
+                open_loads.update(reviewers)
+                # Резервуарная выборка открытых PR для описания организации
+                if len(sample) < args.org_prs:
+                    sample.append((pr_id, reviewers))
+                elif args.org_prs:
+                    slot = rng.randrange(totals["open_pr"])
+                    if slot < args.org_prs:
+                        sample[slot] = (pr_id, reviewers)
+
+            created = _timestamp(created_at)
+            ids.append(f"{pr_id}\n")
+            prs.append(
+                f"{pr_id}\tPR {i}\t{author_id}\t{status}\t{{{','.join(reviewers)}}}\t{created}\t{merged_at}\t{version}\n"
+            )
+            links.extend(f"{pr_id}\t{user_id}\t{status}\t{created}\n" for user_id in reviewers)
+            totals["total_reviewers"] += len(reviewers)
+        yield ids, prs, links
+
+
+def _prefetch(batches: Iterator, depth: int) -> Iterator:
+    """
+    Генерирует пачки в отдельном потоке, пока текущая грузится через COPY:
+    в памяти не больше depth готовых пачек
+    """
+    done = object()
+    ready: queue.Queue = queue.Queue(maxsize=depth)
+    stop = threading.Event()
+
+    def produce():
+        try:
+            for batch in batches:
+                if stop.is_set():
+                    return
+                ready.put(batch)
+        except BaseException as e:
+            ready.put(e)
+        ready.put(done)
+
+    producer = threading.Thread(target=produce, name="generate-data", daemon=True)
+    producer.start()
+    try:
+        while True:
+            item = ready.get()
+            if item is done:
+                return
+            if isinstance(item, BaseException):
+                raise item
+            yield item
+    finally:
+        stop.set()
+        # Освобождаем место, если генератор ждёт в put
+        while producer.is_alive():
+            try:
+                ready.get(timeout=0.1)
+            except queue.Empty:
+                pass
+
+
+def load_prs(cursor, batches: Iterator, total: int):
+    started = time.perf_counter()
+    done = 0
+    for ids, prs, links in batches:
+        _copy(cursor, "pull_request_ids", "pull_request_id", ids)
+        _copy(cursor, "pull_requests",
+              "pull_request_id, pull_request_name, author_id, status, assigned_reviewers, created_at, merged_at, version",
+              prs)
+        _copy(cursor, "pr_reviewers", "pull_request_id, user_id, status, assigned_at", links)
+        cursor.connection.commit()
+
+        done += len(ids)
+        print(f"PR: {done}/{total} ({done / (time.perf_counter() - started):.0f} PR/с)", file=sys.stderr)
+
+
+def update_open_review_counts(cursor, open_loads: Counter):
+    cursor.execute("CREATE TEMP TABLE generated_loads (user_id varchar PRIMARY KEY, open_review_count int) ON COMMIT DROP")
+    _copy(cursor, "generated_loads", "user_id, open_review_count",
+          [f"{user_id}\t{count}\n" for user_id, count in open_loads.items()])
+    cursor.execute("""
+        UPDATE users u SET open_review_count = u.open_review_count + l.open_review_count
+        FROM generated_loads l WHERE l.user_id = u.user_id
+    """)
+
+
+def generate(args) -> int:
+    rng = random.Random(args.seed)
+    prefix = args.prefix or f"gen-{uuid.uuid4().hex[:6]}"
+    now = datetime.now(timezone.utc)
+    merged_since = datetime.combine(month_start(now.date(), -(args.months - 1)), datetime.min.time(), timezone.utc)
+
+    # Месячные секции под весь диапазон, иначе мердженые PR лягут в секцию по умолчанию
+    with SessionLocal() as db:
+        ensure_partitions(db, since=merged_since.date())
+
+    started = time.perf_counter()
+    org = OrgGenerator(rng, prefix, args.teams, args.users_per_team, args.inactive_ratio, args.reviewer_skew)
+    open_loads: Counter = Counter()
+    sample: List[Tuple[str, List[str]]] = []
+
+    conn = engine.raw_connection()
+    try:
+        cursor = conn.cursor()
+        load_org(cursor, org)
+        conn.commit()
+
+        totals = {"open_pr": 0, "merged_pr": 0, "total_reviewers": 0}
+        batches = pr_batches(org, args, prefix, now, merged_since, totals, open_loads, sample)
+        load_prs(cursor, _prefetch(batches, PREFETCH_BATCHES), args.prs)
+
+        update_open_review_counts(cursor, open_loads)
+        conn.commit()
+    finally:
+        conn.close()
+
+    users = sum(len(members) for members in org.teams.values())
+    with SessionLocal() as db:
+        stats_rollup.record_bulk_load(
+            db, now,
+            total_teams=len(org.teams),
+            total_users=users,
+            active_users=users - len(org.inactive),
+            total_pr=args.prs,
+            **totals,
+        )
+        db.commit()
+
+    if args.org:
+        Org(org.teams, dict(sample)).dump(args.org)
+
+    elapsed = time.perf_counter() - started
+    print(json.dumps({
+        "prefix": prefix,
+        "teams": len(org.teams),
+        "users": users,
+        "inactive_users": len(org.inactive),
+        "prs": args.prs,
+        **totals,
+        "elapsed_s": round(elapsed, 1),
+        "prs_per_s": round(args.prs / elapsed) if elapsed else None,
+        "org": args.org,
+    }, ensure_ascii=False, indent=2))
+    return 0
+
+
+def build_parser() -> argparse.ArgumentParser:
+    parser = argparse.ArgumentParser(description="Синтетическая организация для нагрузочных прогонов (загрузка через COPY)")
+    parser.add_argument("--teams", type=int, default=100)
+    parser.add_argument("--users-per-team", type=int, default=20)
+    parser.add_argument("--prs", type=int, default=100000)
+    parser.add_argument("--merged-ratio", type=float, default=0.7, help="доля мердженых PR")
+    parser.add_argument("--inactive-ratio", type=float, default=0.05, help="доля неактивных пользователей")
+    parser.add_argument("--reviewer-skew", type=float, default=1.0, help="перекос выбора ревьюверов (0 - равномерно)")
+    parser.add_argument("--months", type=int, default=12, help="за сколько месяцев распределить мердженые PR")
+    parser.add_argument("--batch-size", type=int, default=50000, help="PR в одной пачке COPY")
+    parser.add_argument("--prefix", help="префикс id (по умолчанию gen-<случайный>)")
+    parser.add_argument("--seed", type=int, help="зерно генератора для воспроизводимости")
+    parser.add_argument("--org", help="сохранить описание организации для benchmark run")
+    parser.add_argument("--org-prs", type=int, default=10000, help="сколько открытых PR попадёт в описание")
+    return parser
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    args = build_parser().parse_args(argv)
+    if args.months < 1 or args.batch_size < 1 or args.users_per_team < 1:
+        print("--months, --batch-size и --users-per-team должны быть положительными", file=sys.stderr)
+        return 2
+    return generate(args)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
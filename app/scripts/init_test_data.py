@@ -1,29 +1,24 @@
 from ..database import SessionLocal
-from ..crud import create_team, create_pr
+from ..crud import create_team, create_pr, merge_pr
 from ..schemas import TeamCreate, TeamMemberBase, PullRequestCreate
 from ..services.assignment import assign_reviewers
 from .. import models
 
 
-def is_database_empty(db):
-    try:
-        # Проверяем наличие таблиц и данных
-        team_count = db.query(models.Team).count()
-        user_count = db.query(models.User).count()
-        pr_count = db.query(models.PullRequest).count()
-                
-        # Считаем базу пустой, если нет команд (так как команды создаются первыми)
-        return team_count == 0
-    except Exception as e:
-        # Если произошла ошибка, считаем что база пустая
-        return True
+def is_database_empty(db) -> bool:
+    # Считаем базу пустой, если нет команд (так как команды создаются первыми)
+    return not db.query(db.query(models.Team).exists()).scalar()
 
 
-def init_test_data():    
+def init_test_data() -> bool:
+    """
+    Демо-данные для пустой базы (схема должна быть создана миграциями).
+    Запускается явно: python -m app.scripts.init_test_data. True - данные созданы.
+    """
     db = SessionLocal()
     try:
         if not is_database_empty(db):
-            return
+            return False
 
         teams_data = [
             {
@@ -96,16 +91,17 @@ def init_test_data():
         merged_pr = create_pr(db, PullRequestCreate(**merged_pr_data), reviewers)
         
         # Мерджим его
-        from sqlalchemy import func
-        merged_pr.status = "MERGED"
-        merged_pr.merged_at = func.now()
-        db.commit()
+        merge_pr(db, merged_pr["pull_request_id"])
+        return True
         
-    except Exception as e:
-        print(f"Ошибка при инициализации тестовых данных: {e}")
+    except Exception:
         db.rollback()
+        raise
     finally:
         db.close()
 
 if __name__ == "__main__":
-    init_test_data()
\ No newline at end of file
+    if init_test_data():
+        print("Демо-данные созданы")
+    else:
+        print("База не пуста, демо-данные не создавались")
\ No newline at end of file
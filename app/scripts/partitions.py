@@ -0,0 +1,80 @@
+"""
+Обслуживание секций pull_requests (см. app/services/partitions.py).
+
+Примеры:
+    # Секции с оценкой числа строк и размером
+    python -m app.scripts.partitions list
+
+    # Создать месячные секции на 6 месяцев вперёд (например, из cron)
+    python -m app.scripts.partitions ensure --months-ahead 6
+
+    # Перенести в схему archive секции мердженых PR старше 12 месяцев
+    python -m app.scripts.partitions archive --older-than-months 12 --dry-run
+    python -m app.scripts.partitions archive --older-than-months 12
+
+С --drop секции и назначения ревьюверов их PR удаляются, а не переносятся в архив.
+"""
+import argparse
+import json
+import sys
+from typing import List, Optional
+
+from ..database import SessionLocal
+from ..services import partitions
+
+
+def list_partitions(args) -> int:
+    with SessionLocal() as db:
+        for row in partitions.partition_stats(db):
+            print(f"{row['partition']:40} {row['estimated_rows']:>12} {row['total_bytes'] // 1024:>10} KiB  {row['bounds']}")
+    return 0
+
+
+def ensure(args) -> int:
+    with SessionLocal() as db:
+        created = partitions.ensure_partitions(db, args.months_ahead)
+    print(f"Создано секций: {len(created)}" + (f" ({', '.join(created)})" if created else ""))
+    return 0
+
+
+def archive(args) -> int:
+    with SessionLocal() as db:
+        results = partitions.archive_partitions(
+            db, args.older_than_months, drop=args.drop, dry_run=args.dry_run, schema=args.schema
+        )
+    print(json.dumps({
+        "dry_run": args.dry_run,
+        "partitions": results,
+        "prs": sum(item["prs"] for item in results),
+    }, ensure_ascii=False, indent=2))
+    return 0
+
+
+def build_parser() -> argparse.ArgumentParser:
+    parser = argparse.ArgumentParser(description="Секции pull_requests: создание и архивирование")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    list_parser = subparsers.add_parser("list", help="секции с оценкой числа строк и размером")
+    list_parser.set_defaults(handler=list_partitions)
+
+    ensure_parser = subparsers.add_parser("ensure", help="создать месячные секции заранее")
+    ensure_parser.add_argument("--months-ahead", type=int, default=partitions.PR_PARTITION_MONTHS_AHEAD)
+    ensure_parser.set_defaults(handler=ensure)
+
+    archive_parser = subparsers.add_parser("archive", help="отсоединить старые секции мердженых PR")
+    archive_parser.add_argument("--older-than-months", type=int, required=True)
+    archive_parser.add_argument("--schema", default=partitions.PR_ARCHIVE_SCHEMA)
+    archive_parser.add_argument("--drop", action="store_true", help="удалить секции вместо переноса в архив")
+    archive_parser.add_argument("--dry-run", action="store_true", help="только показать, что будет архивировано")
+    archive_parser.set_defaults(handler=archive)
+
+    return parser
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    args = build_parser().parse_args(argv)
+    return args.handler(args)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,244 @@
+"""
+Нагрузочная проверка корректности при параллельных изменениях.
+
+Параллельно бьёт в /pullRequest/reassign, /pullRequest/merge, /pullRequest/create,
+их пакетные варианты и /team/deactivateUsers на запущенном сервисе, после чего сверяет инварианты в базе:
+счётчики нагрузки, pr_reviewers, сводку статистики и отсутствие неактивных
+ревьюверов на открытых PR. Код выхода 1, если есть 5xx или нарушения.
+
+Пример:
+    python -m app.scripts.stress_concurrency --base-url http://localhost:8080 --workers 16 --duration 30
+"""
+import argparse
+import json
+import random
+import sys
+import threading
+import time
+import uuid
+import urllib.error
+import urllib.request
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, List, Optional, Tuple
+
+from sqlalchemy import text
+
+from ..database import engine
+
+
+class ApiClient:
+    def __init__(self, base_url: str, timeout: float = 30.0):
+        self.base_url = base_url.rstrip("/")
+        self.timeout = timeout
+
+    def request(self, method: str, path: str, body: Optional[Dict] = None,
+                params: Optional[Dict] = None) -> Tuple[int, Dict]:
+        url = self.base_url + path
+        if params:
+            url += "?" + "&".join(f"{key}={value}" for key, value in params.items())
+        data = json.dumps(body).encode() if body is not None else None
+        req = urllib.request.Request(url, data=data, method=method, headers={"Content-Type": "application/json"})
+        try:
+            with urllib.request.urlopen(req, timeout=self.timeout) as resp:
+                return resp.status, json.loads(resp.read() or b"{}")
+        except urllib.error.HTTPError as e:
+            try:
+                payload = json.loads(e.read() or b"{}")
+            except ValueError:
+                payload = {}
+            return e.code, payload
+
+
+def _error_code(payload: Dict) -> str:
+    detail = payload.get("detail")
+    if isinstance(detail, dict):
+        return detail.get("error", {}).get("code", "")
+    return ""
+
+
+class StressRun:
+    def __init__(self, client: ApiClient, team_size: int, initial_prs: int):
+        self.client = client
+        self.run_id = uuid.uuid4().hex[:8]
+        self.team_name = f"stress-{self.run_id}"
+        self.user_ids = [f"{self.team_name}-u{i}" for i in range(team_size)]
+        self.initial_prs = initial_prs
+        self.pr_ids: List[str] = []
+        self._lock = threading.Lock()
+        self.outcomes: Counter = Counter()
+
+    def setup(self):
+        status, payload = self.client.request("POST", "/team/add", {
+            "team_name": self.team_name,
+            "members": [
+                {"user_id": user_id, "username": user_id, "is_active": True}
+                for user_id in self.user_ids
+            ]
+        })
+        if status != 201:
+            raise RuntimeError(f"Не удалось создать команду: {status} {payload}")
+
+        prs = [self._new_pr() for _ in range(self.initial_prs)]
+        for start in range(0, len(prs), 500):
+            status, payload = self.client.request("POST", "/pullRequest/createBatch", {"pull_requests": prs[start:start + 500]})
+            if status != 200:
+                raise RuntimeError(f"Не удалось создать PR: {status} {payload}")
+        self.pr_ids = [pr["pull_request_id"] for pr in prs]
+
+    def _new_pr(self) -> Dict:
+        return {
+            "pull_request_id": f"{self.team_name}-pr-{uuid.uuid4().hex[:12]}",
+            "pull_request_name": "stress",
+            "author_id": random.choice(self.user_ids),
+        }
+
+    def _record(self, operation: str, status: int, payload: Dict):
+        with self._lock:
+            self.outcomes[(operation, status, _error_code(payload))] += 1
+
+    def op_create(self):
+        pr = self._new_pr()
+        status, payload = self.client.request("POST", "/pullRequest/create", pr)
+        self._record("create", status, payload)
+        if status == 201:
+            with self._lock:
+                self.pr_ids.append(pr["pull_request_id"])
+
+    def op_merge(self):
+        status, payload = self.client.request("POST", "/pullRequest/merge", {"pull_request_id": random.choice(self.pr_ids)})
+        self._record("merge", status, payload)
+
+    def op_reassign(self):
+        user_id = random.choice(self.user_ids)
+        status, payload = self.client.request("GET", "/users/getReview", params={"user_id": user_id, "status": "OPEN", "limit": 5})
+        prs = payload.get("pull_requests") if status == 200 else None
+        if not prs:
+            return
+        status, payload = self.client.request("POST", "/pullRequest/reassign", {
+            "pull_request_id": random.choice(prs)["pull_request_id"],
+            "old_user_id": user_id,
+        })
+        self._record("reassign", status, payload)
+
+    def op_merge_batch(self):
+        pr_ids = random.sample(self.pr_ids, min(len(self.pr_ids), random.randint(2, 10)))
+        status, payload = self.client.request("POST", "/pullRequest/mergeBatch", {"pull_request_ids": pr_ids})
+        self._record("merge_batch", status, payload)
+
+    def op_reassign_batch(self):
+        user_id = random.choice(self.user_ids)
+        status, payload = self.client.request("GET", "/users/getReview", params={"user_id": user_id, "status": "OPEN", "limit": 5})
+        prs = payload.get("pull_requests") if status == 200 else None
+        if not prs:
+            return
+        status, payload = self.client.request("POST", "/pullRequest/reassignBatch", {"reassignments": [
+            {"pull_request_id": pr["pull_request_id"], "old_user_id": user_id} for pr in prs
+        ]})
+        self._record("reassign_batch", status, payload)
+
+    def op_deactivate(self):
+        user_ids = random.sample(self.user_ids, random.randint(1, 2))
+        status, payload = self.client.request("POST", "/team/deactivateUsers", {"team_name": self.team_name, "user_ids": user_ids})
+        self._record("deactivate", status, payload)
+        # Возвращаем пользователей в строй, чтобы было кого назначать дальше
+        for user_id in user_ids:
+            status, payload = self.client.request("POST", "/users/setIsActive", {"user_id": user_id, "is_active": True})
+            self._record("reactivate", status, payload)
+
+    def worker(self, deadline: float):
+        operations = ([self.op_reassign] * 4 + [self.op_merge] * 2 + [self.op_create] * 2 + [self.op_deactivate]
+                      + [self.op_merge_batch, self.op_reassign_batch])
+        while time.monotonic() < deadline:
+            random.choice(operations)()
+
+    def check_invariants(self) -> List[str]:
+        """Сверка денормализованных данных с исходными; возвращает список нарушений"""
+        violations = []
+        with engine.connect() as conn:
+            rows = conn.execute(text("""
+                SELECT u.user_id, u.open_review_count, count(r.user_id)
+                FROM users u
+                LEFT JOIN pr_reviewers r ON r.user_id = u.user_id AND r.status = 'OPEN'
+                GROUP BY u.user_id
+                HAVING u.open_review_count <> count(r.user_id)
+            """)).all()
+            violations += [f"open_review_count {user_id}: {count} != {actual}" for user_id, count, actual in rows]
+
+            rows = conn.execute(text("""
+                SELECT p.pull_request_id FROM pull_requests p
+                WHERE (SELECT coalesce(array_agg(r.user_id ORDER BY r.user_id), '{}')
+                       FROM pr_reviewers r WHERE r.pull_request_id = p.pull_request_id)
+                   <> (SELECT coalesce(array_agg(x ORDER BY x), '{}') FROM unnest(p.assigned_reviewers) x)
+                   OR EXISTS (SELECT 1 FROM pr_reviewers r
+                              WHERE r.pull_request_id = p.pull_request_id AND r.status <> p.status)
+                   OR cardinality(p.assigned_reviewers) <> (SELECT count(DISTINCT x) FROM unnest(p.assigned_reviewers) x)
+                   OR p.author_id = ANY(p.assigned_reviewers)
+            """)).all()
+            violations += [f"assigned_reviewers/pr_reviewers расходятся: {pr_id}" for pr_id, in rows]
+
+            # setIsActive(false) ревьюверов не снимает, поэтому проверяем только команду прогона
+            rows = conn.execute(text("""
+                SELECT p.pull_request_id, u.user_id
+                FROM pull_requests p
+                JOIN pr_reviewers r ON r.pull_request_id = p.pull_request_id
+                JOIN users u ON u.user_id = r.user_id
+                WHERE p.status = 'OPEN' AND NOT u.is_active AND u.team_name = :team_name
+            """), {"team_name": self.team_name}).all()
+            violations += [f"неактивный ревьювер {user_id} на открытом PR {pr_id}" for pr_id, user_id in rows]
+
+            rollup = conn.execute(text("""
+                SELECT total_teams, total_users, active_users, total_pr, open_pr, merged_pr, total_reviewers
+                FROM stats_rollup
+            """)).one()
+            actual = conn.execute(text("""
+                SELECT (SELECT count(*) FROM teams),
+                       (SELECT count(*) FROM users),
+                       (SELECT count(*) FROM users WHERE is_active),
+                       (SELECT count(*) FROM pull_requests),
+                       (SELECT count(*) FROM pull_requests WHERE status = 'OPEN'),
+                       (SELECT count(*) FROM pull_requests WHERE status = 'MERGED'),
+                       (SELECT coalesce(sum(cardinality(assigned_reviewers)), 0) FROM pull_requests)
+            """)).one()
+            if tuple(rollup) != tuple(actual):
+                violations.append(f"stats_rollup {tuple(rollup)} != {tuple(actual)}")
+
+        return violations
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="Параллельная нагрузка на запись с проверкой инвариантов")
+    parser.add_argument("--base-url", default="http://localhost:8080")
+    parser.add_argument("--workers", type=int, default=16)
+    parser.add_argument("--duration", type=float, default=30.0, help="секунд нагрузки")
+    parser.add_argument("--team-size", type=int, default=12)
+    parser.add_argument("--initial-prs", type=int, default=200)
+    args = parser.parse_args(argv)
+
+    run = StressRun(ApiClient(args.base_url), args.team_size, args.initial_prs)
+    run.setup()
+    print(f"Команда {run.team_name}: {len(run.user_ids)} участников, {len(run.pr_ids)} PR")
+
+    deadline = time.monotonic() + args.duration
+    with ThreadPoolExecutor(max_workers=args.workers) as executor:
+        for future in [executor.submit(run.worker, deadline) for _ in range(args.workers)]:
+            future.result()
+
+    for (operation, status, code), count in sorted(run.outcomes.items()):
+        print(f"{operation:12} {status} {code or '-':20} {count}")
+
+    server_errors = sum(count for (_, status, _), count in run.outcomes.items() if status >= 500)
+    violations = run.check_invariants()
+    for violation in violations:
+        print(f"НАРУШЕНИЕ: {violation}")
+
+    if server_errors or violations:
+        print(f"FAIL: {server_errors} ответов 5xx, {len(violations)} нарушений")
+        return 1
+
+    print("OK: инварианты соблюдены")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
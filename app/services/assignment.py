@@ -1,65 +1,54 @@
+from sqlalchemy import Row
 from sqlalchemy.orm import Session
-import random
-from typing import List
+from typing import Dict, List, Optional, Tuple
 from .. import crud
+from ..metrics import ASSIGNMENT_DURATION
+from .roster_cache import roster_cache
+from .selection import get_strategy
 
 
 def assign_reviewers(db: Session, author_id: str, max_reviewers: str = 2) -> List[str]:
-    # Получаем автора
-    author = crud.get_user(db, author_id)
-    if not author:
-        return []
-    
-    # Получаем активных членов команды (исключая автора)
-    team_members = crud.get_active_team_members(db, author.team_name, author_id)
-    
-    available_reviewers = [user.user_id for user in team_members]
-    num_reviewers = min(max_reviewers, len(available_reviewers))
-    
-    if num_reviewers > 0:
-        return random.sample(available_reviewers, num_reviewers)
-    
-    return []
+    with ASSIGNMENT_DURATION.time(operation="create"):
+        # Получаем команду автора (из кэша составов)
+        team_name = roster_cache.get_user_team(db, author_id)
+        if not team_name:
+            return []
+        
+        # Получаем активных членов команды (исключая автора)
+        available_reviewers = roster_cache.get_active_members(db, team_name, author_id)
+        
+        return get_strategy().select(db, available_reviewers, max_reviewers)
 
 
-def reassign_reviewer(db: Session, pr_id: str, old_user_id: str) -> str:
-    pr = crud.get_pr(db, pr_id)
-    if not pr:
-        return None
-    
-    # Проверяем, что старый ревьювер назначен на PR
-    if old_user_id not in pr.assigned_reviewers:
-        return None
-    
-    # Получаем команду старого ревьювера
-    old_reviewer = crud.get_user(db, old_user_id)
-    if not old_reviewer:
-        return None
-    
-    # Получаем доступных кандидатов из команды
-    available_candidates = crud.get_active_team_members(
-        db, old_reviewer.team_name, old_user_id
-    )
-    
-    # Исключаем уже назначенных ревьюверов и автора
-    available_user_ids = [
-        user.user_id for user in available_candidates 
-        if user.user_id not in pr.assigned_reviewers and user.user_id != pr.author_id
-    ]
-    
-    if not available_user_ids:
-        return None
-    
-    new_reviewer_id = random.choice(available_user_ids)
-    
-    new_reviewers = []
-    for reviewer in pr.assigned_reviewers:
-        if reviewer == old_user_id:
-            new_reviewers.append(new_reviewer_id)
-        else:
-            new_reviewers.append(reviewer)
-    
-    pr.assigned_reviewers = new_reviewers
-    db.commit()
-    
-    return new_reviewer_id
\ No newline at end of file
+def lock_pr_for_reassign(db: Session, pr_id: str, old_user_id: str) -> Tuple[Optional[Row], List[str]]:
+    """
+    Блокирует PR для переназначения и возвращает его вместе с кандидатами на замену
+    old_user_id (активные участники его команды из кэша составов). Нагрузка кандидатов,
+    если она нужна стратегии, читается тем же запросом, что и PR.
+    """
+    team_name = roster_cache.get_user_team(db, old_user_id)
+    candidates = roster_cache.get_active_members(db, team_name, old_user_id) if team_name else []
+    pr = crud.get_pr_for_reassign(db, pr_id, candidates if get_strategy().uses_load else None)
+    return pr, candidates
+
+
+def reassign_reviewer(db: Session, pr: Row, old_user_id: str, candidates: List[str]) -> Optional[Tuple[Dict, str]]:
+    """
+    Выбирает замену old_user_id в заблокированном PR и записывает её одним запросом.
+    Возвращает (поля PR после замены, новый ревьювер) или None, если кандидатов нет.
+    """
+    with ASSIGNMENT_DURATION.time(operation="reassign"):
+        # Исключаем уже назначенных ревьюверов и автора
+        available_user_ids = [
+            user_id for user_id in candidates
+            if user_id not in pr.assigned_reviewers and user_id != pr.author_id
+        ]
+        
+        if not available_user_ids:
+            return None
+        
+        strategy = get_strategy()
+        loads = (pr.loads or {}) if strategy.uses_load else None
+        new_reviewer_id = strategy.select(db, available_user_ids, 1, loads=loads)[0]
+    
+    return crud.reassign_pr_reviewer(db, pr.pull_request_id, old_user_id, new_reviewer_id), new_reviewer_id
@@ -0,0 +1,176 @@
+"""
+Пакетные операции с PR: множество элементов обрабатывается в одной транзакции
+набором запросов, не зависящим от размера пакета.
+"""
+import logging
+from typing import Dict, List
+
+from sqlalchemy.orm import Session
+
+from .. import crud, schemas
+from ..metrics import ASSIGNMENT_DURATION
+from .roster_cache import roster_cache
+from .selection import get_strategy
+
+logger = logging.getLogger(__name__)
+
+MAX_REVIEWERS = 2
+
+
+def create_prs_batch(db: Session, prs: List[schemas.PullRequestCreate]) -> List[Dict]:
+    """
+    Создаёт PR пакетом: существующие id и авторы проверяются двумя запросами,
+    ревьюверы назначаются в памяти по составам команд, вставка - многострочным INSERT.
+    """
+    pr_ids = list({pr.pull_request_id for pr in prs})
+    existing_ids = crud.get_existing_pr_ids(db, pr_ids)
+    author_teams = crud.get_user_teams(db, list({pr.author_id for pr in prs}))
+
+    strategy = get_strategy()
+    loads = None
+    if strategy.uses_load:
+        # Счётчики всех участников затронутых команд одним запросом, дальше ведём их в памяти
+        members = {
+            user_id
+            for team_name in set(author_teams.values())
+            for user_id in roster_cache.get_team(db, team_name).active_user_ids
+        }
+        loads = crud.get_open_review_counts(db, list(members))
+
+    results = []
+    to_create = []
+    reviewers: Dict[str, List[str]] = {}
+    seen_ids = set()
+
+    # Подбор ревьюверов в памяти - время всего пакета
+    with ASSIGNMENT_DURATION.time(operation="batch"):
+        for pr in prs:
+            if pr.pull_request_id in existing_ids or pr.pull_request_id in seen_ids:
+                results.append({"pull_request_id": pr.pull_request_id, "status": "PR_EXISTS", "assigned_reviewers": []})
+                continue
+
+            team_name = author_teams.get(pr.author_id)
+            if not team_name:
+                results.append({"pull_request_id": pr.pull_request_id, "status": "NOT_FOUND", "assigned_reviewers": []})
+                continue
+
+            seen_ids.add(pr.pull_request_id)
+            candidates = roster_cache.get_active_members(db, team_name, pr.author_id)
+            selected = strategy.select(db, candidates, MAX_REVIEWERS, loads=loads)
+            if loads is not None:
+                for user_id in selected:
+                    loads[user_id] = loads.get(user_id, 0) + 1
+
+            reviewers[pr.pull_request_id] = selected
+            to_create.append(pr)
+            results.append({"pull_request_id": pr.pull_request_id, "status": "CREATED", "assigned_reviewers": selected})
+
+    crud.create_prs_bulk(db, to_create, reviewers)
+    db.commit()
+
+    logger.info(f"Пакетное создание PR: создано {len(to_create)} из {len(prs)}")
+    return results
+
+
+def merge_prs_batch(db: Session, pr_ids: List[str]) -> List[Dict]:
+    """
+    Мержит PR пакетом: открытые переводятся в MERGED одним UPDATE ... RETURNING,
+    для остальных одним запросом выясняется, смержены ли они раньше или их нет.
+    """
+    pr_ids = list(dict.fromkeys(pr_ids))
+    merged = crud.merge_prs_bulk(db, pr_ids)
+    # Открытые из пакета уже смержены: остальные либо MERGED, либо их нет
+    others = crud.get_prs_for_update(db, [pr_id for pr_id in pr_ids if pr_id not in merged], status="MERGED")
+    db.commit()
+
+    results = []
+    for pr_id in pr_ids:
+        if pr_id in merged:
+            results.append({"pull_request_id": pr_id, "status": "MERGED", "pr": merged[pr_id]})
+        elif pr_id in others:
+            # Повторный merge, как и у /pullRequest/merge, не ошибка
+            results.append({"pull_request_id": pr_id, "status": "ALREADY_MERGED", "pr": others[pr_id]})
+        else:
+            results.append({"pull_request_id": pr_id, "status": "NOT_FOUND", "pr": None})
+
+    logger.info(f"Пакетный merge PR: смержено {len(merged)} из {len(pr_ids)}")
+    return results
+
+
+def reassign_prs_batch(db: Session, items: List[schemas.PullRequestReassign]) -> List[Dict]:
+    """
+    Переназначает ревьюверов пакетом: PR блокируются одним запросом, замены
+    планируются в памяти по одному снимку составов команд и нагрузки
+    и применяются набором запросов, не зависящим от размера пакета.
+    Элементы обрабатываются по порядку, следующий видит результат предыдущего.
+    """
+    pr_ids = list({item.pull_request_id for item in items})
+    # Блокируются только открытые PR; смерженные от несуществующих отличает реестр id
+    prs = crud.get_prs_for_update(db, pr_ids, status="OPEN")
+    missing = [pr_id for pr_id in pr_ids if pr_id not in prs]
+    merged_ids = crud.get_existing_pr_ids(db, missing) if missing else set()
+    user_teams = crud.get_user_teams(db, list({item.old_user_id for item in items}))
+
+    strategy = get_strategy()
+    loads = None
+    if strategy.uses_load:
+        members = {
+            user_id
+            for team_name in set(user_teams.values())
+            for user_id in roster_cache.get_team(db, team_name).active_user_ids
+        }
+        loads = crud.get_open_review_counts(db, list(members))
+
+    results = []
+    reviewers: Dict[str, List[str]] = {}
+    # Для каждого PR: текущий ревьювер -> исходный, чтобы цепочка a -> b -> c стала заменой a -> c
+    origins: Dict[str, Dict[str, str]] = {}
+
+    with ASSIGNMENT_DURATION.time(operation="reassign_batch"):
+        for item in items:
+            pr_id, old_user_id = item.pull_request_id, item.old_user_id
+            pr = prs.get(pr_id)
+            result = {"pull_request_id": pr_id, "old_user_id": old_user_id, "status": None, "replaced_by": None}
+            results.append(result)
+
+            if pr is None:
+                result["status"] = "PR_MERGED" if pr_id in merged_ids else "NOT_FOUND"
+                continue
+
+            current = reviewers.setdefault(pr_id, list(pr["assigned_reviewers"] or []))
+            if old_user_id not in current:
+                result["status"] = "NOT_ASSIGNED"
+                continue
+
+            team_name = user_teams.get(old_user_id)
+            candidates = [
+                user_id for user_id in roster_cache.get_active_members(db, team_name, old_user_id)
+                if user_id not in current and user_id != pr["author_id"]
+            ] if team_name else []
+            if not candidates:
+                result["status"] = "NO_CANDIDATE"
+                continue
+
+            new_user_id = strategy.select(db, candidates, 1, loads=loads)[0]
+            if loads is not None:
+                loads[new_user_id] = loads.get(new_user_id, 0) + 1
+                loads[old_user_id] = loads.get(old_user_id, 0) - 1
+
+            reviewers[pr_id] = [new_user_id if user_id == old_user_id else user_id for user_id in current]
+            pr_origins = origins.setdefault(pr_id, {})
+            pr_origins[new_user_id] = pr_origins.pop(old_user_id, old_user_id)
+            result["status"] = "REASSIGNED"
+            result["replaced_by"] = new_user_id
+
+    replacements = [
+        (pr_id, original, current)
+        for pr_id, pr_origins in origins.items()
+        for current, original in pr_origins.items()
+        if current != original
+    ]
+    changed = {pr_id for pr_id, _, _ in replacements}
+    crud.apply_reviewer_changes(db, {pr_id: reviewers[pr_id] for pr_id in changed}, replacements)
+    db.commit()
+
+    logger.info(f"Пакетное переназначение: {sum(1 for r in results if r['status'] == 'REASSIGNED')} из {len(items)}")
+    return results
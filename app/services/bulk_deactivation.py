@@ -2,11 +2,15 @@
 Сервис для массовой деактивации пользователей и безопасного переназначения PR
 """
 from sqlalchemy.orm import Session
-from sqlalchemy import and_, or_, update
-from typing import List, Dict
+from sqlalchemy import and_, select, update
+from typing import List, Dict, Optional, Set, Tuple
+import heapq
+import random
 import time
 import logging
 from .. import models, crud
+from ..metrics import BULK_DEACTIVATION_DURATION, BULK_DEACTIVATION_PRS, BULK_DEACTIVATION_USERS
+from . import roster_cache, stats_rollup
 
 logger = logging.getLogger(__name__)
 
@@ -16,25 +20,31 @@ class BulkDeactivationService:
         self.db = db
         self.start_time = time.time()
     
-    def deactivate_users_with_reassignment(self, team_name: str, user_ids: List[str]) -> Dict:
+    def deactivate_users_with_reassignment(self, team_name: str, user_ids: List[str], commit: bool = True) -> Dict:
         """
-        Массовая деактивация пользователей с безопасным переназначением открытых PR
+        Массовая деактивация пользователей с безопасным переназначением открытых PR.
+        Число запросов не зависит ни от числа пользователей, ни от числа PR:
+        данные читаются пакетно, замены планируются в памяти и применяются одной транзакцией.
+        С commit=False транзакцию завершает вызывающий (фоновая задача пишет в неё прогресс).
         """
 
         logger.info(f"Начало массовой деактивации пользователей: {user_ids} из команды {team_name}")
         
-        # Проверяем существование команды
-        team = crud.get_team(self.db, team_name)
+        # Проверяем существование команды и блокируем её строку:
+        # массовые деактивации одной команды выполняются по очереди
+        team = self.db.query(models.Team.team_name).filter(
+            models.Team.team_name == team_name
+        ).with_for_update().scalar()
         if not team:
             raise ValueError(f"Команда {team_name} не найдена")
         
-        # Проверяем существование пользователей
+        # Проверяем существование пользователей одним запросом
+        user_teams = crud.get_user_teams(self.db, user_ids)
         valid_users = []
         failed_deactivations = []
         
-        for user_id in user_ids:
-            user = crud.get_user(self.db, user_id)
-            if user and user.team_name == team_name:
+        for user_id in dict.fromkeys(user_ids):
+            if user_teams.get(user_id) == team_name:
                 valid_users.append(user_id)
             else:
                 failed_deactivations.append(user_id)
@@ -46,151 +56,196 @@ class BulkDeactivationService:
                 "failed_deactivations": failed_deactivations,
                 "reassigned_prs": [],
                 "total_operations": 0,
-                "processing_time_ms": 0
+                "processing_time_ms": self._elapsed_ms()
             }
         
-        # Находим все открытые PR, где деактивируемые пользователи являются ревьюверами
-        open_prs_with_deactivated_reviewers = self._find_open_prs_with_reviewers(valid_users)
+        # Порядок блокировок тот же, что у reassign/merge: сначала PR, потом пользователи
+        self.lock_open_prs(valid_users)
+        deactivated_count, reassignment_results = self.deactivate_and_reassign(valid_users, team_name)
         
-        # Переназначаем ревьюверов в найденных PR
-        reassignment_results = self._reassign_reviewers_bulk(open_prs_with_deactivated_reviewers, valid_users, team_name)
+        stats_rollup.apply_deltas(self.db, active_users=-deactivated_count)
+        if commit:
+            self.db.commit()
         
-        # Деактивируем пользователей
-        deactivated_users = self._deactivate_users_bulk(valid_users)
+        BULK_DEACTIVATION_USERS.observe(len(valid_users))
+        BULK_DEACTIVATION_PRS.observe(len(reassignment_results))
+        BULK_DEACTIVATION_DURATION.observe(time.time() - self.start_time)
         
         return {
-            "deactivated_users": deactivated_users,
+            "deactivated_users": valid_users,
             "failed_deactivations": failed_deactivations,
             "reassigned_prs": reassignment_results,
-            "total_operations": len(deactivated_users) + len(reassignment_results)
+            "total_operations": len(valid_users) + len(reassignment_results),
+            "processing_time_ms": self._elapsed_ms()
         }
     
-    def _find_open_prs_with_reviewers(self, user_ids: List[str]) -> List[models.PullRequest]:
-        """Находит все открытые PR, где указанные пользователи являются ревьюверами"""        
-        prs = self.db.query(models.PullRequest).filter(
+    def _elapsed_ms(self) -> int:
+        """Время с создания сервиса, включая повторы при конфликтах"""
+        return int((time.time() - self.start_time) * 1000)
+    
+    def lock_open_prs(self, user_ids: List[str]):
+        """Блокирует открытые PR, где пользователи - ревьюверы; вызывается до блокировки самих пользователей"""
+        if user_ids:
+            self._find_open_prs_with_reviewers(user_ids)
+    
+    def deactivate_and_reassign(self, user_ids: List[str], team_name: str) -> Tuple[int, List[Dict]]:
+        """
+        Деактивирует пользователей команды и переназначает их открытые PR.
+        Возвращает (число деактивированных, результаты переназначения); коммит и сводка - за вызывающим.
+        """
+        if not user_ids:
+            return 0, []
+        
+        # UPDATE ждёт транзакции, успевшие назначить пользователей на новые PR,
+        # а более поздние назначения получат конфликт
+        deactivated_count = self._deactivate_users_bulk(user_ids, team_name)
+        
+        # Перечитываем PR уже после деактивации, чтобы увидеть назначения, закоммиченные за время ожидания
+        open_prs_with_deactivated_reviewers = self._find_open_prs_with_reviewers(user_ids)
+        
+        # Планируем замены в памяти и применяем их пакетно
+        reassignment_results = self._reassign_reviewers_bulk(open_prs_with_deactivated_reviewers, user_ids, team_name)
+        return deactivated_count, reassignment_results
+    
+    def _find_open_prs_with_reviewers(self, user_ids: List[str]) -> List[Tuple]:
+        """
+        Находит все открытые PR, где указанные пользователи являются ревьюверами,
+        и блокирует их до коммита (в порядке id, чтобы массовые операции не блокировали друг друга)
+        """
+        reviewed_pr_ids = select(models.PRReviewer.pull_request_id).where(
             and_(
-                models.PullRequest.status == 'OPEN',
-                or_(*[models.PullRequest.assigned_reviewers.contains([user_id]) for user_id in user_ids])
+                models.PRReviewer.status == 'OPEN',
+                models.PRReviewer.user_id.in_(user_ids)
             )
-        ).all()
+        )
+        
+        prs = self.db.query(
+            models.PullRequest.pull_request_id,
+            models.PullRequest.pull_request_name,
+            models.PullRequest.author_id,
+            models.PullRequest.assigned_reviewers
+        ).filter(
+            and_(
+                models.PullRequest.pull_request_id.in_(reviewed_pr_ids),
+                models.PullRequest.status == 'OPEN'
+            )
+        ).order_by(
+            models.PullRequest.pull_request_id
+        ).with_for_update(of=models.PullRequest).all()
         
         return prs
     
-    def _reassign_reviewers_bulk(self, prs: List[models.PullRequest], 
+    def _reassign_reviewers_bulk(self, prs: List[Tuple], 
                                deactivated_user_ids: List[str], team_name: str) -> List[Dict]:
         """Массовое переназначение ревьюверов в PR"""
-        results = []
-        
-        for pr in prs:
-            for deactivated_user_id in deactivated_user_ids:
-                if deactivated_user_id in pr.assigned_reviewers:
-                    result = self._safe_reassign_reviewer(pr, deactivated_user_id, team_name)
-                    results.append(result)
-        
-        if results:
-            self.db.commit()
-        
-        return results
-    
-    def _safe_reassign_reviewer(self, pr: models.PullRequest, old_user_id: str, team_name: str) -> Dict:
-        """Безопасное переназначение одного ревьювера"""
-        if pr.status != 'OPEN':
-            return {
-                "pull_request_id": pr.pull_request_id,
-                "pull_request_name": pr.pull_request_name,
-                "old_reviewer": old_user_id,
-                "new_reviewer": None,
-                "status": "SKIPPED_MERGED"
-            }
+        if not prs:
+            return []
         
-        # Ищем замену из активных пользователей команды
-        new_reviewer_id = self._find_replacement_candidate(pr, old_user_id, team_name)
+        candidates = _LoadBalancer(self._load_candidates(team_name, deactivated_user_ids))
+        deactivated = set(deactivated_user_ids)
         
-        if new_reviewer_id:
-            new_reviewers = []
-            for reviewer in pr.assigned_reviewers:
-                if reviewer == old_user_id:
-                    new_reviewers.append(new_reviewer_id)
-                else:
-                    new_reviewers.append(reviewer)
-            
-            pr.assigned_reviewers = new_reviewers
+        results = []
+        new_reviewers: Dict[str, List[str]] = {}
+        replacements = []
+        
+        for pr_id, pr_name, author_id, assigned_reviewers in prs:
+            reviewers = list(assigned_reviewers or [])
+            to_replace = [r for r in reviewers if r in deactivated]
+            if not to_replace:
+                # Ревьювера успели переназначить до того, как мы взяли блокировку
+                continue
             
-            return {
-                "pull_request_id": pr.pull_request_id,
-                "pull_request_name": pr.pull_request_name,
-                "old_reviewer": old_user_id,
-                "new_reviewer": new_reviewer_id,
-                "status": "SUCCESS"
-            }
-        else:
-            # Удаляем деактивируемого пользователя из ревьюверов (без замены)
-            new_reviewers = [r for r in pr.assigned_reviewers if r != old_user_id]
-            pr.assigned_reviewers = new_reviewers
+            for deactivated_user_id in to_replace:
+                # Ищем наименее загруженного активного участника команды
+                new_reviewer_id = candidates.take(exclude={author_id, *reviewers})
+                if new_reviewer_id:
+                    reviewers = [new_reviewer_id if r == deactivated_user_id else r for r in reviewers]
+                else:
+                    # Удаляем деактивируемого пользователя из ревьюверов (без замены)
+                    reviewers = [r for r in reviewers if r != deactivated_user_id]
+                
+                replacements.append((pr_id, deactivated_user_id, new_reviewer_id))
+                results.append({
+                    "pull_request_id": pr_id,
+                    "pull_request_name": pr_name,
+                    "old_reviewer": deactivated_user_id,
+                    "new_reviewer": new_reviewer_id,
+                    "status": "SUCCESS" if new_reviewer_id else "NO_CANDIDATE"
+                })
             
-            return {
-                "pull_request_id": pr.pull_request_id,
-                "pull_request_name": pr.pull_request_name,
-                "old_reviewer": old_user_id,
-                "new_reviewer": None,
-                "status": "NO_CANDIDATE"
-            }
-    
-    def _find_replacement_candidate(self, pr: models.PullRequest, old_user_id: str, team_name: str) -> str:
-        """Находит подходящего кандидата для замены ревьювера"""
-        available_users = self.db.query(models.User).filter(
-            and_(
-                models.User.team_name == team_name,
-                models.User.is_active == True,
-                models.User.user_id != old_user_id,
-                models.User.user_id != pr.author_id,
-                ~models.User.user_id.in_(pr.assigned_reviewers)
-            )
-        ).all()
-        
-        if not available_users:
-            return None
+            new_reviewers[pr_id] = reviewers
         
-        user_assignments = self._get_user_assignment_counts(team_name, [u.user_id for u in available_users])
+        updated_ids = crud.apply_reviewer_changes(self.db, new_reviewers, replacements)
         
-        # Сортируем по количеству назначений
-        available_users.sort(key=lambda u: user_assignments.get(u.user_id, 0))
+        # PR, смерженные между чтением и записью, не трогаем
+        for result in results:
+            if result["pull_request_id"] not in updated_ids:
+                result["new_reviewer"] = None
+                result["status"] = "SKIPPED_MERGED"
         
-        return available_users[0].user_id
+        return results
     
-    def _get_user_assignment_counts(self, team_name: str, user_ids: List[str]) -> Dict[str, int]:
-        """Возвращает количество текущих назначений для пользователей"""
-        from sqlalchemy import func
-        
-        if not user_ids:
-            return {}
-        
-        assignment_counts = self.db.query(
+    def _load_candidates(self, team_name: str, excluded_user_ids: List[str]) -> Dict[str, int]:
+        """
+        Активные участники команды (кроме деактивируемых) и их текущая нагрузка.
+        Строки не блокируем: кандидата, деактивированного параллельно,
+        отловит обновление счётчиков (ConcurrentUpdateError и повтор).
+        """
+        rows = self.db.query(
             models.User.user_id,
-            func.count(models.PullRequest.pull_request_id).label('assignment_count')
-        ).join(
-            models.PullRequest,
-            func.array_to_string(models.PullRequest.assigned_reviewers, ',').contains(models.User.user_id)
+            models.User.open_review_count
         ).filter(
             and_(
                 models.User.team_name == team_name,
-                models.User.user_id.in_(user_ids),
-                models.PullRequest.status == 'OPEN'
+                models.User.is_active == True,
+                ~models.User.user_id.in_(excluded_user_ids)
             )
-        ).group_by(models.User.user_id).all()
+        ).all()
         
-        return {user_id: count for user_id, count in assignment_counts}
+        return {user_id: count for user_id, count in rows}
     
-    def _deactivate_users_bulk(self, user_ids: List[str]) -> List[str]:
-        """Массовая деактивация пользователей одним запросом"""
+    def _deactivate_users_bulk(self, user_ids: List[str], team_name: str) -> int:
+        """Массовая деактивация пользователей одним запросом; возвращает число деактивированных"""
         if not user_ids:
-            return []
+            return 0
         
         stmt = update(models.User).where(
-            models.User.user_id.in_(user_ids)
+            and_(
+                models.User.user_id.in_(user_ids),
+                models.User.is_active == True
+            )
         ).values(is_active=False)
         
         result = self.db.execute(stmt)
-        self.db.commit()
+        roster_cache.mark_dirty(self.db, [team_name])
                 
-        return user_ids
\ No newline at end of file
+        return result.rowcount
+
+
+class _LoadBalancer:
+    """Куча кандидатов по числу открытых ревью: выбор наименее загруженного за O(log n)"""
+
+    def __init__(self, loads: Dict[str, int]):
+        self._heap = [(load, random.random(), user_id) for user_id, load in loads.items()]
+        heapq.heapify(self._heap)
+
+    def take(self, exclude: Set[str]) -> Optional[str]:
+        skipped = []
+        chosen = None
+        while self._heap:
+            entry = heapq.heappop(self._heap)
+            if entry[2] in exclude:
+                skipped.append(entry)
+                continue
+            chosen = entry
+            break
+        
+        for entry in skipped:
+            heapq.heappush(self._heap, entry)
+        
+        if chosen is None:
+            return None
+        
+        load, tie_breaker, user_id = chosen
+        heapq.heappush(self._heap, (load + 1, tie_breaker, user_id))
+        return user_id
@@ -0,0 +1,78 @@
+"""
+Повтор операций записи при конфликтах параллельных транзакций.
+
+Записи блокируют PR (SELECT ... FOR UPDATE) и строки пользователей в разном порядке,
+поэтому взаимоблокировки возможны; Postgres обрывает одну из транзакций,
+и её безопасно выполнить заново с нуля. Кроме того, назначение ревьювера,
+которого параллельно деактивировали, тоже считается конфликтом.
+
+В DB_ASYNC_MODE синхронные обработчики выполняются в greenlet AsyncSession.run_sync
+в потоке цикла событий, поэтому пауза перед повтором там уступает цикл
+(asyncio.sleep), а не блокирует его.
+"""
+import asyncio
+import os
+import random
+import time
+import logging
+from typing import Callable, TypeVar
+
+from sqlalchemy.exc import DBAPIError, MissingGreenlet
+from sqlalchemy.orm import Session
+from sqlalchemy.orm.exc import StaleDataError
+from sqlalchemy.util import await_only
+
+from .roster_cache import roster_cache
+
+logger = logging.getLogger(__name__)
+
+DB_CONFLICT_RETRIES = int(os.getenv("DB_CONFLICT_RETRIES", "3"))
+
+# serialization_failure, deadlock_detected, lock_not_available
+RETRYABLE_PGCODES = {"40001", "40P01", "55P03"}
+
+T = TypeVar("T")
+
+
+class ConcurrentUpdateError(Exception):
+    """Данные изменились параллельно; операцию нужно повторить"""
+
+
+def is_retryable(error: Exception) -> bool:
+    if isinstance(error, (ConcurrentUpdateError, StaleDataError)):
+        return True
+    if isinstance(error, DBAPIError):
+        return getattr(error.orig, "pgcode", None) in RETRYABLE_PGCODES
+    return False
+
+
+def run_with_retry(db: Session, operation: Callable[[], T], attempts: int = DB_CONFLICT_RETRIES) -> T:
+    """
+    Выполняет operation() (вместе с коммитом) и при конфликте откатывает
+    транзакцию и повторяет до attempts раз. Если конфликт не ушёл -
+    ConcurrentUpdateError, прочие ошибки пробрасываются сразу.
+    """
+    for attempt in range(1, attempts + 1):
+        try:
+            return operation()
+        except Exception as e:
+            if not is_retryable(e):
+                raise
+            db.rollback()
+            if isinstance(e, ConcurrentUpdateError):
+                # Скорее всего, кэш составов ещё не знает о деактивации в другом воркере
+                roster_cache.clear()
+            if attempt == attempts:
+                logger.warning(f"Конфликт параллельных изменений не разрешился за {attempts} попыток: {e}")
+                raise ConcurrentUpdateError(str(e)) from e
+            logger.info(f"Конфликт параллельных изменений, попытка {attempt} из {attempts}: {e}")
+            _backoff(random.uniform(0, 0.01 * 2 ** attempt))
+
+
+def _backoff(seconds: float):
+    """Пауза перед повтором: внутри greenlet AsyncSession - через цикл событий, иначе time.sleep"""
+    try:
+        await_only(asyncio.sleep(seconds))
+    except MissingGreenlet:
+        # Обычный поток (синхронный режим, фоновые задачи): await_only уже закрыл корутину
+        time.sleep(seconds)
@@ -0,0 +1,178 @@
+"""
+Фоновые массовые деактивации.
+
+POST /team/deactivateUsers?async=true ставит задачу в таблицу deactivation_jobs
+и сразу отвечает 202 с job_id. Воркер (поток в каждом процессе сервиса) забирает
+задачи через SELECT ... FOR UPDATE SKIP LOCKED, поэтому процессы не мешают друг
+другу, и обрабатывает user_ids пачками по DEACTIVATION_JOB_CHUNK: каждая пачка -
+отдельная транзакция, в которой вместе с деактивацией записывается прогресс.
+Задачу, брошенную упавшим процессом (heartbeat_at старше DEACTIVATION_JOB_STALE),
+подхватывает другой воркер с первой необработанной пачки.
+"""
+import logging
+import os
+import threading
+import uuid
+from typing import Dict, List, Optional
+
+from sqlalchemy import and_, cast, func, insert, or_, update, Integer
+from sqlalchemy.orm import Session
+
+from .. import models
+from .bulk_deactivation import BulkDeactivationService
+from .concurrency import run_with_retry
+
+logger = logging.getLogger(__name__)
+
+DEACTIVATION_JOBS_WORKER = os.getenv("DEACTIVATION_JOBS_WORKER", "true").lower() == "true"
+DEACTIVATION_JOB_CHUNK = int(os.getenv("DEACTIVATION_JOB_CHUNK", "50"))
+DEACTIVATION_JOB_POLL = float(os.getenv("DEACTIVATION_JOB_POLL", "1.0"))
+DEACTIVATION_JOB_STALE = float(os.getenv("DEACTIVATION_JOB_STALE", "300"))
+
+J = models.DeactivationJob
+
+JOB_COLUMNS = (
+    J.job_id,
+    J.team_name,
+    J.status,
+    func.cardinality(J.user_ids).label("total_users"),
+    J.processed_users,
+    J.deactivated_users,
+    J.failed_deactivations,
+    J.reassigned_prs,
+    J.error,
+    J.created_at,
+    J.started_at,
+    J.finished_at,
+    J.processing_time_ms,
+)
+
+# Будит воркер этого процесса сразу после постановки задачи, не дожидаясь опроса
+_wakeup = threading.Event()
+
+
+def enqueue(db: Session, team_name: str, user_ids: List[str]) -> Dict:
+    row = db.execute(
+        insert(J).values(
+            job_id=uuid.uuid4().hex,
+            team_name=team_name,
+            user_ids=list(dict.fromkeys(user_ids))
+        ).returning(*JOB_COLUMNS)
+    ).one()
+    db.commit()
+    _wakeup.set()
+    return row._asdict()
+
+
+def get_job(db: Session, job_id: str) -> Optional[Dict]:
+    row = db.query(*JOB_COLUMNS).filter(J.job_id == job_id).first()
+    return row._asdict() if row else None
+
+
+def _elapsed_ms():
+    return cast(func.extract("epoch", func.now() - J.started_at) * 1000, Integer)
+
+
+def claim_job(db: Session) -> Optional[str]:
+    """Забирает самую старую ожидающую (или брошенную) задачу; None, если таких нет"""
+    job_id = db.query(J.job_id).filter(
+        or_(
+            J.status == "QUEUED",
+            and_(
+                J.status == "RUNNING",
+                J.heartbeat_at < func.now() - func.make_interval(0, 0, 0, 0, 0, 0, DEACTIVATION_JOB_STALE)
+            )
+        )
+    ).order_by(J.created_at).with_for_update(skip_locked=True).limit(1).scalar()
+
+    if job_id is None:
+        db.rollback()
+        return None
+
+    db.execute(update(J).where(J.job_id == job_id).values(
+        status="RUNNING",
+        started_at=func.coalesce(J.started_at, func.now()),
+        heartbeat_at=func.now()
+    ))
+    db.commit()
+    return job_id
+
+
+def process_job(db: Session, job_id: str, chunk_size: int = DEACTIVATION_JOB_CHUNK):
+    """Обрабатывает задачу пачками до конца; ошибка переводит задачу в FAILED"""
+
+    def step() -> bool:
+        # Смещение читаем под блокировкой задачи: воркер, подхвативший её параллельно,
+        # продолжит со следующей пачки, а не повторит эту
+        job = db.query(J).filter(J.job_id == job_id).with_for_update().populate_existing().one()
+        if job.status != "RUNNING":
+            db.rollback()
+            return False
+
+        chunk = job.user_ids[job.processed_users:job.processed_users + chunk_size]
+        if not chunk:
+            job.status = "DONE"
+            job.finished_at = func.now()
+            job.processing_time_ms = _elapsed_ms()
+            db.commit()
+            logger.info(f"Задача деактивации {job_id} завершена: деактивировано {len(job.deactivated_users)}")
+            return False
+
+        result = BulkDeactivationService(db).deactivate_users_with_reassignment(job.team_name, chunk, commit=False)
+        job.processed_users += len(chunk)
+        job.deactivated_users = job.deactivated_users + result["deactivated_users"]
+        job.failed_deactivations = job.failed_deactivations + result["failed_deactivations"]
+        job.reassigned_prs = job.reassigned_prs + result["reassigned_prs"]
+        job.heartbeat_at = func.now()
+        db.commit()
+        return True
+
+    try:
+        while run_with_retry(db, step):
+            pass
+    except Exception as e:
+        db.rollback()
+        logger.exception(f"Задача деактивации {job_id} завершилась ошибкой")
+        db.execute(update(J).where(J.job_id == job_id).values(
+            status="FAILED",
+            error=str(e)[:1000],
+            finished_at=func.now(),
+            processing_time_ms=_elapsed_ms()
+        ))
+        db.commit()
+
+
+class DeactivationJobWorker(threading.Thread):
+    """Фоновый поток, выполняющий задачи массовой деактивации"""
+
+    def __init__(self, session_factory, poll_interval: float = DEACTIVATION_JOB_POLL):
+        super().__init__(name="deactivation-job-worker", daemon=True)
+        self.session_factory = session_factory
+        self.poll_interval = poll_interval
+        self._stop_event = threading.Event()
+
+    def stop(self):
+        self._stop_event.set()
+        _wakeup.set()
+
+    def run(self):
+        while not self._stop_event.is_set():
+            try:
+                if self.run_once():
+                    continue
+            except Exception as e:
+                logger.warning(f"Ошибка воркера задач деактивации: {e}")
+            _wakeup.wait(self.poll_interval)
+            _wakeup.clear()
+
+    def run_once(self) -> bool:
+        """Выполняет одну задачу; False, если очередь пуста"""
+        db = self.session_factory()
+        try:
+            job_id = claim_job(db)
+            if job_id is None:
+                return False
+            process_job(db, job_id)
+            return True
+        finally:
+            db.close()
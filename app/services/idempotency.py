@@ -0,0 +1,161 @@
+"""
+Хранилище ответов для запросов с заголовком Idempotency-Key.
+
+Успешный (2xx) ответ сохраняется в таблицу idempotency_keys на IDEMPOTENCY_TTL
+секунд, а свежие ключи дублируются в LRU в памяти процесса, так что повтор
+клиента после таймаута отдаётся без обращения к PR и, как правило, без запросов
+в базу. Ключ, повторно пришедший с другим телом запроса, отклоняется.
+Ответ записывается в транзакцию самой операции перед её коммитом: сбой между
+операцией и сохранением ответа невозможен. Второй одновременный запрос с тем же
+ключом ждёт блокировок первого (строки PR, уникальный индекс ключа) и затем
+получает сохранённый ответ первого.
+"""
+import hashlib
+import os
+import threading
+import time
+import logging
+from collections import OrderedDict
+from datetime import datetime, timedelta, timezone
+from typing import Optional, Tuple
+
+from sqlalchemy import delete, func
+from sqlalchemy.dialects.postgresql import insert
+from sqlalchemy.orm import Session
+
+from .. import models
+from ..metrics import cache_collector, query_metrics, registry
+
+logger = logging.getLogger(__name__)
+
+IDEMPOTENCY_TTL = float(os.getenv("IDEMPOTENCY_TTL", "86400"))
+IDEMPOTENCY_CACHE_SIZE = int(os.getenv("IDEMPOTENCY_CACHE_SIZE", "10000"))
+IDEMPOTENCY_PURGE_INTERVAL = float(os.getenv("IDEMPOTENCY_PURGE_INTERVAL", "300"))
+
+K = models.IdempotencyKey
+
+
+class IdempotencyKeyMismatch(Exception):
+    """Ключ уже использован для запроса с другим телом"""
+
+
+class StoredResponse:
+    __slots__ = ("request_hash", "status_code", "body", "expires_at")
+
+    def __init__(self, request_hash: str, status_code: int, body: str, expires_at: float):
+        self.request_hash = request_hash
+        self.status_code = status_code
+        self.body = body
+        self.expires_at = expires_at  # time.time()
+
+
+def request_hash(payload: str) -> str:
+    return hashlib.sha256(payload.encode()).hexdigest()
+
+
+class IdempotencyStore:
+    def __init__(self, ttl: float = IDEMPOTENCY_TTL, max_entries: int = IDEMPOTENCY_CACHE_SIZE,
+                 purge_interval: float = IDEMPOTENCY_PURGE_INTERVAL):
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.purge_interval = purge_interval
+        self._lock = threading.Lock()
+        self._entries: "OrderedDict[Tuple[str, str], StoredResponse]" = OrderedDict()
+        self._purged_at = time.monotonic()
+        self.hits = 0
+        self.misses = 0
+
+    def lookup(self, db: Session, scope: str, key: str, payload_hash: str) -> Optional[StoredResponse]:
+        """
+        Сохранённый ответ для ключа или None.
+        IdempotencyKeyMismatch, если ключ уже использован с другим телом запроса.
+        """
+        entry = self._get_cached(scope, key)
+        if entry is None:
+            query_metrics.allow(1)
+            row = db.query(K.request_hash, K.status_code, K.response_body, K.expires_at).filter(
+                K.scope == scope,
+                K.key == key,
+                K.expires_at > func.now()
+            ).first()
+            if row is not None:
+                entry = StoredResponse(row.request_hash, row.status_code, row.response_body, row.expires_at.timestamp())
+                self._put_cached(scope, key, entry)
+
+        if entry is None:
+            self.misses += 1
+            return None
+
+        if entry.request_hash != payload_hash:
+            raise IdempotencyKeyMismatch(key)
+
+        self.hits += 1
+        return entry
+
+    def save(self, db: Session, scope: str, key: str, payload_hash: str, status_code: int, body: str) -> bool:
+        """
+        Записывает ответ в текущую транзакцию операции и коммитит её.
+        Если действующий ключ уже сохранён параллельным запросом, откатывает
+        транзакцию и возвращает False - вызывающему стоит отдать сохранённый ответ.
+        """
+        expires_at = datetime.now(timezone.utc) + timedelta(seconds=self.ttl)
+        query_metrics.allow(1)
+        stmt = insert(K).values(
+            scope=scope,
+            key=key,
+            request_hash=payload_hash,
+            status_code=status_code,
+            response_body=body,
+            expires_at=expires_at
+        )
+        # Просроченный, но ещё не удалённый ключ занимаем заново
+        result = db.execute(stmt.on_conflict_do_update(
+            index_elements=[K.scope, K.key],
+            set_={name: stmt.excluded[name] for name in ("request_hash", "status_code", "response_body", "expires_at")},
+            where=K.expires_at <= func.now()
+        ))
+        if not result.rowcount:
+            db.rollback()
+            return False
+
+        if time.monotonic() - self._purged_at > self.purge_interval:
+            self._purged_at = time.monotonic()
+            self.purge_expired(db)
+
+        db.commit()
+        self._put_cached(scope, key, StoredResponse(payload_hash, status_code, body, expires_at.timestamp()))
+        return True
+
+    def purge_expired(self, db: Session) -> int:
+        """Удаляет просроченные ключи; коммит остаётся за вызывающим"""
+        query_metrics.allow(1)
+        result = db.execute(delete(K).where(K.expires_at <= func.now()))
+        if result.rowcount:
+            logger.info(f"Удалено просроченных ключей идемпотентности: {result.rowcount}")
+        return result.rowcount
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def _get_cached(self, scope: str, key: str) -> Optional[StoredResponse]:
+        with self._lock:
+            entry = self._entries.get((scope, key))
+            if entry is None:
+                return None
+            if entry.expires_at <= time.time():
+                del self._entries[(scope, key)]
+                return None
+            self._entries.move_to_end((scope, key))
+            return entry
+
+    def _put_cached(self, scope: str, key: str, entry: StoredResponse):
+        with self._lock:
+            self._entries[(scope, key)] = entry
+            self._entries.move_to_end((scope, key))
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+
+idempotency_store = IdempotencyStore()
+registry.register_collector(cache_collector("idempotency", idempotency_store))
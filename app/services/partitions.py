@@ -0,0 +1,299 @@
+"""
+Секции таблицы pull_requests.
+
+pull_requests секционирована LIST по status: pull_requests_open - рабочий набор
+открытых PR (горячие запросы со status = 'OPEN' читают только её), pull_requests_merged -
+история, разбитая RANGE по created_at на месячные секции (pull_requests_merged_yYYYYmMM)
+и секцию по умолчанию для строк вне созданных месяцев.
+
+ensure_partitions заранее создаёт месячные секции на PR_PARTITION_MONTHS_AHEAD месяцев
+вперёд: в фоне сразу после старта сервиса и затем раз в PR_PARTITION_CHECK_INTERVAL
+секунд (PartitionMaintainer). Если строки месяца уже попали в секцию по умолчанию, они
+переносятся в новую секцию в той же транзакции.
+
+archive_partitions отсоединяет месячные секции старше заданного числа месяцев:
+таблица уходит в схему PR_ARCHIVE_SCHEMA (или удаляется), назначения ревьюверов
+этих PR переносятся рядом, сводка stats_rollup уменьшается. Id архивированных PR
+остаются в реестре pull_request_ids. DETACH держит эксклюзивную блокировку
+pull_requests_merged до коммита, поэтому секция архивируется тремя транзакциями:
+перенос назначений (секция ещё присоединена), DETACH отдельно с lock_timeout,
+затем перенос таблицы и сводка. Таблицу, отсоединённую прерванным запуском,
+следующий запуск дорабатывает.
+"""
+import logging
+import os
+import re
+import threading
+from datetime import date, datetime, timezone
+from typing import Dict, List, Optional, Tuple
+
+from sqlalchemy import text
+from sqlalchemy.orm import Session
+
+from . import stats_rollup
+
+logger = logging.getLogger(__name__)
+
+PR_PARTITION_MONTHS_AHEAD = int(os.getenv("PR_PARTITION_MONTHS_AHEAD", "3"))
+PR_PARTITION_CHECK_INTERVAL = float(os.getenv("PR_PARTITION_CHECK_INTERVAL", "86400"))
+PR_ARCHIVE_SCHEMA = os.getenv("PR_ARCHIVE_SCHEMA", "archive")
+PR_ARCHIVE_LOCK_TIMEOUT = os.getenv("PR_ARCHIVE_LOCK_TIMEOUT", "5s")
+
+PARENT = "pull_requests"
+OPEN_PARTITION = "pull_requests_open"
+MERGED_PARTITION = "pull_requests_merged"
+MERGED_DEFAULT = "pull_requests_merged_default"
+
+_MONTH_NAME = re.compile(r"^pull_requests_merged_y(\d{4})m(\d{2})$")
+# Сериализует обслуживание секций между процессами
+_ADVISORY_LOCK_KEY = "pull_requests_partitions"
+
+
+def month_start(value: date, offset: int = 0) -> date:
+    """Первое число месяца value, сдвинутого на offset месяцев"""
+    months = value.year * 12 + value.month - 1 + offset
+    return date(months // 12, months % 12 + 1, 1)
+
+
+def partition_name(month: date) -> str:
+    return f"{MERGED_PARTITION}_y{month.year:04d}m{month.month:02d}"
+
+
+def _bounds(month: date) -> str:
+    return f"FROM ('{month.isoformat()} 00:00:00+00') TO ('{month_start(month, 1).isoformat()} 00:00:00+00')"
+
+
+def _today() -> date:
+    return datetime.now(timezone.utc).date()
+
+
+def month_partitions(db: Session) -> List[Tuple[date, str]]:
+    """Присоединённые месячные секции pull_requests_merged в порядке месяцев"""
+    rows = db.execute(text("""
+        SELECT c.relname FROM pg_inherits i
+        JOIN pg_class c ON c.oid = i.inhrelid
+        WHERE i.inhparent = CAST(:parent AS regclass)
+    """), {"parent": MERGED_PARTITION}).scalars()
+
+    partitions = []
+    for name in rows:
+        match = _MONTH_NAME.match(name)
+        if match:
+            partitions.append((date(int(match.group(1)), int(match.group(2)), 1), name))
+    return sorted(partitions)
+
+
+def ensure_partitions(db: Session, months_ahead: int = PR_PARTITION_MONTHS_AHEAD,
+                      since: Optional[date] = None, wait: bool = True) -> List[str]:
+    """
+    Создаёт недостающие секции (структурные - если схема создана через create_all -
+    и месячные с месяца since, по умолчанию текущего, на months_ahead месяцев вперёд).
+    С wait=False ничего не делает, если секции прямо сейчас создаёт другой процесс.
+    Коммитит; возвращает имена созданных месячных секций.
+    """
+    if wait:
+        db.execute(text("SELECT pg_advisory_xact_lock(hashtext(:key))"), {"key": _ADVISORY_LOCK_KEY})
+    elif not db.execute(text("SELECT pg_try_advisory_xact_lock(hashtext(:key))"), {"key": _ADVISORY_LOCK_KEY}).scalar():
+        db.rollback()
+        return []
+    db.execute(text(f"CREATE TABLE IF NOT EXISTS {OPEN_PARTITION} PARTITION OF {PARENT} FOR VALUES IN ('OPEN')"))
+    db.execute(text(
+        f"CREATE TABLE IF NOT EXISTS {MERGED_PARTITION} PARTITION OF {PARENT} "
+        f"FOR VALUES IN ('MERGED') PARTITION BY RANGE (created_at)"
+    ))
+    db.execute(text(f"CREATE TABLE IF NOT EXISTS {MERGED_DEFAULT} PARTITION OF {MERGED_PARTITION} DEFAULT"))
+
+    existing = {name for _, name in month_partitions(db)}
+    first = month_start(since or _today())
+    last = month_start(_today(), months_ahead)
+
+    created = []
+    month = first
+    while month <= last:
+        name = partition_name(month)
+        if name not in existing:
+            _create_month_partition(db, month, name)
+            created.append(name)
+        month = month_start(month, 1)
+
+    db.commit()
+    if created:
+        logger.info(f"Созданы секции pull_requests: {', '.join(created)}")
+    return created
+
+
+def _create_month_partition(db: Session, month: date, name: str):
+    params = {"start": month, "end": month_start(month, 1)}
+    in_default = db.execute(text(
+        f"SELECT EXISTS (SELECT 1 FROM {MERGED_DEFAULT} WHERE created_at >= :start AND created_at < :end)"
+    ), params).scalar()
+
+    if not in_default:
+        db.execute(text(f"CREATE TABLE {name} PARTITION OF {MERGED_PARTITION} FOR VALUES {_bounds(month)}"))
+        return
+
+    # Строки месяца уже лежат в секции по умолчанию: переносим их в новую таблицу и
+    # присоединяем её (пока они в default, CREATE ... PARTITION OF не пройдёт проверку)
+    db.execute(text(f"CREATE TABLE {name} (LIKE {MERGED_PARTITION} INCLUDING DEFAULTS INCLUDING CONSTRAINTS)"))
+    moved = db.execute(text(f"""
+        WITH moved AS (
+            DELETE FROM {MERGED_DEFAULT} WHERE created_at >= :start AND created_at < :end RETURNING *
+        )
+        INSERT INTO {name} SELECT * FROM moved
+    """), params).rowcount
+    db.execute(text(f"ALTER TABLE {MERGED_PARTITION} ATTACH PARTITION {name} FOR VALUES {_bounds(month)}"))
+    logger.info(f"В секцию {name} перенесено строк из {MERGED_DEFAULT}: {moved}")
+
+
+def partition_stats(db: Session) -> List[Dict]:
+    """Секции pull_requests с оценкой числа строк и размером (для CLI)"""
+    rows = db.execute(text("""
+        SELECT c.relname AS partition, pg_get_expr(c.relpartbound, c.oid) AS bounds,
+               GREATEST(c.reltuples, 0)::bigint AS estimated_rows, pg_total_relation_size(c.oid) AS total_bytes
+        FROM pg_partition_tree(CAST(:parent AS regclass)) t
+        JOIN pg_class c ON c.oid = t.relid
+        WHERE t.level > 0
+        ORDER BY t.level, c.relname
+    """), {"parent": PARENT}).mappings().all()
+    return [dict(row) for row in rows]
+
+
+def archive_partitions(db: Session, older_than_months: int, drop: bool = False,
+                       dry_run: bool = False, schema: str = PR_ARCHIVE_SCHEMA) -> List[Dict]:
+    """
+    Архивирует месячные секции мердженых PR, целиком лежащие раньше, чем
+    older_than_months месяцев до текущего, и дорабатывает секции, отсоединённые
+    прерванным запуском. Возвращает по элементу на секцию:
+    partition, prs, reviewers, archived_to (None при drop и dry_run).
+    """
+    if older_than_months < 1:
+        raise ValueError("older_than_months должен быть не меньше 1")
+
+    cutoff = month_start(_today(), -older_than_months)
+    candidates = [name for month, name in month_partitions(db) if month_start(month, 1) <= cutoff]
+    detached = _detached_partitions(db)
+    db.rollback()
+
+    results = []
+    for name in detached + candidates:
+        if dry_run:
+            prs, reviewers = db.execute(text(
+                f"SELECT count(*), coalesce(sum(cardinality(assigned_reviewers)), 0) FROM {name}"
+            )).one()
+            db.rollback()
+            results.append({"partition": name, "prs": prs, "reviewers": reviewers, "archived_to": None})
+            continue
+        if name not in detached:
+            _move_reviewers(db, name, drop, schema)
+            _detach(db, name)
+        results.append(_finish_archive(db, name, drop, schema))
+    return results
+
+
+def _detached_partitions(db: Session) -> List[str]:
+    """Месячные таблицы, отсоединённые, но ещё не перенесённые в архив (прерванный запуск)"""
+    rows = db.execute(text("""
+        SELECT c.relname FROM pg_class c
+        WHERE c.relnamespace = CAST(current_schema() AS regnamespace)
+          AND c.relkind = 'r' AND NOT c.relispartition
+    """)).scalars()
+    return sorted(name for name in rows if _MONTH_NAME.match(name))
+
+
+def _reviewers_table(name: str, schema: str) -> str:
+    return f"{schema}.pr_reviewers_{name[len(MERGED_PARTITION) + 1:]}"
+
+
+def _move_reviewers(db: Session, name: str, drop: bool, schema: str):
+    """
+    Переносит назначения ревьюверов PR секции (или удаляет при drop), пока секция ещё
+    присоединена: эксклюзивных блокировок pull_requests здесь нет, а строки мердженых
+    PR не меняются. PR, смерженные в секцию после этого шага, доберёт _finish_archive.
+    """
+    try:
+        _move_reviewer_rows(db, name, drop, schema)
+        db.commit()
+    except Exception:
+        db.rollback()
+        raise
+
+
+def _move_reviewer_rows(db: Session, name: str, drop: bool, schema: str):
+    if not drop:
+        db.execute(text(f"CREATE SCHEMA IF NOT EXISTS {schema}"))
+        db.execute(text(f"""
+            CREATE TABLE IF NOT EXISTS {_reviewers_table(name, schema)} AS
+            SELECT r.* FROM pr_reviewers r WHERE false
+        """))
+        db.execute(text(f"""
+            INSERT INTO {_reviewers_table(name, schema)}
+            SELECT r.* FROM pr_reviewers r JOIN {name} p ON p.pull_request_id = r.pull_request_id
+        """))
+    db.execute(text(
+        f"DELETE FROM pr_reviewers r USING {name} p WHERE p.pull_request_id = r.pull_request_id"
+    ))
+
+
+def _detach(db: Session, name: str):
+    # DETACH держит эксклюзивную блокировку pull_requests_merged до коммита -
+    # в этой транзакции больше ничего нет. CONCURRENTLY недоступен при секции по умолчанию
+    try:
+        db.execute(text(f"SET LOCAL lock_timeout = '{PR_ARCHIVE_LOCK_TIMEOUT}'"))
+        db.execute(text(f"ALTER TABLE {MERGED_PARTITION} DETACH PARTITION {name}"))
+        db.commit()
+    except Exception:
+        db.rollback()
+        raise
+
+
+def _finish_archive(db: Session, name: str, drop: bool, schema: str) -> Dict:
+    """Отсоединённая таблица: оставшиеся назначения, перенос в схему (или удаление) и сводка"""
+    try:
+        prs, reviewers = db.execute(text(
+            f"SELECT count(*), coalesce(sum(cardinality(assigned_reviewers)), 0) FROM {name}"
+        )).one()
+        _move_reviewer_rows(db, name, drop, schema)
+
+        # Пустую секцию хранить незачем
+        archived_to = None
+        if drop or not prs:
+            db.execute(text(f"DROP TABLE {name}"))
+            db.execute(text(f"DROP TABLE IF EXISTS {_reviewers_table(name, schema)}"))
+        else:
+            db.execute(text(f"ALTER TABLE {name} SET SCHEMA {schema}"))
+            archived_to = f"{schema}.{name}"
+
+        stats_rollup.record_prs_archived(db, prs, reviewers)
+        db.commit()
+    except Exception:
+        db.rollback()
+        raise
+
+    logger.info(f"Секция {name} архивирована: PR {prs}, назначений {reviewers}, {archived_to or 'удалена'}")
+    return {"partition": name, "prs": prs, "reviewers": reviewers, "archived_to": archived_to}
+
+
+class PartitionMaintainer(threading.Thread):
+    """Фоновый поток, периодически создающий месячные секции заранее"""
+
+    def __init__(self, session_factory, interval: float = PR_PARTITION_CHECK_INTERVAL):
+        super().__init__(name="partition-maintainer", daemon=True)
+        self.session_factory = session_factory
+        self.interval = interval
+        self._stop_event = threading.Event()
+
+    def stop(self):
+        self._stop_event.set()
+
+    def run(self):
+        # Первый проход - сразу, но в фоне: старт воркера не ждёт базу и другие воркеры
+        while True:
+            db = self.session_factory()
+            try:
+                ensure_partitions(db, wait=False)
+            except Exception as e:
+                logger.warning(f"Не удалось создать секции pull_requests: {e}")
+            finally:
+                db.close()
+            if self._stop_event.wait(self.interval):
+                return
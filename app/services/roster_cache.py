@@ -0,0 +1,219 @@
+"""
+Кэш составов команд в памяти процесса.
+
+Хранит для команды список активных участников, а для пользователя - его команду,
+чтобы назначение ревьюверов при создании PR не ходило в базу.
+Записи вытесняются по TTL и LRU, а при изменении команд/пользователей
+сбрасываются после коммита транзакции (см. mark_dirty).
+Опционально инвалидации рассылаются между воркерами через Postgres LISTEN/NOTIFY.
+"""
+import os
+import select
+import threading
+import time
+import logging
+from collections import OrderedDict
+from typing import Dict, Iterable, List, Optional, Set, Tuple
+
+from sqlalchemy import event, func, select as sa_select
+from sqlalchemy.orm import Session
+
+from .. import models
+from ..metrics import cache_collector, query_metrics, registry
+
+logger = logging.getLogger(__name__)
+
+ROSTER_CACHE_TTL = float(os.getenv("ROSTER_CACHE_TTL", "60"))
+ROSTER_CACHE_MAX_TEAMS = int(os.getenv("ROSTER_CACHE_MAX_TEAMS", "1024"))
+ROSTER_CACHE_NOTIFY = os.getenv("ROSTER_CACHE_NOTIFY", "false").lower() == "true"
+NOTIFY_CHANNEL = "roster_invalidate"
+
+# Ключ в Session.info, где копятся команды для инвалидации до коммита
+_DIRTY_KEY = "roster_dirty_teams"
+
+
+class TeamRoster:
+    __slots__ = ("team_name", "active_user_ids", "member_ids", "loaded_at")
+
+    def __init__(self, team_name: str, active_user_ids: Tuple[str, ...], member_ids: Tuple[str, ...]):
+        self.team_name = team_name
+        self.active_user_ids = active_user_ids
+        self.member_ids = member_ids
+        self.loaded_at = time.monotonic()
+
+
+class RosterCache:
+    def __init__(self, ttl: float = ROSTER_CACHE_TTL, max_teams: int = ROSTER_CACHE_MAX_TEAMS):
+        self.ttl = ttl
+        self.max_teams = max_teams
+        self._lock = threading.Lock()
+        self._teams: "OrderedDict[str, TeamRoster]" = OrderedDict()
+        self._user_team: Dict[str, str] = {}
+        # Версия растёт при каждой инвалидации; загрузка, начатая до неё, не попадает в кэш
+        self._version = 0
+        self.hits = 0
+        self.misses = 0
+
+    @property
+    def version(self) -> int:
+        return self._version
+
+    def get_user_team(self, db: Session, user_id: str) -> Optional[str]:
+        """Команда пользователя (None, если пользователя нет)"""
+        with self._lock:
+            team_name = self._user_team.get(user_id)
+            roster = self._teams.get(team_name) if team_name else None
+            if roster and not self._expired(roster):
+                self.hits += 1
+                self._teams.move_to_end(team_name)
+                return team_name
+            self.misses += 1
+
+        query_metrics.allow(1)
+        team_name = db.query(models.User.team_name).filter(models.User.user_id == user_id).scalar()
+        if team_name:
+            self._load_team(db, team_name)
+        return team_name
+
+    def get_team(self, db: Session, team_name: str) -> TeamRoster:
+        with self._lock:
+            roster = self._teams.get(team_name)
+            if roster and not self._expired(roster):
+                self.hits += 1
+                self._teams.move_to_end(team_name)
+                return roster
+            self.misses += 1
+
+        return self._load_team(db, team_name)
+
+    def get_active_members(self, db: Session, team_name: str, exclude_user_id: str = None) -> List[str]:
+        roster = self.get_team(db, team_name)
+        return [user_id for user_id in roster.active_user_ids if user_id != exclude_user_id]
+
+    def invalidate_teams(self, team_names: Iterable[str]):
+        with self._lock:
+            self._version += 1
+            for team_name in team_names:
+                roster = self._teams.pop(team_name, None)
+                if roster:
+                    self._forget_members(roster)
+
+    def clear(self):
+        with self._lock:
+            self._version += 1
+            self._teams.clear()
+            self._user_team.clear()
+
+    def _expired(self, roster: TeamRoster) -> bool:
+        return time.monotonic() - roster.loaded_at > self.ttl
+
+    def _load_team(self, db: Session, team_name: str) -> TeamRoster:
+        version = self._version
+        query_metrics.allow(1)
+        rows = db.query(models.User.user_id, models.User.is_active).filter(
+            models.User.team_name == team_name
+        ).order_by(models.User.user_id).all()
+
+        roster = TeamRoster(
+            team_name,
+            active_user_ids=tuple(user_id for user_id, is_active in rows if is_active),
+            member_ids=tuple(user_id for user_id, _ in rows),
+        )
+
+        with self._lock:
+            if version != self._version:
+                # Пока читали, состав поменялся - отдаём результат, но не кэшируем
+                return roster
+
+            old = self._teams.pop(team_name, None)
+            if old:
+                self._forget_members(old)
+            self._teams[team_name] = roster
+            for user_id in roster.member_ids:
+                self._user_team[user_id] = team_name
+
+            while len(self._teams) > self.max_teams:
+                _, evicted = self._teams.popitem(last=False)
+                self._forget_members(evicted)
+
+        return roster
+
+    def _forget_members(self, roster: TeamRoster):
+        for user_id in roster.member_ids:
+            if self._user_team.get(user_id) == roster.team_name:
+                del self._user_team[user_id]
+
+
+roster_cache = RosterCache()
+registry.register_collector(cache_collector("roster", roster_cache))
+
+
+def mark_dirty(db: Session, team_names: Iterable[Optional[str]]):
+    """
+    Помечает команды для инвалидации. Кэш сбрасывается после коммита сессии,
+    чтобы параллельный запрос не закэшировал ещё не закоммиченный состав.
+    """
+    dirty: Set[str] = db.info.setdefault(_DIRTY_KEY, set())
+    dirty.update(name for name in team_names if name)
+
+
+@event.listens_for(Session, "before_commit")
+def _notify_before_commit(session: Session):
+    dirty = session.info.get(_DIRTY_KEY)
+    if ROSTER_CACHE_NOTIFY and dirty:
+        # NOTIFY транзакционный: другие воркеры получат его только после коммита
+        session.execute(sa_select(func.pg_notify(NOTIFY_CHANNEL, ",".join(sorted(dirty)))))
+
+
+@event.listens_for(Session, "after_commit")
+def _invalidate_after_commit(session: Session):
+    dirty = session.info.pop(_DIRTY_KEY, None)
+    if dirty:
+        roster_cache.invalidate_teams(dirty)
+
+
+@event.listens_for(Session, "after_rollback")
+def _discard_on_rollback(session: Session):
+    session.info.pop(_DIRTY_KEY, None)
+
+
+class RosterInvalidationListener(threading.Thread):
+    """Фоновый поток LISTEN, сбрасывающий кэш по уведомлениям других воркеров"""
+
+    def __init__(self, engine, poll_interval: float = 5.0):
+        super().__init__(name="roster-cache-listener", daemon=True)
+        self.engine = engine
+        self.poll_interval = poll_interval
+        self._stop_event = threading.Event()
+
+    def stop(self):
+        self._stop_event.set()
+
+    def run(self):
+        while not self._stop_event.is_set():
+            try:
+                self._listen()
+            except Exception as e:
+                logger.warning(f"Ошибка LISTEN {NOTIFY_CHANNEL}, переподключение: {e}")
+                # Пока не слушаем, уведомления могли потеряться
+                roster_cache.clear()
+                self._stop_event.wait(self.poll_interval)
+
+    def _listen(self):
+        raw = self.engine.raw_connection()
+        raw.detach()
+        conn = raw.driver_connection
+        try:
+            conn.autocommit = True
+            with conn.cursor() as cursor:
+                cursor.execute(f"LISTEN {NOTIFY_CHANNEL}")
+
+            while not self._stop_event.is_set():
+                if select.select([conn], [], [], self.poll_interval) == ([], [], []):
+                    continue
+                conn.poll()
+                while conn.notifies:
+                    notify = conn.notifies.pop(0)
+                    roster_cache.invalidate_teams(notify.payload.split(","))
+        finally:
+            conn.close()
@@ -0,0 +1,117 @@
+"""
+Стратегии выбора ревьюверов из списка кандидатов.
+
+Стратегия задаётся переменной окружения REVIEWER_SELECTION_STRATEGY:
+random (по умолчанию), least_loaded, weighted_round_robin.
+Нагрузка берётся из счётчика users.open_review_count, поэтому выбор стоит
+один запрос по первичному ключу на размер команды, без агрегатов по PR.
+"""
+import os
+import random
+import threading
+from abc import ABC, abstractmethod
+from collections import OrderedDict
+from typing import Dict, FrozenSet, List
+
+from sqlalchemy.orm import Session
+
+from .. import crud
+
+# Сколько наборов кандидатов weighted_round_robin помнит (LRU)
+WRR_MAX_POOLS = int(os.getenv("WRR_MAX_POOLS", "4096"))
+
+
+class SelectionStrategy(ABC):
+    name = ""
+    # Нужны ли стратегии счётчики нагрузки (их можно передать заранее через loads)
+    uses_load = False
+
+    @abstractmethod
+    def select(self, db: Session, candidates: List[str], k: int, loads: Dict[str, int] = None) -> List[str]:
+        """До k ревьюверов из candidates"""
+
+
+class RandomStrategy(SelectionStrategy):
+    """Случайный выбор без учёта нагрузки"""
+    name = "random"
+
+    def select(self, db: Session, candidates: List[str], k: int, loads: Dict[str, int] = None) -> List[str]:
+        k = min(k, len(candidates))
+        if k <= 0:
+            return []
+        return random.sample(candidates, k)
+
+
+class LeastLoadedStrategy(SelectionStrategy):
+    """Кандидаты с наименьшим числом открытых ревью, при равенстве - случайно"""
+    name = "least_loaded"
+    uses_load = True
+
+    def select(self, db: Session, candidates: List[str], k: int, loads: Dict[str, int] = None) -> List[str]:
+        k = min(k, len(candidates))
+        if k <= 0:
+            return []
+
+        if loads is None:
+            loads = crud.get_open_review_counts(db, candidates)
+        ranked = sorted(candidates, key=lambda user_id: (loads.get(user_id, 0), random.random()))
+        return ranked[:k]
+
+
+class WeightedRoundRobinStrategy(SelectionStrategy):
+    """
+    Плавный взвешенный round-robin (как в nginx) с весом 1 / (1 + открытые ревью):
+    менее загруженные выбираются чаще, но нагрузка распределяется по всей команде.
+    Текущие веса хранятся отдельно для каждого набора кандидатов и только для его
+    участников; хранится не больше WRR_MAX_POOLS последних наборов.
+    """
+    name = "weighted_round_robin"
+    uses_load = True
+
+    def __init__(self, max_pools: int = WRR_MAX_POOLS):
+        self._lock = threading.Lock()
+        self._max_pools = max_pools
+        self._pools: "OrderedDict[FrozenSet[str], Dict[str, float]]" = OrderedDict()
+
+    def select(self, db: Session, candidates: List[str], k: int, loads: Dict[str, int] = None) -> List[str]:
+        k = min(k, len(candidates))
+        if k <= 0:
+            return []
+
+        if loads is None:
+            loads = crud.get_open_review_counts(db, candidates)
+        weights = {user_id: 1.0 / (1 + loads.get(user_id, 0)) for user_id in candidates}
+
+        selected = []
+        with self._lock:
+            key = frozenset(candidates)
+            previous = self._pools.pop(key, {})
+            # Ушедшие из набора пользователи не накапливаются
+            current = {user_id: previous.get(user_id, 0.0) for user_id in candidates}
+            self._pools[key] = current
+            while len(self._pools) > self._max_pools:
+                self._pools.popitem(last=False)
+
+            for _ in range(k):
+                pool = [user_id for user_id in candidates if user_id not in selected]
+                total = sum(weights[user_id] for user_id in pool)
+                for user_id in pool:
+                    current[user_id] += weights[user_id]
+                chosen = max(pool, key=lambda user_id: current[user_id])
+                current[chosen] -= total
+                selected.append(chosen)
+
+        return selected
+
+
+STRATEGIES = {
+    strategy.name: strategy
+    for strategy in (RandomStrategy(), LeastLoadedStrategy(), WeightedRoundRobinStrategy())
+}
+
+
+def get_strategy(name: str = None) -> SelectionStrategy:
+    name = name or os.getenv("REVIEWER_SELECTION_STRATEGY", RandomStrategy.name)
+    if name not in STRATEGIES:
+        raise ValueError(f"Неизвестная стратегия выбора ревьюверов: {name}")
+    return STRATEGIES[name]
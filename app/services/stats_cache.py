@@ -0,0 +1,116 @@
+"""
+Кэш готовых ответов /stats в памяти процесса.
+
+Ключ актуальности - stats_rollup.data_version, которую увеличивает каждая запись,
+меняющая счётчики сводки. Записи, которые счётчики не меняют (например, переназначение
+ревьювера), версию не трогают, поэтому ответ старше STATS_CACHE_MAX_AGE секунд
+тоже считается устаревшим. Версия перечитывается из базы не чаще раза в
+STATS_VERSION_CHECK_INTERVAL секунд, так что частый опрос дашбордов стоит
+поиска в словаре. Устаревший ответ моложе STATS_CACHE_SWR секунд отдаётся сразу,
+а пересчёт идёт в фоне (stale-while-revalidate).
+"""
+import os
+import threading
+import time
+import logging
+import zlib
+from typing import Callable, Dict, Optional
+
+from sqlalchemy.orm import Session
+
+from ..database import SessionLocal
+from ..metrics import cache_collector, registry
+from . import stats_rollup
+
+logger = logging.getLogger(__name__)
+
+STATS_VERSION_CHECK_INTERVAL = float(os.getenv("STATS_VERSION_CHECK_INTERVAL", "1.0"))
+STATS_CACHE_SWR = float(os.getenv("STATS_CACHE_SWR", "30"))
+STATS_CACHE_MAX_AGE = float(os.getenv("STATS_CACHE_MAX_AGE", "5"))
+
+
+class CachedStats:
+    __slots__ = ("version", "body", "etag", "computed_at")
+
+    def __init__(self, key: str, version: int, body: bytes):
+        self.version = version
+        self.body = body
+        # Пересчёт по возрасту даёт новое тело при той же версии - ETag зависит и от тела
+        self.etag = f'W/"{key}-{version}-{zlib.crc32(body):08x}"'
+        self.computed_at = time.monotonic()
+
+
+class StatsCache:
+    def __init__(self, version_check_interval: float = STATS_VERSION_CHECK_INTERVAL,
+                 swr_seconds: float = STATS_CACHE_SWR, max_age: float = STATS_CACHE_MAX_AGE):
+        self.version_check_interval = version_check_interval
+        self.swr_seconds = swr_seconds
+        self.max_age = max_age
+        self._lock = threading.Lock()
+        self._entries: Dict[str, CachedStats] = {}
+        self._refreshing = set()
+        self._version: Optional[int] = None
+        self._version_checked_at = 0.0
+        self.hits = 0
+        self.stale_hits = 0
+        self.misses = 0
+
+    def current_version(self, db: Session) -> int:
+        now = time.monotonic()
+        if self._version is None or now - self._version_checked_at > self.version_check_interval:
+            self._version = stats_rollup.get_data_version(db)
+            self._version_checked_at = now
+        return self._version
+
+    def get(self, db: Session, key: str, compute: Callable[[Session], bytes]) -> CachedStats:
+        """
+        Актуальный (или допустимо устаревший) ответ для key.
+        compute(db) строит тело ответа заново.
+        """
+        version = self.current_version(db)
+        entry = self._entries.get(key)
+        age = time.monotonic() - entry.computed_at if entry else None
+
+        if entry and entry.version == version and age < self.max_age:
+            self.hits += 1
+            return entry
+
+        if entry and age < self.swr_seconds:
+            self.stale_hits += 1
+            self._revalidate_in_background(key, compute)
+            return entry
+
+        self.misses += 1
+        return self._compute(db, key, version, compute)
+
+    def _compute(self, db: Session, key: str, version: int, compute: Callable[[Session], bytes]) -> CachedStats:
+        entry = CachedStats(key, version, compute(db))
+        with self._lock:
+            current = self._entries.get(key)
+            if current is None or current.version <= version:
+                self._entries[key] = entry
+        return entry
+
+    def _revalidate_in_background(self, key: str, compute: Callable[[Session], bytes]):
+        with self._lock:
+            if key in self._refreshing:
+                return
+            self._refreshing.add(key)
+
+        def run():
+            db = SessionLocal()
+            try:
+                version = stats_rollup.get_data_version(db)
+                self._compute(db, key, version, compute)
+            except Exception as e:
+                logger.warning(f"Не удалось обновить кэш статистики {key}: {e}")
+            finally:
+                db.close()
+                with self._lock:
+                    self._refreshing.discard(key)
+
+        threading.Thread(target=run, name=f"stats-cache-{key}", daemon=True).start()
+
+
+stats_cache = StatsCache()
+registry.register_collector(cache_collector("stats", stats_cache))
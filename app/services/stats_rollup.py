@@ -0,0 +1,227 @@
+"""
+Инкрементальная сводка статистики (таблица stats_rollup из одной строки).
+
+Записи PR/пользователей/команд применяют к строке дельты тем же UPDATE-ом
+в своей транзакции, а /stats читает одну строку вместо агрегатов по pull_requests.
+Каждое такое обновление увеличивает data_version - общую для всех воркеров
+версию данных, по которой кэшируются ответы /stats.
+Дельты стоит применять последним запросом перед коммитом: строка общая
+для всех транзакций записи, и блокировка на ней держится до коммита.
+Поэтому строку трогают только записи, меняющие счётчики: остальные
+(переназначение, запись без изменений) её не блокируют, а кэш /stats
+догоняет их по возрасту записи (STATS_CACHE_MAX_AGE).
+
+PR с максимумом ревьюверов дельтами не пересчитать, если он потерял ревьювера
+или ушёл в архив: тогда ставится флаг max_reviewers_stale, а полный проход по
+pull_requests выполняет фоновый поток (в каждый момент - один процесс, под
+advisory-блокировкой). Чтение /stats до его завершения отдаёт прежнее значение.
+"""
+import logging
+import threading
+from typing import List, Tuple
+
+from sqlalchemy import String, any_, case, func, literal, or_, select, text, update
+from sqlalchemy.dialects.postgresql import ARRAY, insert
+from sqlalchemy.orm import Session
+
+from .. import models
+from ..database import SessionLocal
+
+logger = logging.getLogger(__name__)
+
+ROLLUP_ID = 1
+_ADVISORY_LOCK_KEY = "stats_rollup_max_reviewers"
+
+R = models.StatsRollup
+
+
+def apply_deltas(db: Session, **deltas: int):
+    """
+    Изменяет счётчики сводки, например apply_deltas(db, active_users=-2).
+    Если все дельты нулевые, строку не трогает.
+    """
+    if any(deltas.values()):
+        db.execute(deltas_update(**deltas))
+
+
+def deltas_update(**deltas: int):
+    """UPDATE для apply_deltas (увеличивает data_version и при пустых дельтах)"""
+    values = {name: getattr(R, name) + delta for name, delta in deltas.items() if delta}
+    return update(R).where(R.id == ROLLUP_ID).values(data_version=R.data_version + 1, **values)
+
+
+def record_prs_created(db: Session, prs: List[Tuple[str, str, int]]):
+    """Учитывает созданные PR, prs - список (pull_request_id, pull_request_name, число ревьюверов)"""
+    if not prs:
+        return
+
+    db.execute(prs_created_update(prs))
+
+
+def prs_created_update(prs: List[Tuple[str, str, int]]):
+    """UPDATE для record_prs_created (prs не пуст)"""
+    top_id, top_name, top_count = max(prs, key=lambda pr: pr[2])
+    is_new_max = or_(R.max_reviewers_pr_id.is_(None), top_count > R.max_reviewer_count)
+
+    return update(R).where(R.id == ROLLUP_ID).values(
+        data_version=R.data_version + 1,
+        total_pr=R.total_pr + len(prs),
+        open_pr=R.open_pr + len(prs),
+        total_reviewers=R.total_reviewers + sum(count for _, _, count in prs),
+        last_pr_created_at=func.now(),
+        max_reviewers_pr_id=case((is_new_max, top_id), else_=R.max_reviewers_pr_id),
+        max_reviewers_pr_name=case((is_new_max, top_name), else_=R.max_reviewers_pr_name),
+        max_reviewer_count=case((is_new_max, top_count), else_=R.max_reviewer_count),
+    )
+
+
+def record_reviewers_removed(db: Session, pr_ids: List[str]):
+    """Учитывает ревьюверов, снятых с PR без замены (по одному на элемент pr_ids)"""
+    if not pr_ids:
+        return
+
+    db.execute(update(R).where(R.id == ROLLUP_ID).values(
+        data_version=R.data_version + 1,
+        total_reviewers=R.total_reviewers - len(pr_ids),
+        max_reviewers_stale=or_(R.max_reviewers_stale, R.max_reviewers_pr_id == any_(literal(list(set(pr_ids)), ARRAY(String)))),
+    ))
+
+
+def record_prs_archived(db: Session, pr_count: int, reviewer_count: int):
+    """Учитывает мердженые PR, перенесённые в архив (services/partitions.py)"""
+    if not pr_count:
+        return
+
+    db.execute(update(R).where(R.id == ROLLUP_ID).values(
+        data_version=R.data_version + 1,
+        total_pr=R.total_pr - pr_count,
+        merged_pr=R.merged_pr - pr_count,
+        total_reviewers=R.total_reviewers - reviewer_count,
+        # PR с максимумом ревьюверов мог уйти в архив - пересчитается при чтении
+        max_reviewers_stale=True,
+    ))
+
+
+def record_bulk_load(db: Session, last_pr_created_at, **deltas: int):
+    """
+    Учитывает данные, загруженные в обход API (scripts/generate_data.py): дельты
+    счётчиков как в apply_deltas; PR-максимум пересчитается при чтении.
+    """
+    db.execute(deltas_update(**deltas).values(
+        last_pr_created_at=func.greatest(R.last_pr_created_at, last_pr_created_at),
+        max_reviewers_stale=True,
+    ))
+
+
+def get_data_version(db: Session) -> int:
+    version = db.query(R.data_version).filter(R.id == ROLLUP_ID).scalar()
+    if version is None:
+        version = rebuild(db).data_version
+    return version
+
+
+def get_rollup(db: Session) -> models.StatsRollup:
+    """
+    Текущая сводка; при отсутствии строки пересчитывается целиком.
+    Устаревший PR-максимум пересчитывается в фоне, пока отдаётся прежний.
+    """
+    rollup = db.get(R, ROLLUP_ID)
+    if rollup is None:
+        return rebuild(db)
+
+    if rollup.max_reviewers_stale:
+        _max_reviewers_refresher.trigger()
+
+    return rollup
+
+
+def refresh_max_reviewers(db: Session) -> bool:
+    """
+    Пересчитывает устаревший PR-максимум. Если пересчёт уже идёт в другом процессе
+    или флаг снят, ничего не делает. Коммитит; возвращает True, если пересчитал.
+    """
+    locked = db.execute(
+        text("SELECT pg_try_advisory_xact_lock(hashtext(:key))"), {"key": _ADVISORY_LOCK_KEY}
+    ).scalar()
+    if not locked or not db.query(R.max_reviewers_stale).filter(R.id == ROLLUP_ID).scalar():
+        db.rollback()
+        return False
+
+    _refresh_max_reviewers(db)
+    db.commit()
+    return True
+
+
+class _MaxReviewersRefresher:
+    """Не больше одного фонового пересчёта PR-максимума на процесс"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._running = False
+
+    def trigger(self):
+        with self._lock:
+            if self._running:
+                return
+            self._running = True
+
+        threading.Thread(target=self._run, name="stats-max-reviewers", daemon=True).start()
+
+    def _run(self):
+        db = SessionLocal()
+        try:
+            refresh_max_reviewers(db)
+        except Exception as e:
+            logger.warning(f"Не удалось пересчитать PR с максимумом ревьюверов: {e}")
+        finally:
+            db.close()
+            with self._lock:
+                self._running = False
+
+
+_max_reviewers_refresher = _MaxReviewersRefresher()
+
+
+def rebuild(db: Session) -> models.StatsRollup:
+    """Полный пересчёт сводки по таблицам (однократно, например после create_all)"""
+    pr = models.PullRequest
+    values = db.execute(select(
+        select(func.count()).select_from(models.Team).scalar_subquery().label("total_teams"),
+        select(func.count()).select_from(models.User).scalar_subquery().label("total_users"),
+        select(func.count()).select_from(models.User).where(
+            models.User.is_active == True
+        ).scalar_subquery().label("active_users"),
+        select(func.count()).select_from(pr).scalar_subquery().label("total_pr"),
+        select(func.count()).select_from(pr).where(pr.status == "OPEN").scalar_subquery().label("open_pr"),
+        select(func.count()).select_from(pr).where(pr.status == "MERGED").scalar_subquery().label("merged_pr"),
+        select(func.coalesce(func.sum(func.cardinality(pr.assigned_reviewers)), 0)).scalar_subquery().label("total_reviewers"),
+        select(func.max(pr.created_at)).scalar_subquery().label("last_pr_created_at"),
+    )).mappings().one()
+
+    stmt = insert(R).values(id=ROLLUP_ID, max_reviewers_stale=True, data_version=0, **values)
+    db.execute(stmt.on_conflict_do_update(
+        index_elements=[R.id],
+        set_={**{name: stmt.excluded[name] for name in values}, "data_version": R.data_version + 1}
+    ))
+    _refresh_max_reviewers(db)
+    db.commit()
+
+    return db.get(R, ROLLUP_ID, populate_existing=True)
+
+
+def _refresh_max_reviewers(db: Session):
+    pr = models.PullRequest
+    top = db.query(
+        pr.pull_request_id,
+        pr.pull_request_name,
+        func.cardinality(pr.assigned_reviewers)
+    ).order_by(func.cardinality(pr.assigned_reviewers).desc()).first()
+
+    db.execute(update(R).where(R.id == ROLLUP_ID).values(
+        max_reviewers_pr_id=top[0] if top else None,
+        max_reviewers_pr_name=top[1] if top else None,
+        max_reviewer_count=(top[2] or 0) if top else 0,
+        max_reviewers_stale=False,
+        # Кэш /stats должен увидеть новый максимум
+        data_version=R.data_version + 1,
+    ))
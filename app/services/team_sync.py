@@ -0,0 +1,76 @@
+"""
+Синхронизация состава команды с полным списком из внешней системы (HR).
+
+Список сравнивается с текущим составом одной транзакцией: новые участники
+добавляются, изменённые обновляются одним INSERT ... ON CONFLICT DO UPDATE,
+а пропавшие из списка или помеченные неактивными деактивируются с
+переназначением их открытых PR (как в /team/deactivateUsers).
+Число запросов не зависит от размера команды.
+"""
+import logging
+from typing import Dict
+
+from sqlalchemy import or_
+from sqlalchemy.orm import Session
+
+from .. import crud, models, schemas
+from . import roster_cache, stats_rollup
+from .bulk_deactivation import BulkDeactivationService
+
+logger = logging.getLogger(__name__)
+
+
+def sync_team(db: Session, team: schemas.TeamCreate) -> Dict:
+    created = crud.insert_team(db, team.team_name)
+    if not created:
+        # Синхронизации и массовые деактивации одной команды выполняются по очереди
+        db.query(models.Team.team_name).filter(
+            models.Team.team_name == team.team_name
+        ).with_for_update().scalar()
+
+    members = crud.unique_members(team.members)
+    roster = {member.user_id: member for member in members}
+    # Состояние до upsert: текущие участники и все пользователи из списка,
+    # включая тех, кто сейчас в другой команде и переходит в эту
+    current = dict(db.query(models.User.user_id, models.User.is_active).filter(
+        or_(models.User.team_name == team.team_name, models.User.user_id.in_(list(roster)))
+    ).all())
+
+    # Активные пользователи, которых нет в списке или которые в нём неактивны
+    to_deactivate = sorted(
+        user_id for user_id, is_active in current.items()
+        if is_active and (user_id not in roster or not roster[user_id].is_active)
+    )
+    # Их активность снимет деактивация (с переназначением PR), upsert её не трогает
+    deactivating = set(to_deactivate)
+    upsert_members = [
+        member.model_copy(update={"is_active": True}) if member.user_id in deactivating else member
+        for member in members
+    ]
+
+    service = BulkDeactivationService(db)
+    service.lock_open_prs(to_deactivate)
+    added, updated, active_delta, affected_teams = crud.upsert_team_members(db, team.team_name, upsert_members)
+    deactivated_count, reassigned = service.deactivate_and_reassign(to_deactivate, team.team_name)
+
+    roster_cache.mark_dirty(db, affected_teams)
+    stats_rollup.apply_deltas(
+        db,
+        total_teams=int(created),
+        total_users=len(added),
+        active_users=active_delta - deactivated_count
+    )
+    db.commit()
+
+    logger.info(
+        f"Синхронизация команды {team.team_name}: добавлено {len(added)}, изменено {len(updated)}, "
+        f"деактивировано {len(to_deactivate)}, переназначений {len(reassigned)}"
+    )
+    return {
+        "team_name": team.team_name,
+        "created": created,
+        "added_users": added,
+        "updated_users": updated,
+        "deactivated_users": to_deactivate,
+        "reassigned_prs": reassigned,
+    }
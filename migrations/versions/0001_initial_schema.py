@@ -0,0 +1,66 @@
+"""initial schema
+
+Revision ID: 0001
+Revises:
+Create Date: 2026-10-17 10:00:00
+
+Схема, которую раньше создавал Base.metadata.create_all.
+Для уже существующей базы выполнить `alembic stamp 0001`.
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+
+# revision identifiers, used by Alembic.
+revision: str = '0001'
+down_revision: Union[str, None] = None
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.create_table(
+        'teams',
+        sa.Column('team_name', sa.String(), nullable=False),
+        sa.Column('created_at', sa.DateTime(timezone=True), server_default=sa.text('now()'), nullable=True),
+        sa.PrimaryKeyConstraint('team_name'),
+    )
+    op.create_index('ix_teams_team_name', 'teams', ['team_name'])
+
+    op.create_table(
+        'users',
+        sa.Column('user_id', sa.String(), nullable=False),
+        sa.Column('username', sa.String(), nullable=False),
+        sa.Column('team_name', sa.String(), nullable=False),
+        sa.Column('is_active', sa.Boolean(), nullable=True),
+        sa.Column('created_at', sa.DateTime(timezone=True), server_default=sa.text('now()'), nullable=True),
+        sa.ForeignKeyConstraint(['team_name'], ['teams.team_name']),
+        sa.PrimaryKeyConstraint('user_id'),
+    )
+    op.create_index('ix_users_user_id', 'users', ['user_id'])
+
+    op.create_table(
+        'pull_requests',
+        sa.Column('pull_request_id', sa.String(), nullable=False),
+        sa.Column('pull_request_name', sa.String(), nullable=False),
+        sa.Column('author_id', sa.String(), nullable=False),
+        sa.Column('status', sa.String(), nullable=True),
+        sa.Column('assigned_reviewers', postgresql.ARRAY(sa.String()), nullable=True),
+        sa.Column('created_at', sa.DateTime(timezone=True), server_default=sa.text('now()'), nullable=True),
+        sa.Column('merged_at', sa.DateTime(timezone=True), nullable=True),
+        sa.ForeignKeyConstraint(['author_id'], ['users.user_id']),
+        sa.PrimaryKeyConstraint('pull_request_id'),
+    )
+    op.create_index('ix_pull_requests_pull_request_id', 'pull_requests', ['pull_request_id'])
+
+
+def downgrade() -> None:
+    op.drop_index('ix_pull_requests_pull_request_id', table_name='pull_requests')
+    op.drop_table('pull_requests')
+    op.drop_index('ix_users_user_id', table_name='users')
+    op.drop_table('users')
+    op.drop_index('ix_teams_team_name', table_name='teams')
+    op.drop_table('teams')
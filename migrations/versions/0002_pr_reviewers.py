@@ -0,0 +1,56 @@
+"""pr_reviewers association table
+
+Revision ID: 0002
+Revises: 0001
+Create Date: 2026-10-17 10:30:00
+
+Нормализованная таблица назначений ревьюверов с индексами по user_id,
+заполняется из существующего массива pull_requests.assigned_reviewers.
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '0002'
+down_revision: Union[str, None] = '0001'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.create_table(
+        'pr_reviewers',
+        sa.Column('pull_request_id', sa.String(), nullable=False),
+        sa.Column('user_id', sa.String(), nullable=False),
+        sa.Column('status', sa.String(), nullable=False, server_default='OPEN'),
+        sa.Column('assigned_at', sa.DateTime(timezone=True), server_default=sa.text('now()'), nullable=True),
+        sa.ForeignKeyConstraint(['pull_request_id'], ['pull_requests.pull_request_id'], ondelete='CASCADE'),
+        sa.ForeignKeyConstraint(['user_id'], ['users.user_id']),
+        sa.PrimaryKeyConstraint('pull_request_id', 'user_id'),
+    )
+    op.create_index('ix_pr_reviewers_user_id', 'pr_reviewers', ['user_id', 'pull_request_id'])
+    op.create_index(
+        'ix_pr_reviewers_open_user_id', 'pr_reviewers', ['user_id'],
+        postgresql_where=sa.text("status = 'OPEN'"),
+    )
+
+    # Переносим существующие назначения из массива
+    op.execute(
+        """
+        INSERT INTO pr_reviewers (pull_request_id, user_id, status, assigned_at)
+        SELECT DISTINCT pr.pull_request_id, r.user_id, COALESCE(pr.status, 'OPEN'), pr.created_at
+        FROM pull_requests pr
+        CROSS JOIN LATERAL unnest(pr.assigned_reviewers) AS r(user_id)
+        JOIN users u ON u.user_id = r.user_id
+        ON CONFLICT DO NOTHING
+        """
+    )
+
+
+def downgrade() -> None:
+    op.drop_index('ix_pr_reviewers_open_user_id', table_name='pr_reviewers')
+    op.drop_index('ix_pr_reviewers_user_id', table_name='pr_reviewers')
+    op.drop_table('pr_reviewers')
@@ -0,0 +1,45 @@
+"""users.open_review_count counter
+
+Revision ID: 0003
+Revises: 0002
+Create Date: 2026-10-17 11:00:00
+
+Счётчик открытых ревью на пользователя для балансировки нагрузки,
+заполняется из pr_reviewers.
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '0003'
+down_revision: Union[str, None] = '0002'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.add_column(
+        'users',
+        sa.Column('open_review_count', sa.Integer(), nullable=False, server_default='0'),
+    )
+
+    op.execute(
+        """
+        UPDATE users u
+        SET open_review_count = c.cnt
+        FROM (
+            SELECT user_id, count(*) AS cnt
+            FROM pr_reviewers
+            WHERE status = 'OPEN'
+            GROUP BY user_id
+        ) c
+        WHERE c.user_id = u.user_id
+        """
+    )
+
+
+def downgrade() -> None:
+    op.drop_column('users', 'open_review_count')
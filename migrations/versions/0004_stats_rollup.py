@@ -0,0 +1,74 @@
+"""stats_rollup table
+
+Revision ID: 0004
+Revises: 0003
+Create Date: 2026-10-17 11:30:00
+
+Однострочная сводка для /stats, поддерживаемая инкрементально.
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '0004'
+down_revision: Union[str, None] = '0003'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.create_table(
+        'stats_rollup',
+        sa.Column('id', sa.Integer(), nullable=False),
+        sa.Column('total_teams', sa.Integer(), nullable=False),
+        sa.Column('total_users', sa.Integer(), nullable=False),
+        sa.Column('active_users', sa.Integer(), nullable=False),
+        sa.Column('total_pr', sa.Integer(), nullable=False),
+        sa.Column('open_pr', sa.Integer(), nullable=False),
+        sa.Column('merged_pr', sa.Integer(), nullable=False),
+        sa.Column('total_reviewers', sa.Integer(), nullable=False),
+        sa.Column('max_reviewers_pr_id', sa.String(), nullable=True),
+        sa.Column('max_reviewers_pr_name', sa.String(), nullable=True),
+        sa.Column('max_reviewer_count', sa.Integer(), nullable=False),
+        sa.Column('max_reviewers_stale', sa.Boolean(), nullable=False),
+        sa.Column('last_pr_created_at', sa.DateTime(timezone=True), nullable=True),
+        sa.PrimaryKeyConstraint('id'),
+    )
+
+    op.execute(
+        """
+        INSERT INTO stats_rollup (
+            id, total_teams, total_users, active_users, total_pr, open_pr, merged_pr,
+            total_reviewers, max_reviewers_pr_id, max_reviewers_pr_name, max_reviewer_count,
+            max_reviewers_stale, last_pr_created_at
+        )
+        SELECT
+            1,
+            (SELECT count(*) FROM teams),
+            (SELECT count(*) FROM users),
+            (SELECT count(*) FROM users WHERE is_active),
+            (SELECT count(*) FROM pull_requests),
+            (SELECT count(*) FROM pull_requests WHERE status = 'OPEN'),
+            (SELECT count(*) FROM pull_requests WHERE status = 'MERGED'),
+            (SELECT coalesce(sum(cardinality(assigned_reviewers)), 0) FROM pull_requests),
+            top.pull_request_id,
+            top.pull_request_name,
+            coalesce(top.reviewer_count, 0),
+            false,
+            (SELECT max(created_at) FROM pull_requests)
+        FROM (SELECT 1) AS one
+        LEFT JOIN LATERAL (
+            SELECT pull_request_id, pull_request_name, cardinality(assigned_reviewers) AS reviewer_count
+            FROM pull_requests
+            ORDER BY cardinality(assigned_reviewers) DESC
+            LIMIT 1
+        ) top ON true
+        """
+    )
+
+
+def downgrade() -> None:
+    op.drop_table('stats_rollup')
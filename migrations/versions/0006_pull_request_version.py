@@ -0,0 +1,30 @@
+"""pull_requests.version
+
+Revision ID: 0006
+Revises: 0005
+Create Date: 2026-10-17 12:00:00
+
+Версия строки PR для оптимистической блокировки при параллельных изменениях.
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '0006'
+down_revision: Union[str, None] = '0005'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.add_column(
+        'pull_requests',
+        sa.Column('version', sa.Integer(), nullable=False, server_default='1'),
+    )
+
+
+def downgrade() -> None:
+    op.drop_column('pull_requests', 'version')
@@ -0,0 +1,47 @@
+"""deactivation_jobs table
+
+Revision ID: 0008
+Revises: 0007
+Create Date: 2026-10-17 14:00:00
+
+Очередь фоновых массовых деактиваций с прогрессом и результатом.
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+
+# revision identifiers, used by Alembic.
+revision: str = '0008'
+down_revision: Union[str, None] = '0007'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.create_table(
+        'deactivation_jobs',
+        sa.Column('job_id', sa.String(), nullable=False),
+        sa.Column('team_name', sa.String(), nullable=False),
+        sa.Column('user_ids', postgresql.ARRAY(sa.String()), nullable=False),
+        sa.Column('status', sa.String(), server_default='QUEUED', nullable=False),
+        sa.Column('processed_users', sa.Integer(), server_default='0', nullable=False),
+        sa.Column('deactivated_users', postgresql.ARRAY(sa.String()), server_default='{}', nullable=False),
+        sa.Column('failed_deactivations', postgresql.ARRAY(sa.String()), server_default='{}', nullable=False),
+        sa.Column('reassigned_prs', postgresql.JSONB(), server_default='[]', nullable=False),
+        sa.Column('error', sa.Text(), nullable=True),
+        sa.Column('created_at', sa.DateTime(timezone=True), server_default=sa.text('now()'), nullable=True),
+        sa.Column('started_at', sa.DateTime(timezone=True), nullable=True),
+        sa.Column('heartbeat_at', sa.DateTime(timezone=True), nullable=True),
+        sa.Column('finished_at', sa.DateTime(timezone=True), nullable=True),
+        sa.Column('processing_time_ms', sa.Integer(), nullable=True),
+        sa.PrimaryKeyConstraint('job_id'),
+    )
+    op.create_index('ix_deactivation_jobs_status_created_at', 'deactivation_jobs', ['status', 'created_at'])
+
+
+def downgrade() -> None:
+    op.drop_index('ix_deactivation_jobs_status_created_at', table_name='deactivation_jobs')
+    op.drop_table('deactivation_jobs')
@@ -0,0 +1,130 @@
+"""partition pull_requests
+
+Revision ID: 0009
+Revises: 0008
+Create Date: 2026-10-17 14:30:00
+
+pull_requests пересоздаётся секционированной: LIST по status (pull_requests_open и
+pull_requests_merged), мердженые PR дополнительно RANGE по created_at помесячно
+с секцией по умолчанию. Первичный ключ секционированной таблицы обязан включать
+ключи секционирования, поэтому уникальность pull_request_id переезжает в реестр
+pull_request_ids, на который ссылаются pull_requests и pr_reviewers.
+Месячные секции создаются для всех месяцев существующих мердженых PR и на три
+месяца вперёд, дальше их создаёт сервис (app/services/partitions.py).
+Данные копируются целиком - на большой таблице миграцию стоит выполнять в окно обслуживания.
+"""
+from datetime import date, datetime, timezone
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+
+# revision identifiers, used by Alembic.
+revision: str = '0009'
+down_revision: Union[str, None] = '0008'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+COLUMNS = "pull_request_id, pull_request_name, author_id, status, assigned_reviewers, created_at, merged_at, version"
+
+
+def _month(value: date, offset: int = 0) -> date:
+    months = value.year * 12 + value.month - 1 + offset
+    return date(months // 12, months % 12 + 1, 1)
+
+
+def upgrade() -> None:
+    op.create_table(
+        'pull_request_ids',
+        sa.Column('pull_request_id', sa.String(), nullable=False),
+        sa.PrimaryKeyConstraint('pull_request_id'),
+    )
+    op.execute("INSERT INTO pull_request_ids (pull_request_id) SELECT pull_request_id FROM pull_requests")
+
+    op.drop_constraint('pr_reviewers_pull_request_id_fkey', 'pr_reviewers', type_='foreignkey')
+    op.create_foreign_key(
+        'pr_reviewers_pull_request_id_fkey', 'pr_reviewers', 'pull_request_ids',
+        ['pull_request_id'], ['pull_request_id'], ondelete='CASCADE',
+    )
+
+    # Старая таблица остаётся источником данных до конца миграции
+    op.rename_table('pull_requests', 'pull_requests_unpartitioned')
+    op.execute("ALTER INDEX pull_requests_pkey RENAME TO pull_requests_unpartitioned_pkey")
+    op.drop_index('ix_pull_requests_pull_request_id', table_name='pull_requests_unpartitioned')
+
+    op.create_table(
+        'pull_requests',
+        sa.Column('pull_request_id', sa.String(), nullable=False),
+        sa.Column('pull_request_name', sa.String(), nullable=False),
+        sa.Column('author_id', sa.String(), nullable=False),
+        sa.Column('status', sa.String(), nullable=False),
+        sa.Column('assigned_reviewers', postgresql.ARRAY(sa.String()), nullable=True),
+        sa.Column('created_at', sa.DateTime(timezone=True), server_default=sa.text('now()'), nullable=False),
+        sa.Column('merged_at', sa.DateTime(timezone=True), nullable=True),
+        sa.Column('version', sa.Integer(), nullable=False, server_default='1'),
+        sa.ForeignKeyConstraint(['author_id'], ['users.user_id']),
+        sa.ForeignKeyConstraint(['pull_request_id'], ['pull_request_ids.pull_request_id'], ondelete='CASCADE'),
+        sa.PrimaryKeyConstraint('pull_request_id', 'status', 'created_at'),
+        postgresql_partition_by='LIST (status)',
+    )
+    op.execute("CREATE TABLE pull_requests_open PARTITION OF pull_requests FOR VALUES IN ('OPEN')")
+    op.execute(
+        "CREATE TABLE pull_requests_merged PARTITION OF pull_requests "
+        "FOR VALUES IN ('MERGED') PARTITION BY RANGE (created_at)"
+    )
+    op.execute("CREATE TABLE pull_requests_merged_default PARTITION OF pull_requests_merged DEFAULT")
+
+    first = op.get_bind().execute(sa.text(
+        "SELECT min(created_at) FROM pull_requests_unpartitioned WHERE status = 'MERGED'"
+    )).scalar()
+    today = datetime.now(timezone.utc).date()
+    month = _month(first.astimezone(timezone.utc).date() if first else today)
+    while month <= _month(today, 3):
+        op.execute(
+            f"CREATE TABLE pull_requests_merged_y{month.year:04d}m{month.month:02d} "
+            f"PARTITION OF pull_requests_merged "
+            f"FOR VALUES FROM ('{month.isoformat()} 00:00:00+00') TO ('{_month(month, 1).isoformat()} 00:00:00+00')"
+        )
+        month = _month(month, 1)
+
+    op.execute(f"""
+        INSERT INTO pull_requests ({COLUMNS})
+        SELECT pull_request_id, pull_request_name, author_id, COALESCE(status, 'OPEN'),
+               assigned_reviewers, COALESCE(created_at, now()), merged_at, version
+        FROM pull_requests_unpartitioned
+    """)
+    op.drop_table('pull_requests_unpartitioned')
+
+
+def downgrade() -> None:
+    # Архивированные секции (схема archive) обратно не возвращаются
+    op.create_table(
+        'pull_requests_unpartitioned',
+        sa.Column('pull_request_id', sa.String(), nullable=False),
+        sa.Column('pull_request_name', sa.String(), nullable=False),
+        sa.Column('author_id', sa.String(), nullable=False),
+        sa.Column('status', sa.String(), nullable=True),
+        sa.Column('assigned_reviewers', postgresql.ARRAY(sa.String()), nullable=True),
+        sa.Column('created_at', sa.DateTime(timezone=True), server_default=sa.text('now()'), nullable=True),
+        sa.Column('merged_at', sa.DateTime(timezone=True), nullable=True),
+        sa.Column('version', sa.Integer(), nullable=False, server_default='1'),
+        sa.ForeignKeyConstraint(['author_id'], ['users.user_id']),
+        sa.PrimaryKeyConstraint('pull_request_id', name='pull_requests_unpartitioned_pkey'),
+    )
+    op.execute(f"INSERT INTO pull_requests_unpartitioned ({COLUMNS}) SELECT {COLUMNS} FROM pull_requests")
+
+    op.drop_constraint('pr_reviewers_pull_request_id_fkey', 'pr_reviewers', type_='foreignkey')
+    op.execute("DELETE FROM pr_reviewers WHERE pull_request_id NOT IN (SELECT pull_request_id FROM pull_requests_unpartitioned)")
+    op.drop_table('pull_requests')
+    # CASCADE снимает ссылки на реестр у таблиц в схеме archive
+    op.execute("DROP TABLE pull_request_ids CASCADE")
+
+    op.rename_table('pull_requests_unpartitioned', 'pull_requests')
+    op.execute("ALTER INDEX pull_requests_unpartitioned_pkey RENAME TO pull_requests_pkey")
+    op.create_index('ix_pull_requests_pull_request_id', 'pull_requests', ['pull_request_id'])
+    op.create_foreign_key(
+        'pr_reviewers_pull_request_id_fkey', 'pr_reviewers', 'pull_requests',
+        ['pull_request_id'], ['pull_request_id'], ondelete='CASCADE',
+    )
@@ -0,0 +1,36 @@
+"""pr_reviewers keyset index
+
+Revision ID: 0010
+Revises: 0009
+Create Date: 2026-10-18 10:00:00
+
+Постраничная выдача /users/getReview идёт по ключу (assigned_at, pull_request_id)
+назначения: индекс (user_id, status, assigned_at, pull_request_id) делает каждую
+страницу диапазонным сканированием индекса вместо сортировки всей истории ревьювера.
+assigned_at становится обязательным - NULL в ключе пагинации ломает сравнение.
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '0010'
+down_revision: Union[str, None] = '0009'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.execute("UPDATE pr_reviewers SET assigned_at = now() WHERE assigned_at IS NULL")
+    op.alter_column('pr_reviewers', 'assigned_at', existing_type=sa.DateTime(timezone=True), nullable=False)
+    op.create_index(
+        'ix_pr_reviewers_user_status_assigned_at', 'pr_reviewers',
+        ['user_id', 'status', 'assigned_at', 'pull_request_id']
+    )
+
+
+def downgrade() -> None:
+    op.drop_index('ix_pr_reviewers_user_status_assigned_at', table_name='pr_reviewers')
+    op.alter_column('pr_reviewers', 'assigned_at', existing_type=sa.DateTime(timezone=True), nullable=True)
@@ -0,0 +1,55 @@
+"""
+Число SQL-запросов горячих эндпоинтов PR при прогретом кэше составов команд.
+Считает QueryMetrics (заголовок Server-Timing от QueryStatsMiddleware), поэтому
+служебные запросы, разрешённые через query_metrics.allow, здесь тоже видны.
+"""
+import re
+import uuid
+
+from app.middleware import QUERY_BUDGETS
+
+
+def queries(response) -> int:
+    match = re.search(r'queries=(\d+)', response.headers["server-timing"])
+    assert match, response.headers["server-timing"]
+    return int(match.group(1))
+
+
+def create_pr(client, author_id: str):
+    response = client.post("/pullRequest/create", json={
+        "pull_request_id": f"pr-{uuid.uuid4().hex[:12]}",
+        "pull_request_name": "Feature",
+        "author_id": author_id,
+    })
+    assert response.status_code == 201, response.text
+    return response
+
+
+def test_create_within_two_queries(client, team):
+    _, user_ids = team
+    # Первый PR команды заполняет кэш составов
+    create_pr(client, user_ids[0])
+
+    response = create_pr(client, user_ids[1])
+
+    assert len(response.json()["assigned_reviewers"]) == 2
+    assert queries(response) <= 2
+    assert QUERY_BUDGETS["/pullRequest/create"] <= 2
+
+
+def test_reassign_within_two_queries(client, team):
+    _, user_ids = team
+    pr = create_pr(client, user_ids[0]).json()
+    old_reviewer = pr["assigned_reviewers"][0]
+
+    response = client.post("/pullRequest/reassign", json={
+        "pull_request_id": pr["pull_request_id"],
+        "old_user_id": old_reviewer,
+    })
+
+    assert response.status_code == 200, response.text
+    body = response.json()
+    assert body["replaced_by"] not in (old_reviewer, pr["author_id"])
+    assert old_reviewer not in body["pr"]["assigned_reviewers"]
+    assert queries(response) <= 2
+    assert QUERY_BUDGETS["/pullRequest/reassign"] <= 2
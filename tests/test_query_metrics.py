@@ -0,0 +1,52 @@
+"""
+QueryMetrics без Postgres: строгий бюджет и его расширение через allow.
+"""
+import pytest
+from sqlalchemy import create_engine
+
+from app.metrics import QueryBudgetExceeded, QueryMetrics
+
+
+@pytest.fixture
+def metered():
+    engine = create_engine("sqlite://")
+    metrics = QueryMetrics()
+    metrics.attach(engine)
+    with engine.connect() as conn:
+        yield metrics, conn
+    engine.dispose()
+
+
+def test_strict_budget_rejects_extra_query(metered):
+    metrics, conn = metered
+    token = metrics.start_request(budget=1, strict=True)
+    try:
+        conn.exec_driver_sql("SELECT 1")
+        with pytest.raises(QueryBudgetExceeded):
+            conn.exec_driver_sql("SELECT 2")
+        assert metrics.current().count == 1
+    finally:
+        metrics.finish_request(token)
+
+
+def test_allow_extends_budget_of_current_request(metered):
+    metrics, conn = metered
+    token = metrics.start_request(budget=1, strict=True)
+    try:
+        conn.exec_driver_sql("SELECT 1")
+        metrics.allow(2)
+        conn.exec_driver_sql("SELECT 2")
+        conn.exec_driver_sql("SELECT 3")
+        with pytest.raises(QueryBudgetExceeded):
+            conn.exec_driver_sql("SELECT 4")
+        assert metrics.current().count == 3
+        assert not metrics.current().over_budget
+    finally:
+        metrics.finish_request(token)
+
+
+def test_allow_outside_request_is_noop(metered):
+    metrics, conn = metered
+    metrics.allow(5)
+    conn.exec_driver_sql("SELECT 1")
+    assert metrics.current() is None